@@ -0,0 +1,38 @@
+"""add_signal_watermark
+
+Revision ID: 5c1e8a7d9b20
+Revises: 0a3601d18004
+Create Date: 2026-10-19 09:12:41.308125
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e8a7d9b20"
+down_revision: Union[str, Sequence[str], None] = "0a3601d18004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # strategy x 通貨ペア x timeframe 毎に、シグナル判定済みの最終時刻を保持する
+    op.execute("""
+    CREATE TABLE etl_signal_watermark (
+    strategy_name TEXT NOT NULL, -- e.g. 'sma_cross_14_28'
+    currency_id INTEGER NOT NULL REFERENCES dim_currency(id),
+    timeframe_id INTEGER NOT NULL,
+    last_time TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (strategy_name, currency_id, timeframe_id)
+    );
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("etl_signal_watermark")
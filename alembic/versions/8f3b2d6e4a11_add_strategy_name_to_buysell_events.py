@@ -0,0 +1,61 @@
+"""add_strategy_name_to_buysell_events
+
+Revision ID: 8f3b2d6e4a11
+Revises: 5c1e8a7d9b20
+Create Date: 2026-10-19 13:40:18.552907
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8f3b2d6e4a11"
+down_revision: Union[str, Sequence[str], None] = "5c1e8a7d9b20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 複数のstrategyが同時刻に同じindicator名でイベントを出しても衝突しないように、
+    # strategy_nameとtimeframeを主キーに含める
+    op.execute("""
+    ALTER TABLE fact_buysell_events
+    ADD COLUMN strategy_name TEXT NOT NULL DEFAULT 'legacy';
+    """)
+    op.execute("""
+    ALTER TABLE fact_buysell_events
+    DROP CONSTRAINT fact_buysell_events_pkey;
+    """)
+    op.execute("""
+    ALTER TABLE fact_buysell_events
+    ADD PRIMARY KEY (strategy_name, currency_id, trigger_indicator_timeframe, event_datetime, event_type);
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+    ALTER TABLE fact_buysell_events
+    DROP CONSTRAINT fact_buysell_events_pkey;
+    """)
+    op.execute("""
+    DELETE FROM fact_buysell_events a
+    USING fact_buysell_events b
+    WHERE a.event_id > b.event_id
+      AND a.event_datetime = b.event_datetime
+      AND a.currency_id = b.currency_id
+      AND a.event_type = b.event_type
+      AND a.trigger_indicator_name = b.trigger_indicator_name;
+    """)
+    op.execute("""
+    ALTER TABLE fact_buysell_events
+    ADD PRIMARY KEY (event_datetime, currency_id, event_type, trigger_indicator_name);
+    """)
+    op.execute("""
+    ALTER TABLE fact_buysell_events
+    DROP COLUMN strategy_name;
+    """)
@@ -0,0 +1,50 @@
+"""add_backtest_results
+
+Revision ID: b71d4c9e2f35
+Revises: 8f3b2d6e4a11
+Create Date: 2026-10-19 16:05:52.190443
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b71d4c9e2f35"
+down_revision: Union[str, Sequence[str], None] = "8f3b2d6e4a11"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # BacktestFX.runの結果(1回の実行につき1行)
+    op.execute("""
+    CREATE TABLE backtest_results (
+    id SERIAL PRIMARY KEY,
+    strategy_names TEXT[] NOT NULL,
+    currency_id INTEGER NOT NULL REFERENCES dim_currency(id),
+    timeframe_id INTEGER NOT NULL,
+    start_time TIMESTAMP,
+    end_time TIMESTAMP,
+    n_bars INTEGER NOT NULL,
+    n_trades INTEGER NOT NULL,
+    final_equity FLOAT NOT NULL,
+    total_return FLOAT NOT NULL,
+    max_drawdown FLOAT NOT NULL,
+    max_drawdown_pct FLOAT NOT NULL,
+    win_rate FLOAT NOT NULL,
+    profit_factor FLOAT NOT NULL,
+    avg_trade_pnl FLOAT NOT NULL,
+    sharpe FLOAT NOT NULL,
+    scenario JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("backtest_results")
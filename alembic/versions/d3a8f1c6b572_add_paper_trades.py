@@ -0,0 +1,47 @@
+"""add_paper_trades
+
+Revision ID: d3a8f1c6b572
+Revises: b71d4c9e2f35
+Create Date: 2026-10-19 18:12:40.512307
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d3a8f1c6b572"
+down_revision: Union[str, Sequence[str], None] = "b71d4c9e2f35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # PaperTradingEngineの仮想約定(1約定につき1行)
+    op.execute("""
+    CREATE TABLE paper_trades (
+    id BIGSERIAL PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    strategy_name TEXT NOT NULL,
+    side VARCHAR(10) NOT NULL,
+    quantity FLOAT NOT NULL,
+    price FLOAT NOT NULL,
+    bid FLOAT NOT NULL,
+    ask FLOAT NOT NULL,
+    tick_time TIMESTAMP NOT NULL,
+    bar_time TIMESTAMP NOT NULL,
+    position_after FLOAT NOT NULL,
+    realized_pnl FLOAT NOT NULL,
+    latency_us BIGINT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    op.execute("CREATE INDEX ix_paper_trades_symbol_tick_time ON paper_trades (symbol, tick_time);")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("paper_trades")
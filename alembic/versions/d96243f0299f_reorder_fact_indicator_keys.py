@@ -0,0 +1,59 @@
+"""reorder_fact_indicator_keys
+
+Revision ID: d96243f0299f
+Revises: e5b2c7a94d18
+Create Date: 2026-10-19 21:47:05.412093
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d96243f0299f"
+down_revision: Union[str, Sequence[str], None] = "e5b2c7a94d18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FACT_TABLES = ("fact_rsi", "fact_sma", "fact_ema")
+
+# 指標の系列(period, 通貨ペア, timeframe)を先頭にし、系列内をtime順に並べる
+# - update_rsi/sma/ema の MAX(time) は系列の末尾1行(Index Only Scan Backward + LIMIT 1)
+# - signal_engine は系列 + timeの範囲
+# - insert_sma_cross_signals は s側が系列の範囲、l側が1行の一致
+SERIES_KEY_COLUMNS = "period, currency_id, timeframe_id, time, calc_version"
+TIME_KEY_COLUMNS = "time, currency_id, timeframe_id, period, calc_version"
+
+
+def _swap_primary_key(table: str, columns: str) -> None:
+    # インデックスはCONCURRENTLYで作り、PKの付け替え(ACCESS EXCLUSIVE)はカタログの変更だけにする
+    with op.get_context().autocommit_block():
+        # 前回失敗した時のINVALIDなインデックスが残っていれば作り直す
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {table}_pkey_new;")
+        op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY {table}_pkey_new ON {table} ({columns});")
+    op.execute(f"""
+    ALTER TABLE {table}
+        DROP CONSTRAINT {table}_pkey,
+        ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {table}_pkey_new;
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in FACT_TABLES:
+        _swap_primary_key(table, SERIES_KEY_COLUMNS)
+        # timeが先頭のインデックスが無くなるため、全系列をtimeの範囲で読む処理(保持期間の削除など)用
+        # 行はほぼtime順に追記されるため、BRINで十分に絞れる(btreeの1/1000以下のサイズ)
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {table}_time_brin;")
+            op.execute(f"CREATE INDEX CONCURRENTLY {table}_time_brin ON {table} USING brin (time);")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in FACT_TABLES:
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {table}_time_brin;")
+        _swap_primary_key(table, TIME_KEY_COLUMNS)
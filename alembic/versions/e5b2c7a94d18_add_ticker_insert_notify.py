@@ -0,0 +1,58 @@
+"""add_ticker_insert_notify
+
+Revision ID: e5b2c7a94d18
+Revises: d3a8f1c6b572
+Create Date: 2026-10-19 19:03:27.861542
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b2c7a94d18"
+down_revision: Union[str, Sequence[str], None] = "d3a8f1c6b572"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # insertされたテーブル名をticker_insertチャンネルへ通知する(ws_ticker_serverがLISTENする)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION ticker.notify_ticker_insert() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('ticker_insert', TG_TABLE_NAME);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+    # 既存のtickerテーブルにtriggerを作成する(新しいテーブルはcreate_ticker_tablesで作成する)
+    op.execute("""
+    DO $$
+    DECLARE
+        t RECORD;
+    BEGIN
+        FOR t IN
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_schema = 'ticker' AND table_type = 'BASE TABLE'
+        LOOP
+            EXECUTE format('DROP TRIGGER IF EXISTS notify_ticker_insert ON ticker.%I', t.table_name);
+            EXECUTE format(
+                'CREATE TRIGGER notify_ticker_insert AFTER INSERT ON ticker.%I '
+                'FOR EACH STATEMENT EXECUTE FUNCTION ticker.notify_ticker_insert()',
+                t.table_name
+            );
+        END LOOP;
+    END;
+    $$;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION IF EXISTS ticker.notify_ticker_insert() CASCADE;")
@@ -0,0 +1,142 @@
+"""partition_ticker_and_ohlc_base
+
+Revision ID: ee8516103f72
+Revises: d96243f0299f
+Create Date: 2026-10-19 23:12:36.518024
+
+"""
+
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "ee8516103f72"
+down_revision: Union[str, Sequence[str], None] = "d96243f0299f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 既存のテーブルの行は1つのlegacyパーティション(MINVALUE〜境界)にそのまま残す(コピーしない)
+# 境界より後はretentionのflowが日次(tick)/月次(1m足)のパーティションを作る
+# 境界はmigration中に届くtickが入るよう、現在時刻より後にする
+LEGACY_MARGIN = timedelta(days=2)
+
+
+def _quoted(schema: str, table: str) -> str:
+    return f'"{schema}"."{table}"'
+
+
+def _next_day(value: datetime) -> datetime:
+    return datetime(value.year, value.month, value.day) + timedelta(days=1)
+
+
+def _next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _targets(conn) -> list[tuple[str, str, bool]]:
+    # (schema, table, tickerか) tickerの全テーブルと、ohlcの1m足のテーブル
+    rows = conn.execute(sa.text("""
+    SELECT n.nspname, c.relname
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r'
+      AND NOT c.relispartition
+      AND (n.nspname = 'ticker' OR (n.nspname = 'ohlc' AND c.relname LIKE '%\\_1m'))
+    ORDER BY 1, 2;
+    """)).all()
+    return [(schema, table, schema == "ticker") for schema, table in rows]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # アーカイブ(parquet)したパーティションの台帳。restore時の範囲とファイルの検証に使う
+    # range_start: NULLはMINVALUE(legacyパーティション)
+    # restored_until: restoreした範囲は、この時刻まで再アーカイブしない
+    op.execute("""
+    CREATE TABLE retention_archive (
+    partition_name TEXT PRIMARY KEY,
+    table_schema TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    range_start TIMESTAMP,
+    range_end TIMESTAMP NOT NULL,
+    path TEXT NOT NULL,
+    row_count BIGINT NOT NULL,
+    sha256 TEXT NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    restored_until TIMESTAMP
+    );
+    """)
+
+    conn = op.get_bind()
+    now = conn.execute(sa.text("SELECT (now() AT TIME ZONE 'UTC')::timestamp")).scalar()
+    targets = _targets(conn)
+    boundaries = {}
+    for schema, table, is_ticker in targets:
+        latest = conn.execute(sa.text(f"SELECT MAX(time) FROM {_quoted(schema, table)}")).scalar()
+        latest = max(latest or now, now + LEGACY_MARGIN)
+        boundary = _next_day(latest) if is_ticker else _next_month(latest)
+        boundaries[(schema, table)] = boundary
+        # 先にCHECKを検証しておき、ATTACHでの全件の走査を省く(VALIDATEはinsertを止めない)
+        op.execute(f"""
+        ALTER TABLE {_quoted(schema, table)}
+            ADD CONSTRAINT {table}_legacy_range CHECK (time < '{boundary.isoformat(sep=' ')}') NOT VALID;
+        ALTER TABLE {_quoted(schema, table)} VALIDATE CONSTRAINT {table}_legacy_range;
+        """)
+
+    for schema, table, is_ticker in targets:
+        boundary = boundaries[(schema, table)]
+        legacy = f"{table}_legacy"
+        # retentionのflowが止まっていてもinsertが失敗しないよう、範囲外の行はdefaultパーティションに入れる
+        op.execute(f"""
+        ALTER TABLE {_quoted(schema, table)} RENAME TO {legacy};
+        ALTER INDEX {_quoted(schema, f"{table}_pkey")} RENAME TO {legacy}_pkey;
+        CREATE TABLE {_quoted(schema, table)} (LIKE {_quoted(schema, legacy)} INCLUDING DEFAULTS)
+            PARTITION BY RANGE (time);
+        ALTER TABLE {_quoted(schema, table)} ADD PRIMARY KEY (time);
+        ALTER TABLE {_quoted(schema, table)}
+            ATTACH PARTITION {_quoted(schema, legacy)} FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat(sep=' ')}');
+        ALTER TABLE {_quoted(schema, legacy)} DROP CONSTRAINT {table}_legacy_range;
+        CREATE TABLE {_quoted(schema, f"{table}_default")} PARTITION OF {_quoted(schema, table)} DEFAULT;
+        """)
+        if is_ticker:
+            op.execute(f"""
+            DROP TRIGGER IF EXISTS notify_ticker_insert ON {_quoted(schema, legacy)};
+            CREATE TRIGGER notify_ticker_insert
+            AFTER INSERT ON {_quoted(schema, table)}
+            FOR EACH STATEMENT EXECUTE FUNCTION ticker.notify_ticker_insert();
+            """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # アーカイブしてdropしたパーティションの行は戻らない(parquetのファイルに残る)
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("""
+    SELECT n.nspname, c.relname
+    FROM pg_partitioned_table p
+    JOIN pg_class c ON c.oid = p.partrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname IN ('ticker', 'ohlc')
+    ORDER BY 1, 2;
+    """)).all()
+    for schema, table in rows:
+        plain = f"{table}_unpartitioned"
+        op.execute(f"""
+        CREATE TABLE {_quoted(schema, plain)} (LIKE {_quoted(schema, table)} INCLUDING DEFAULTS);
+        INSERT INTO {_quoted(schema, plain)} SELECT * FROM {_quoted(schema, table)};
+        DROP TABLE {_quoted(schema, table)} CASCADE;
+        ALTER TABLE {_quoted(schema, plain)} RENAME TO {table};
+        ALTER TABLE {_quoted(schema, table)} ADD CONSTRAINT {table}_pkey PRIMARY KEY (time);
+        """)
+        if schema == "ticker":
+            op.execute(f"""
+            CREATE TRIGGER notify_ticker_insert
+            AFTER INSERT ON {_quoted(schema, table)}
+            FOR EACH STATEMENT EXECUTE FUNCTION ticker.notify_ticker_insert();
+            """)
+
+    op.drop_table("retention_archive")
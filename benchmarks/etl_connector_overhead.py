@@ -0,0 +1,58 @@
+"""
+Prefectのtask 1回あたりのconnectorの準備コストを比べる(Prefectのblockと、blockが指すPostgresが必要)
+
+- load: 従来のtask(SqlAlchemyConnector.load → engine作成 → 接続 → close)
+- cached: connector_cache.get_connector(プロセス内で1回だけload、プールの接続を再利用)
+
+どちらも小さいクエリ(SELECT 1)を1回だけ実行する。差がtask毎のオーバーヘッド
+
+    python -m benchmarks.etl_connector_overhead [n_tasks] [block_name]
+"""
+import sys
+import time
+
+import numpy as np
+from prefect_sqlalchemy import SqlAlchemyConnector
+
+from src.etl.connector_cache import clear_connectors, get_connector
+
+QUERY = "SELECT 1;"
+
+
+def load_task(block_name: str) -> None:
+    with SqlAlchemyConnector.load(block_name) as conn:
+        conn.execute(QUERY)
+
+
+def cached_task(block_name: str) -> None:
+    get_connector(block_name).execute(QUERY)
+
+
+def measure(task, block_name: str, n_tasks: int) -> dict:
+    elapsed_ms = []
+    for _ in range(n_tasks):
+        started = time.perf_counter()
+        task(block_name)
+        elapsed_ms.append((time.perf_counter() - started) * 1000)
+    return {
+        "first_ms": elapsed_ms[0],
+        "p50_ms": float(np.percentile(elapsed_ms, 50)),
+        "p99_ms": float(np.percentile(elapsed_ms, 99)),
+        "total_s": sum(elapsed_ms) / 1000,
+    }
+
+
+def main():
+    n_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    block_name = sys.argv[2] if len(sys.argv) > 2 else "forex-connector"
+    print(f"tasks={n_tasks} block={block_name}")
+    print("| connector | first ms | p50 ms | p99 ms | total s |")
+    print("|---|---|---|---|---|")
+    for name, task in (("load", load_task), ("cached", cached_task)):
+        r = measure(task, block_name, n_tasks)
+        print(f"| {name} | {r['first_ms']:.1f} | {r['p50_ms']:.2f} | {r['p99_ms']:.2f} | {r['total_s']:.2f} |")
+    clear_connectors()
+
+
+if __name__ == "__main__":
+    main()
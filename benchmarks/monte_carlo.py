@@ -0,0 +1,31 @@
+"""
+run_monte_carloの計測(1年分のトレードを想定した合成損益)
+
+    python -m benchmarks.monte_carlo [workers]
+"""
+import os
+import sys
+
+import numpy as np
+
+from src.core.monte_carlo import run_monte_carlo, summarize
+
+N_TRADES = 2_500
+N_SIMULATIONS = 10_000
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    trade_pnls = np.random.default_rng(0).normal(20, 1_000, N_TRADES)
+
+    for method in ("bootstrap", "shuffle"):
+        results, elapsed = run_monte_carlo(
+            trade_pnls, n_simulations=N_SIMULATIONS, method=method, slippage=0.002, workers=workers, seed=0
+        )
+        summary = summarize(results)
+        print(f"{method}: trades={N_TRADES} simulations={N_SIMULATIONS} workers={workers} elapsed={elapsed:.2f}s")
+        print(f"  max_drawdown p5={summary['max_drawdown']['p5']:.1f} total_return p50={summary['total_return']['p50']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+run_sweepの計測(1年分の1m足の合成データ)
+
+    python -m benchmarks.parameter_sweep [workers]
+"""
+import os
+import sys
+
+import numpy as np
+
+from src.core.parameter_sweep import build_grid, parse_period_range, run_sweep
+
+N_BARS = 365 * 24 * 60
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    rng = np.random.default_rng(0)
+    closes = 150 + np.cumsum(rng.normal(0, 0.01, N_BARS))
+    arrays = {"opens": np.concatenate([[closes[0]], closes[:-1]]), "closes": closes}
+    grid = build_grid(parse_period_range("5:50:5"), parse_period_range("20:200:10"))
+
+    results, elapsed = run_sweep(arrays, grid, workers=workers)
+
+    print(f"bars={N_BARS} combinations={len(grid)} workers={workers}")
+    print(f"elapsed={elapsed:.2f}s throughput={len(grid) / elapsed:.1f} combinations/s")
+    print(f"best: short={results[0]['short_period']} long={results[0]['long_period']} sharpe={results[0]['sharpe']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+"""
+ETL(transform_services)とws_ticker_serverのクエリの実行計画の回帰チェック
+
+専用のDB(QUERY_PLAN_DB)を固定の規模の合成データで作り(初回のみ。alembic upgrade head + ETLの関数でseed)、
+登録したケースの関数を実際に呼んで、発行された各クエリの EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) を取る。
+ベースライン(tests/database/query_plans/<case>.json)と比べて、次のいずれかで失敗にする
+
+- プランの形(ノードの種類・テーブル・インデックス・結合の種類)が変わった
+- shared/tempのbuffer数、実行時間が許容範囲を超えた
+
+    python -m benchmarks.query_plans            ベースラインと比べる(差分を表示)
+    python -m benchmarks.query_plans --update   ベースラインを書き直す
+    python -m benchmarks.query_plans --reseed   DBを作り直してから比べる
+
+各ケースは1つのトランザクション内で実行し、最後にROLLBACKする(seedしたデータは変わらない)
+並列workerの数で時間・buffersがぶれるため、max_parallel_workers_per_gather = 0 で計測する
+"""
+import argparse
+import difflib
+import json
+import os
+import subprocess
+import sys
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, Connection, Engine
+from sqlalchemy.sql.elements import TextClause
+
+from src.config.config import SCHEMA_NAME_OHLC, SCHEMA_NAME_TICKER
+from src.config.db_config import PROJECT_ROOT, get_db_url
+from src.etl.flows import retention_services, transform_services
+from src.etl.flows import transform_helpers as helpers
+from src.gmo import ws_ticker_server as server
+
+QUERY_PLAN_DB = os.getenv("QUERY_PLAN_DB", "forex_query_plan")
+BASELINE_DIR = os.path.join(PROJECT_ROOT, "tests", "database", "query_plans")
+
+# 許容範囲: baseline * TOLERANCE + SLACK まで
+BUFFER_TOLERANCE = float(os.getenv("QUERY_PLAN_BUFFER_TOLERANCE", "1.5"))
+BUFFER_SLACK = int(os.getenv("QUERY_PLAN_BUFFER_SLACK", "16"))
+TIME_TOLERANCE = float(os.getenv("QUERY_PLAN_TIME_TOLERANCE", "3.0"))
+TIME_SLACK_MS = float(os.getenv("QUERY_PLAN_TIME_SLACK_MS", "20"))
+
+# 合成データの規模(変えたらSEED_VERSIONを上げ、ベースラインを書き直す)
+SEED_VERSION = "2"
+SEED_END = datetime(2026, 9, 1)
+SEED_DAYS = 7
+SEED_TICK_SECONDS = 5
+SEED_PERIODS = (14, 28, 56)
+SEED_TIMEFRAMES = ("1m", "5m", "30m", "1h", "4h")
+
+SESSION_SETTINGS = (
+    "SET max_parallel_workers_per_gather = 0",
+    "SET jit = off",
+)
+
+
+### helper methods ###
+
+def plan_db_url() -> URL:
+    return get_db_url().set(database=QUERY_PLAN_DB)
+
+def _node_label(node: dict) -> str:
+    parts = [node["Node Type"]]
+    if node.get("Parallel Aware"):
+        parts.insert(0, "Parallel")
+    for key in ("Join Type", "Strategy", "Scan Direction", "Operation"):
+        if node.get(key) and node[key] not in ("Forward", "Plain"):
+            parts.append(f"({node[key]})")
+    if "Relation Name" in node:
+        parts.append(f"on {node['Relation Name']}")
+    if "Index Name" in node:
+        parts.append(f"using {node['Index Name']}")
+    if "CTE Name" in node:
+        parts.append(f"cte {node['CTE Name']}")
+    if "Subplan Name" in node:
+        parts.append(f"[{node['Subplan Name']}]")
+    return " ".join(parts)
+
+def plan_shape(node: dict, depth: int = 0) -> list[str]:
+    """
+    プランの形(コスト・行数・時間を除いたノードの木)をインデントした行で返す
+    """
+    lines = ["  " * depth + _node_label(node)]
+    for child in node.get("Plans", []):
+        lines.extend(plan_shape(child, depth + 1))
+    return lines
+
+def plan_metrics(explained: dict) -> dict:
+    root = explained["Plan"]
+    return {
+        "shared_blocks": root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0),
+        "temp_blocks": root.get("Temp Read Blocks", 0) + root.get("Temp Written Blocks", 0),
+        "execution_ms": round(explained["Execution Time"], 3),
+        "rows": root.get("Actual Rows", 0),
+    }
+
+def _limit(baseline: float, tolerance: float, slack: float) -> float:
+    return baseline * tolerance + slack
+
+def compare_statement(baseline: dict, current: dict) -> list[str]:
+    """
+    1つのクエリのベースラインとの差分(問題が無ければ空)
+    """
+    problems = []
+    if baseline["shape"] != current["shape"]:
+        diff = difflib.unified_diff(baseline["shape"], current["shape"], "baseline", "current", lineterm="")
+        problems.append("plan shape changed:\n" + "\n".join(diff))
+    checks = (
+        ("shared_blocks", BUFFER_TOLERANCE, BUFFER_SLACK),
+        ("temp_blocks", BUFFER_TOLERANCE, BUFFER_SLACK),
+        ("execution_ms", TIME_TOLERANCE, TIME_SLACK_MS),
+    )
+    for key, tolerance, slack in checks:
+        limit = _limit(baseline["metrics"][key], tolerance, slack)
+        if current["metrics"][key] > limit:
+            problems.append(f"{key}: {baseline['metrics'][key]} -> {current['metrics'][key]} (limit {limit:g})")
+    return problems
+
+def compare_case(name: str, baseline: list[dict] | None, current: list[dict]) -> list[str]:
+    """
+    ケースのベースラインとの差分を、読める形の行で返す(問題が無ければ空)
+    """
+    if baseline is None:
+        return [f"{name}: no baseline (python -m benchmarks.query_plans --update)"]
+    baseline_sql = [statement["sql"] for statement in baseline]
+    current_sql = [statement["sql"] for statement in current]
+    if baseline_sql != current_sql:
+        diff = difflib.unified_diff(
+            "\n".join(baseline_sql).splitlines(), "\n".join(current_sql).splitlines(), "baseline", "current", lineterm="",
+        )
+        return [f"{name}: statements changed (review the plans and --update):\n" + "\n".join(diff)]
+
+    problems = []
+    for i, (base, cur) in enumerate(zip(baseline, current)):
+        for problem in compare_statement(base, cur):
+            problems.append(f"{name}[{i}] {cur['sql'].splitlines()[0]}\n  " + problem.replace("\n", "\n  "))
+    return problems
+
+def _normalize_sql(sql: str) -> str:
+    return "\n".join(line.strip() for line in sql.strip().splitlines() if line.strip())
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+def load_baseline(name: str) -> list[dict] | None:
+    path = baseline_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(name: str, statements: list[dict]) -> None:
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(name), "w") as f:
+        json.dump(statements, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+### Class definition ###
+
+class PlanRecorder:
+    """
+    ETLのconnector(execute(query, params))とsession(session.execute(text, params))の代わりに渡し、
+    各クエリを実行する前にsavepoint内で EXPLAIN ANALYZE を取ってから、本来のクエリを実行する
+    """
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.statements: list[dict] = []
+
+    def execute(self, query: str | TextClause, params: dict | list[dict] | None = None):
+        sql = query.text if isinstance(query, TextClause) else query
+        # executemanyは先頭の1行で計測する
+        explain_params = params[0] if isinstance(params, list) else params
+        self._explain(sql, explain_params)
+        return self.conn.execute(text(sql), params)
+
+    def explain_prepared(self, sql: str, args: tuple) -> None:
+        """
+        asyncpg用のクエリ($1..)をprepared statementとして計測する(asyncpgと同じく型はサーバーが推論する)
+        """
+        self.conn.exec_driver_sql(f"PREPARE query_plan_stmt AS {sql}")
+        try:
+            binds = ", ".join(f":arg_{i}" for i in range(len(args)))
+            self._explain(sql, {f"arg_{i}": arg for i, arg in enumerate(args)}, f"EXECUTE query_plan_stmt({binds})")
+        finally:
+            self.conn.exec_driver_sql("DEALLOCATE query_plan_stmt")
+
+    def _explain(self, sql: str, params: dict | None, statement: str | None = None) -> None:
+        savepoint = self.conn.begin_nested()
+        try:
+            explained = self.conn.execute(
+                text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement or sql}"), params or {},
+            ).scalar()[0]
+        finally:
+            savepoint.rollback()
+        self.statements.append({
+            "sql": _normalize_sql(sql),
+            "shape": plan_shape(explained["Plan"]),
+            "metrics": plan_metrics(explained),
+        })
+
+    @contextmanager
+    def session_scope(self) -> Iterator["PlanRecorder"]:
+        yield self
+
+
+class _Connector:
+    # seed用(SqlAlchemyConnector.executeと同じ呼び出し方)
+    def __init__(self, conn: Connection):
+        self.conn = conn
+
+    def execute(self, query: str, params: dict | list[dict] | None = None):
+        return self.conn.execute(text(query), params)
+
+
+@dataclass(frozen=True)
+class PlanCase:
+    name: str
+    run: Callable[[PlanRecorder], None]
+    description: str = field(default="", compare=False)
+
+
+##############################
+
+
+### instances generation ###
+
+CASES: list[PlanCase] = []
+
+
+def register(name: str, description: str = ""):
+    def _register(run: Callable[[PlanRecorder], None]):
+        CASES.append(PlanCase(name, run, description))
+        return run
+    return _register
+
+
+@contextmanager
+def _server_session(recorder: PlanRecorder) -> Iterator[None]:
+    original = server.session_scope
+    server.session_scope = recorder.session_scope
+    try:
+        yield
+    finally:
+        server.session_scope = original
+
+
+def _server_configs() -> list:
+    return list(server.PATH_CONFIG_BY_PATH.values())
+
+
+def _relay_last_times() -> dict[str, datetime]:
+    # relayの定常状態(直近の数tickだけが未処理)
+    since = SEED_END - timedelta(seconds=SEED_TICK_SECONDS * 3)
+    return {config.path: since for config in _server_configs()}
+
+
+@register("etl_get_ids", "dim_currency/dim_timeframeのid")
+def _get_ids(recorder):
+    helpers.get_ids(recorder, "USD/JPY", "1m")
+
+
+@register("etl_update_ohlc_base", "tickerから1m足を集計(全件)")
+def _update_ohlc_base(recorder):
+    transform_services.update_ohlc_base_tables(recorder, "USD/JPY", "1m")
+
+
+@register("etl_update_ohlc_derived", "1m足から5m足を集計(全件)")
+def _update_ohlc_derived(recorder):
+    transform_services.update_ohlc_derived_tables(recorder, "USD/JPY", "5m", 300, "1m")
+
+
+@register("etl_update_rsi_incremental", "計算済みの系列の増分")
+def _update_rsi(recorder):
+    transform_services.update_rsi(recorder, period=14, currency_pair_code="USD/JPY", timeframe_code="1m")
+
+
+@register("etl_update_sma_incremental", "計算済みの系列の増分")
+def _update_sma(recorder):
+    transform_services.update_sma(recorder, period=14, currency_pair_code="USD/JPY", timeframe_code="1m")
+
+
+@register("etl_update_sma_initial", "まだ行の無いperiodの全件計算")
+def _update_sma_initial(recorder):
+    transform_services.update_sma(recorder, period=200, currency_pair_code="USD/JPY", timeframe_code="1m")
+
+
+@register("etl_update_ema_incremental", "計算済みの系列の増分")
+def _update_ema(recorder):
+    transform_services.update_ema(recorder, period=14, currency_pair_code="USD/JPY", timeframe_code="1m")
+
+
+@register("etl_insert_sma_cross_signals", "watermark以降のクロスの検出")
+def _insert_sma_cross_signals(recorder):
+    transform_services.insert_sma_cross_signals(recorder, short_period=14, long_period=28)
+
+
+@register("ws_fetch_recent_rows", "起動時のtickのバッファ(threaded)")
+def _fetch_recent_rows(recorder):
+    with _server_session(recorder):
+        server.fetch_recent_rows(_server_configs(), server.WS_TICK_BUFFER_SIZE)
+
+
+@register("ws_recent_rows_asyncpg", "起動時のtickのバッファ(asyncpg)")
+def _recent_rows_asyncpg(recorder):
+    tables = tuple(config.table for config in _server_configs())
+    recorder.explain_prepared(server.recent_rows_sql(tables), (server.WS_TICK_BUFFER_SIZE,))
+
+
+@register("ws_fetch_rows_after", "relayの未処理の行(threaded)")
+def _fetch_rows_after(recorder):
+    with _server_session(recorder):
+        server.fetch_rows_after_by_path(_server_configs(), _relay_last_times())
+
+
+@register("ws_rows_after_asyncpg", "relayの未処理の行(asyncpg)")
+def _rows_after_asyncpg(recorder):
+    configs = _server_configs()
+    last_times = _relay_last_times()
+    tables = tuple(config.table for config in configs)
+    recorder.explain_prepared(server.rows_after_sql(tables), tuple(last_times[config.path] for config in configs))
+
+
+@register("ws_fetch_timeframes", "dim_timeframe")
+def _fetch_timeframes(recorder):
+    with _server_session(recorder):
+        server.fetch_timeframes()
+
+
+@register("ws_fetch_recent_bars", "起動時の確定済みの足")
+def _fetch_recent_bars(recorder):
+    keys = [(config, timeframe) for config in _server_configs() for timeframe in SEED_TIMEFRAMES]
+    with _server_session(recorder):
+        server.fetch_recent_bars(keys, server.OHLC_BAR_CACHE_SIZE)
+
+
+@register("ws_fetch_ohlc_closes", "indicatorの初期化用の終値(全件)")
+def _fetch_ohlc_closes(recorder):
+    with _server_session(recorder):
+        server.fetch_ohlc_closes("USD/JPY", "1m")
+
+
+##############################
+
+
+### main functions ###
+
+def _server_engine() -> Engine:
+    # CREATE/DROP DATABASEはトランザクション外で実行する
+    return create_engine(get_db_url(), isolation_level="AUTOCOMMIT")
+
+def _seeded_version(engine: Engine) -> str | None:
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT to_regclass('public.query_plan_seed')")).scalar()
+        if exists is None:
+            return None
+        return conn.execute(text("SELECT version FROM query_plan_seed")).scalar()
+
+def _migrate(url: URL) -> None:
+    env = {**os.environ, "DATABASE_URL": url.render_as_string(hide_password=False)}
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=PROJECT_ROOT, env=env, check=True)
+
+def _seed(engine: Engine) -> None:
+    with engine.begin() as conn:
+        connector = _Connector(conn)
+        transform_services.create_ticker_tables(connector)
+        pairs = [row[0] for row in conn.execute(text("SELECT currency_pair_code FROM dim_currency ORDER BY id")).all()]
+        start = SEED_END - timedelta(days=SEED_DAYS)
+        for pair in pairs:
+            # 本番と同じく日次/月次のパーティションに入れる(defaultに溜めない)
+            for target in (
+                retention_services.RetentionTarget(
+                    SCHEMA_NAME_TICKER, helpers.ticker_table(pair), retention_services.DAILY, SEED_DAYS),
+                retention_services.RetentionTarget(
+                    SCHEMA_NAME_OHLC, helpers.ohlc_table(pair, "1m"), retention_services.MONTHLY, SEED_DAYS),
+            ):
+                if target.schema == SCHEMA_NAME_OHLC:
+                    transform_services.create_ohlc_tables(connector, currency_pair_code=pair, timeframe_code="1m")
+                retention_services.ensure_partitions(connector, target, start, SEED_END)
+        for i, pair in enumerate(pairs):
+            # 決まった値の疑似的な値動き(実行毎に同じデータになる)
+            conn.execute(text(f"""
+            INSERT INTO {SCHEMA_NAME_TICKER}.{helpers.ticker_table(pair)} (time, bid, ask)
+            SELECT t, 100 + :i * 20 + sin(extract(epoch FROM t) / 3600.0) + 0.1 * sin(extract(epoch FROM t) / 97.0),
+                   100 + :i * 20 + sin(extract(epoch FROM t) / 3600.0) + 0.1 * sin(extract(epoch FROM t) / 97.0) + 0.01
+            FROM generate_series(CAST(:start AS timestamp), CAST(:end AS timestamp) - make_interval(secs => :step),
+                                 make_interval(secs => :step)) AS t
+            """), {"i": i, "start": start, "end": SEED_END, "step": SEED_TICK_SECONDS})
+
+        timeframes = dict(conn.execute(text("SELECT timeframe_code, duration_seconds FROM dim_timeframe")).all())
+        for pair in pairs:
+            for timeframe in timeframes:
+                transform_services.create_ohlc_tables(connector, currency_pair_code=pair, timeframe_code=timeframe)
+            transform_services.update_ohlc_base_tables(connector, pair, "1m")
+            for timeframe, duration_seconds in timeframes.items():
+                if timeframe != "1m":
+                    transform_services.update_ohlc_derived_tables(connector, pair, timeframe, duration_seconds, "1m")
+            for timeframe in SEED_TIMEFRAMES:
+                for period in SEED_PERIODS:
+                    params = {"period": period, "currency_pair_code": pair, "timeframe_code": timeframe}
+                    transform_services.update_rsi(connector, **params)
+                    transform_services.update_sma(connector, **params)
+                    transform_services.update_ema(connector, **params)
+        transform_services.insert_sma_cross_signals(connector, short_period=14, long_period=28)
+
+        conn.execute(text("CREATE TABLE query_plan_seed (version TEXT NOT NULL)"))
+        conn.execute(text("INSERT INTO query_plan_seed (version) VALUES (:version)"), {"version": SEED_VERSION})
+
+    # visibility mapと統計を揃える(Index Only ScanのHeap Fetchesとプランを安定させる)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+
+def prepare_database(reseed: bool = False) -> Engine:
+    """
+    計測用のDBを用意する(無い・seedの版が違う・reseedの場合は作り直す)
+    """
+    url = plan_db_url()
+    server_engine = _server_engine()
+    with server_engine.connect() as conn:
+        exists = conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": QUERY_PLAN_DB}).scalar()
+    engine = create_engine(url)
+    if exists and not reseed and _seeded_version(engine) == SEED_VERSION:
+        # 新しいmigration(インデックスの追加など)は、seed済みのデータにもそのまま適用する
+        _migrate(url)
+        # 中断した実行の残り(ROLLBACKした行)も片付ける
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE"))
+        return engine
+
+    engine.dispose()
+    with server_engine.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{QUERY_PLAN_DB}" WITH (FORCE)'))
+        conn.execute(text(f'CREATE DATABASE "{QUERY_PLAN_DB}" TEMPLATE template0 ENCODING \'UTF8\''))
+    server_engine.dispose()
+    _migrate(url)
+    engine = create_engine(url)
+    _seed(engine)
+    return engine
+
+def _vacuum(engine: Engine, tables: list[str]) -> None:
+    if not tables:
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"VACUUM {', '.join(tables)}"))
+
+def run_case(engine: Engine, case: PlanCase) -> list[dict]:
+    """
+    ケースを2回実行し(1回目はキャッシュを温める)、2回目の各クエリの計測結果を返す
+    ROLLBACKしたinsertの行はインデックスに残り、次の実行のbuffersを増やすため、書き込んだテーブルは毎回VACUUMする
+    """
+    statements = []
+    for _ in range(2):
+        with engine.connect() as conn:
+            transaction = conn.begin()
+            try:
+                for setting in SESSION_SETTINGS:
+                    conn.execute(text(setting))
+                recorder = PlanRecorder(conn)
+                case.run(recorder)
+                statements = recorder.statements
+                written = conn.execute(text("""
+                SELECT format('%I.%I', schemaname, relname)
+                FROM pg_stat_xact_user_tables
+                WHERE n_tup_ins + n_tup_upd + n_tup_del > 0
+                """)).scalars().all()
+            finally:
+                transaction.rollback()
+        _vacuum(engine, written)
+    return statements
+
+def run_all(engine: Engine, names: list[str] | None = None) -> dict[str, list[dict]]:
+    return {case.name: run_case(engine, case) for case in CASES if names is None or case.name in names}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cases", nargs="*", help="計測するケース(省略時は全て)")
+    parser.add_argument("--update", action="store_true", help="ベースラインを書き直す")
+    parser.add_argument("--reseed", action="store_true", help="計測用のDBを作り直す")
+    args = parser.parse_args()
+
+    engine = prepare_database(reseed=args.reseed)
+    results = run_all(engine, args.cases or None)
+    failed = False
+    for name, statements in results.items():
+        if args.update:
+            save_baseline(name, statements)
+            print(f"updated {baseline_path(name)}")
+            continue
+        problems = compare_case(name, load_baseline(name), statements)
+        failed = failed or bool(problems)
+        status = "FAIL" if problems else "ok"
+        total_ms = sum(statement["metrics"]["execution_ms"] for statement in statements)
+        print(f"{status:4} {name} ({len(statements)} statements, {total_ms:.1f} ms)")
+        for problem in problems:
+            print("  " + problem.replace("\n", "\n  "))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
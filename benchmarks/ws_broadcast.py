@@ -0,0 +1,94 @@
+"""
+broadcastの計測: clientへ個別にjson.dumps + gather(従来) と、1回エンコード + client毎の送信キュー
+受信の遅いclientを一部に混ぜた合成clientで、N件のメッセージを配信し終えるまでの時間を比べる
+
+    python -m benchmarks.ws_broadcast [n_clients] [n_messages] [slow_ratio]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from src.gmo import ws_ticker_server as server
+
+SLOW_DELAY_SECONDS = 0.02
+
+
+class FakeClient:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+
+    async def send(self, message: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        self.received += 1
+
+    async def close(self, code=1000, reason="") -> None:
+        pass
+
+
+def payload(seq: int) -> dict:
+    return {"type": "ticker", "symbol": "USD_JPY", "bid": 150.0 + seq / 1000, "ask": 150.01, "timestamp": str(seq)}
+
+
+async def legacy_broadcast(clients: list[FakeClient], payload: dict) -> None:
+    async def _send_json(client):
+        await client.send(json.dumps(payload))
+
+    await asyncio.gather(*(_send_json(client) for client in clients), return_exceptions=True)
+
+
+def _clients(n_clients: int, slow_ratio: float) -> list[FakeClient]:
+    n_slow = int(n_clients * slow_ratio)
+    return [FakeClient(SLOW_DELAY_SECONDS if i < n_slow else 0.0) for i in range(n_clients)]
+
+
+async def run_legacy(n_clients: int, n_messages: int, slow_ratio: float) -> tuple[float, float]:
+    clients = _clients(n_clients, slow_ratio)
+    started, cpu_started = time.perf_counter(), time.process_time()
+    for seq in range(n_messages):
+        await legacy_broadcast(clients, payload(seq))
+    return time.perf_counter() - started, time.process_time() - cpu_started
+
+
+async def run_queued(n_clients: int, n_messages: int, slow_ratio: float, policy: str) -> tuple[float, float, int]:
+    clients = _clients(n_clients, slow_ratio)
+    registry = server.ClientRegistry()
+    sessions = [server.ClientSession(client, max_queue=32, policy=policy) for client in clients]
+    writers = [asyncio.create_task(session.run_writer()) for session in sessions]
+    for session in sessions:
+        await registry.add(session)
+
+    fast = [client for client in clients if not client.delay]
+    started, cpu_started = time.perf_counter(), time.process_time()
+    for seq in range(n_messages):
+        await server.broadcast_to_registry(registry, payload(seq))
+        await asyncio.sleep(0)
+    # 受信の速いclientが全件受け取るまで
+    while any(client.received < n_messages for client in fast):
+        await asyncio.sleep(0.001)
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+
+    for writer in writers:
+        writer.cancel()
+    return elapsed, cpu, sum(session.dropped for session in sessions)
+
+
+async def main():
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    n_messages = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    slow_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    print(f"clients={n_clients} messages={n_messages} slow_ratio={slow_ratio}")
+
+    elapsed, cpu = await run_legacy(n_clients, n_messages, slow_ratio)
+    print(f"legacy (dumps per client + gather): elapsed={elapsed:.2f}s cpu={cpu:.2f}s")
+    for policy in server.SLOW_CONSUMER_POLICIES:
+        elapsed, cpu, dropped = await run_queued(n_clients, n_messages, slow_ratio, policy)
+        print(f"queued ({policy}): elapsed={elapsed:.2f}s cpu={cpu:.2f}s dropped={dropped}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
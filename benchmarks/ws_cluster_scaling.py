@@ -0,0 +1,35 @@
+"""
+ws_ticker_clusterの負荷試験: worker数を変えて、同じclient数・tick rateでの配信を比べる
+DBは使わず、ベンチマークのプロセスがrelayとして合成tickをworkerへ送る(clientと計測はws_load_testと共通)
+
+    python -m benchmarks.ws_cluster_scaling [n_clients] [ticks_per_second] [seconds] [workers,...]
+"""
+import asyncio
+import os
+import sys
+
+from benchmarks.ws_load_test import LoadTestConfig, run_load_test
+
+
+async def main():
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    ticks_per_second = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    worker_counts = [int(n) for n in sys.argv[4].split(",")] if len(sys.argv) > 4 else [1, 2, 4]
+    print(f"clients={n_clients} ticks/s={ticks_per_second} seconds={seconds} cpus={os.cpu_count()}")
+    print("| workers | connected | failed | dropped | delivered | msgs/s | p50 ms | p99 ms | server cpu % |")
+    print("|---|---|---|---|---|---|---|---|---|")
+    for n_workers in worker_counts:
+        config = LoadTestConfig(
+            clients=n_clients, rate=ticks_per_second, seconds=seconds, workers=n_workers, multiplex_ratio=0.0
+        )
+        r = (await run_load_test(config))["results"]
+        print(
+            f"| {n_workers} | {r['connected']} | {r['connect_failed']} | {r['dropped']} | {r['delivered_ratio']:.3f} "
+            f"| {r['messages_per_second']:.0f} | {r['latency_p50_ms']:.1f} | {r['latency_p99_ms']:.1f} "
+            f"| {r.get('server_cpu_percent_avg', float('nan')):.0f} |"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""
+ws_ticker_serverのrelayのクエリを、threaded(SQLAlchemy + asyncio.to_thread + session_scope)と
+asyncpg(プール + prepared statementの再利用)で比べる(ローカルのPostgresが必要)
+
+- latency: 1本ずつ順番に投げた時の1クエリの時間
+- throughput: concurrency本を同時に投げ続けた時のクエリ/秒(イベントループ上の他の処理と並ぶ状況)
+
+    python -m benchmarks.ws_db_driver [n_queries] [concurrency]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.database import async_base
+from src.gmo import ws_ticker_server as server
+
+
+def _last_times() -> dict[str, datetime]:
+    # relayの定常状態と同じく、直近の行だけを問い合わせる
+    since = datetime.now(timezone.utc) - timedelta(seconds=5)
+    return {path: since for path in server.PATH_CONFIG_BY_PATH}
+
+
+async def _threaded(configs, last_times):
+    return await asyncio.to_thread(server.fetch_rows_after_by_path, configs, last_times)
+
+
+async def _asyncpg(configs, last_times):
+    return await server.fetch_rows_after_by_path_async(configs, last_times)
+
+
+async def measure(query, n_queries: int, concurrency: int) -> dict:
+    configs = list(server.PATH_CONFIG_BY_PATH.values())
+    last_times = _last_times()
+    # 接続・prepareを済ませておく
+    await query(configs, last_times)
+
+    latencies = []
+    for _ in range(n_queries):
+        started = time.perf_counter()
+        await query(configs, last_times)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    async def _worker(count: int):
+        for _ in range(count):
+            await query(configs, last_times)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(n_queries // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "queries_per_s": (n_queries // concurrency) * concurrency / elapsed,
+    }
+
+
+async def main():
+    n_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"queries={n_queries} concurrency={concurrency} tables={len(server.PATH_CONFIG_BY_PATH)}")
+    print("| driver | p50 ms | p99 ms | queries/s |")
+    print("|---|---|---|---|")
+    for name, query in (("thread", _threaded), ("asyncpg", _asyncpg)):
+        r = await measure(query, n_queries, concurrency)
+        print(f"| {name} | {r['p50_ms']:.2f} | {r['p99_ms']:.2f} | {r['queries_per_s']:.0f} |")
+    await async_base.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+tickerのwire formatの計測: 1tickあたりのバイト数(非圧縮/permessage-deflate相当)と、1メッセージあたりのエンコードCPU時間
+
+    python -m benchmarks.ws_encoding [n_ticks] [batch_size]
+"""
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from src.gmo import ws_ticker_server as server
+
+
+def ticks(n: int) -> list[dict]:
+    rng = np.random.default_rng(0)
+    bids = 150 + np.cumsum(rng.normal(0, 0.003, n))
+    epoch_ms = 1_767_600_000_000 + np.arange(n) * 1_000
+    return [
+        {
+            "type": "ticker",
+            "symbol": "USD_JPY",
+            "bid": round(float(bid), 3),
+            "ask": round(float(bid) + 0.004, 3),
+            "mid": round(float(bid) + 0.002, 4),
+            "timestamp": server.format_epoch_ms(int(ms)),
+            "_epoch_ms": int(ms),
+        }
+        for bid, ms in zip(bids, epoch_ms)
+    ]
+
+
+def frames(payloads: list[dict], encoding: str, batch_size: int) -> tuple[list[str | bytes], float]:
+    """
+    ClientSessionと同じ手順でフレームを作り、(フレーム, 1tickあたりのCPU秒)を返す
+    """
+    session = server.ClientSession(None, encoding=encoding, batch_ms=1 if batch_size > 1 else 0, max_queue=len(payloads))
+    result = []
+    started = time.process_time()
+    for start in range(0, len(payloads), batch_size):
+        for payload in payloads[start:start + batch_size]:
+            epoch_ms = payload["_epoch_ms"]
+            message = server.EncodedMessage({k: v for k, v in payload.items() if k != "_epoch_ms"}, epoch_ms)
+            session.send_message(message)
+        while session._queue:
+            result.append(session._next_frame())
+    return result, (time.process_time() - started) / len(payloads)
+
+
+def deflated_size(frames_: list[str | bytes]) -> int:
+    # permessage-deflate(context takeover, window_bits=12)と同じく、フレーム毎にZ_SYNC_FLUSHして末尾4byteを除く
+    compressor = zlib.compressobj(server.WS_COMPRESSION_LEVEL, zlib.DEFLATED, -server.WS_COMPRESSION_WINDOW_BITS)
+    total = 0
+    for frame in frames_:
+        data = frame.encode() if isinstance(frame, str) else frame
+        total += len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+
+def main():
+    n_ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    payloads = ticks(n_ticks)
+
+    print(f"ticks={n_ticks}")
+    print(f"{'encoding':>16} {'bytes/tick':>11} {'deflate/tick':>13} {'cpu us/tick':>12}")
+    for encoding in server.ENCODINGS:
+        for size in (1, batch_size):
+            encoded, cpu = frames(payloads, encoding, size)
+            raw = sum(len(frame.encode() if isinstance(frame, str) else frame) for frame in encoded)
+            label = f"{encoding}" + (f" x{size}" if size > 1 else "")
+            print(
+                f"{label:>16} {raw / n_ticks:>11.1f} {deflated_size(encoded) / n_ticks:>13.1f} {cpu * 1e6:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+ws_ticker_serverの負荷試験
+複数のプロセスから多数のclientを接続し、合成tickの配信について次を記録する
+
+- サーバー → clientのlatency(tickの時刻から受信まで)のパーセンタイル
+- 接続に失敗した・途中で切断されたclientの数、配信できた割合
+- サーバープロセスのCPU使用率とメモリ(/proc から取得)
+
+tickの入力は2通り:
+
+- relay(既定): このツールがrelayとしてworkerへ直接tickを流す。サーバー(worker)もこのツールが起動する(DB不要)
+- db: ローカルのPostgresのtickerテーブルへinsertし、起動済みのサーバーが配信する
+
+結果はjsonで保存し、--compareでバージョン間の差を表示する
+
+    python -m benchmarks.ws_load_test --clients 5000 --workers 2 --rate 50 --seconds 30 --report before.json
+    python -m benchmarks.ws_load_test --feed db --url ws://localhost:8765 --server-pid 1234 --report after.json
+    python -m benchmarks.ws_load_test --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import tempfile
+import time
+from array import array
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+from websockets.asyncio.client import connect
+
+from src.gmo import ws_ticker_cluster as cluster
+from src.gmo import ws_ticker_server as server
+
+PERCENTILES = (50, 90, 99, 99.9)
+SAMPLE_INTERVAL_SECONDS = 0.5
+CONNECT_TIMEOUT_SECONDS = 60
+# 全tickを配信し終えるまでの猶予
+DRAIN_SECONDS = 2.0
+
+
+@dataclass
+class LoadTestConfig:
+    clients: int = 1_000
+    rate: float = 50.0
+    seconds: float = 10.0
+    feed: str = "relay"
+    workers: int = 1
+    client_processes: int = 4
+    # /ws/streamで全通貨ペアを購読するclientの割合(残りは通貨ペア毎のpath)
+    multiplex_ratio: float = 0.1
+    url: str = "ws://127.0.0.1:18765"
+    server_pids: tuple[int, ...] = ()
+
+
+### server process metrics ###
+
+def _read_cpu_ticks(pid: int) -> int:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime, stime(ステータス以降の14, 15番目)
+    return int(fields[11]) + int(fields[12])
+
+def _read_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class ProcessSampler:
+    """
+    サーバープロセス(複数可)のCPU使用率(1コア=100%)とRSSの合計を一定間隔で記録する
+    """
+    def __init__(self, pids: tuple[int, ...]):
+        self.pids = pids
+        self.cpu_percent: list[float] = []
+        self.rss_mb: list[float] = []
+
+    async def run(self) -> None:
+        ticks_per_second = os.sysconf("SC_CLK_TCK")
+        previous, previous_time = self._cpu_ticks(), time.monotonic()
+        while True:
+            await asyncio.sleep(SAMPLE_INTERVAL_SECONDS)
+            current, now = self._cpu_ticks(), time.monotonic()
+            self.cpu_percent.append((current - previous) / ticks_per_second / (now - previous_time) * 100)
+            self.rss_mb.append(sum(self._safe(_read_rss_mb, pid) for pid in self.pids))
+            previous, previous_time = current, now
+
+    def _cpu_ticks(self) -> int:
+        return sum(self._safe(_read_cpu_ticks, pid) for pid in self.pids)
+
+    @staticmethod
+    def _safe(read, pid: int):
+        try:
+            return read(pid)
+        except (FileNotFoundError, ProcessLookupError):
+            return 0
+
+    def summary(self) -> dict:
+        if not self.cpu_percent:
+            return {}
+        return {
+            "server_cpu_percent_avg": float(np.mean(self.cpu_percent)),
+            "server_cpu_percent_max": float(np.max(self.cpu_percent)),
+            "server_rss_mb_max": float(np.max(self.rss_mb)),
+        }
+
+##############################
+
+
+### client process ###
+
+async def _client(url: str, symbols: tuple[str, ...] | None, seconds: float, stats: dict, ready: asyncio.Event, started: asyncio.Event) -> None:
+    connected = False
+    try:
+        async with connect(url, max_queue=None, open_timeout=CONNECT_TIMEOUT_SECONDS) as ws:
+            connected = True
+            stats["connected"] += 1
+            if symbols is not None:
+                await ws.send(json.dumps({"type": "subscribe", "channels": ["ticker"], "symbols": list(symbols)}))
+            ready.set()
+            await started.wait()
+            # 接続時のsnapshot(計測開始前のtick)はlatencyに含めない
+            started_ms = time.time() * 1000
+            deadline = time.time() + seconds
+            while (remaining := deadline - time.time()) > 0:
+                try:
+                    frame = await asyncio.wait_for(ws.recv(), timeout=remaining)
+                except TimeoutError:
+                    break
+                if not isinstance(frame, bytes):
+                    continue
+                now_ms = time.time() * 1000
+                for _, epoch_ms, _, _ in server.BINARY_TICK.iter_unpack(frame[server.BINARY_HEADER.size:]):
+                    if epoch_ms >= started_ms:
+                        stats["latencies"].append(now_ms - epoch_ms)
+    except Exception:
+        stats["dropped" if connected else "connect_failed"] += 1
+    finally:
+        ready.set()
+
+
+def client_process(targets: list[tuple[str, tuple[str, ...] | None]], seconds: float, queue, start_event) -> None:
+    async def _run():
+        stats = {"connected": 0, "connect_failed": 0, "dropped": 0, "latencies": array("d")}
+        readies = [asyncio.Event() for _ in targets]
+        started = asyncio.Event()
+        tasks = [
+            asyncio.create_task(_client(url, symbols, seconds, stats, ready, started))
+            for (url, symbols), ready in zip(targets, readies)
+        ]
+        await asyncio.gather(*(ready.wait() for ready in readies))
+        queue.put(("ready", stats["connected"], stats["connect_failed"]))
+        await asyncio.to_thread(start_event.wait)
+        started.set()
+        await asyncio.gather(*tasks)
+        return stats
+
+    stats = asyncio.run(_run())
+    queue.put(("done", {**stats, "latencies": stats["latencies"].tobytes()}))
+
+######################
+
+
+### tick feeds ###
+
+def _synthetic_tick(seq: int) -> tuple[server.StreamConfig, float]:
+    configs = list(server.PATH_CONFIG_BY_PATH.values())
+    return configs[seq % len(configs)], 150.0 + random.random()
+
+
+async def feed_relay(publisher: cluster.RelayPublisher, rate: float, seconds: float) -> dict[str, int]:
+    sent = {symbol: 0 for symbol in server.SYMBOLS}
+    started = time.perf_counter()
+    for seq in range(int(rate * seconds)):
+        await asyncio.sleep(max(0.0, started + seq / rate - time.perf_counter()))
+        config, bid = _synthetic_tick(seq)
+        payload = {"bid": bid, "ask": bid + 0.01, "type": "ticker", "symbol": config.symbol, "mid": bid + 0.005}
+        publisher.publish(config, server.EncodedMessage(payload, int(time.time() * 1000)))
+        sent[config.symbol] += 1
+    return sent
+
+
+async def feed_db(rate: float, seconds: float) -> dict[str, int]:
+    from sqlalchemy import text
+
+    from src.config.config import SCHEMA_NAME_TICKER
+    from src.database.base import session_scope
+
+    def _insert(config: server.StreamConfig, row_time: datetime, bid: float) -> None:
+        with session_scope() as session:
+            session.execute(
+                text(f"INSERT INTO {SCHEMA_NAME_TICKER}.{config.table} (time, bid, ask) VALUES (:time, :bid, :ask) ON CONFLICT DO NOTHING;"),
+                {"time": row_time.replace(tzinfo=None), "bid": bid, "ask": bid + 0.01},
+            )
+
+    sent = {symbol: 0 for symbol in server.SYMBOLS}
+    started = time.perf_counter()
+    for seq in range(int(rate * seconds)):
+        await asyncio.sleep(max(0.0, started + seq / rate - time.perf_counter()))
+        config, bid = _synthetic_tick(seq)
+        now = datetime.now(timezone.utc)
+        # clientは時刻(ms)でlatencyを測るため、msに切り捨てる
+        await asyncio.to_thread(_insert, config, now.replace(microsecond=now.microsecond // 1000 * 1000), bid)
+        sent[config.symbol] += 1
+    return sent
+
+##################
+
+
+def _git_version() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _targets(config: LoadTestConfig) -> list[tuple[str, tuple[str, ...] | None]]:
+    """
+    (url, /ws/streamで購読する通貨ペア)。通貨ペア毎のpathはNone
+    """
+    configs = list(server.PATH_CONFIG_BY_PATH.values())
+    n_multiplex = int(config.clients * config.multiplex_ratio)
+    targets = [(f"{config.url}{server.MULTIPLEX_PATH}?encoding=binary", tuple(server.SYMBOLS)) for _ in range(n_multiplex)]
+    targets += [
+        (f"{config.url}{configs[i % len(configs)].path}?encoding=binary", None)
+        for i in range(config.clients - n_multiplex)
+    ]
+    return targets
+
+def _expected_messages(targets: list[tuple[str, tuple[str, ...] | None]], base_url: str, sent: dict[str, int]) -> int:
+    expected = 0
+    for url, symbols in targets:
+        if symbols is None:
+            symbols = (server.PATH_CONFIG_BY_PATH[url[len(base_url):].split("?")[0]].symbol,)
+        expected += sum(sent[symbol] for symbol in symbols)
+    return expected
+
+
+async def run_load_test(config: LoadTestConfig) -> dict:
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    publisher = unix_server = None
+    workers = []
+    server_pids = config.server_pids
+    if config.feed == "relay":
+        socket_path = os.path.join(tempfile.mkdtemp(), "relay.sock")
+        publisher = cluster.RelayPublisher()
+        unix_server = await asyncio.start_unix_server(publisher.handle_worker, path=socket_path)
+        host, port = config.url.removeprefix("ws://").rsplit(":", 1)
+        workers = cluster.start_workers(config.workers, host, int(port), socket_path)
+        server_pids = tuple(worker.pid for worker in workers)
+        while len(publisher) < config.workers:
+            await asyncio.sleep(0.05)
+    elif config.feed != "db":
+        raise ValueError("feed must be relay or db")
+
+    context = multiprocessing.get_context("spawn")
+    queue, start_event = context.Queue(), context.Event()
+    targets = _targets(config)
+    processes = [
+        context.Process(
+            target=client_process,
+            args=(targets[i::config.client_processes], config.seconds + DRAIN_SECONDS, queue, start_event),
+        )
+        for i in range(config.client_processes)
+    ]
+    sampler = ProcessSampler(server_pids)
+    try:
+        for process in processes:
+            process.start()
+        connected = connect_failed = 0
+        connect_started = time.perf_counter()
+        for _ in processes:
+            _, n_connected, n_failed = await asyncio.to_thread(queue.get)
+            connected, connect_failed = connected + n_connected, connect_failed + n_failed
+        connect_seconds = time.perf_counter() - connect_started
+
+        sampler_task = asyncio.create_task(sampler.run())
+        start_event.set()
+        await asyncio.sleep(0.5)
+        if publisher is not None:
+            sent = await feed_relay(publisher, config.rate, config.seconds)
+        else:
+            sent = await feed_db(config.rate, config.seconds)
+        results = [(await asyncio.to_thread(queue.get))[1] for _ in processes]
+        sampler_task.cancel()
+    finally:
+        for process in processes:
+            process.join(timeout=10)
+        for worker in workers:
+            worker.terminate()
+            worker.join()
+        if unix_server is not None:
+            unix_server.close()
+            while len(publisher):
+                await asyncio.sleep(0.01)
+
+    expected = _expected_messages(targets, config.url, sent)
+    latencies = np.concatenate([np.frombuffer(result["latencies"]) for result in results] + [np.empty(0)])
+    dropped = sum(result["dropped"] for result in results)
+    return {
+        "version": _git_version(),
+        "started_at": started_at,
+        "config": {**asdict(config), "server_pids": list(server_pids)},
+        "results": {
+            "connected": connected,
+            "connect_failed": connect_failed,
+            "connect_seconds": connect_seconds,
+            "dropped": dropped,
+            "messages": len(latencies),
+            "delivered_ratio": len(latencies) / expected if expected else 0.0,
+            "messages_per_second": len(latencies) / config.seconds,
+            **{
+                f"latency_p{p:g}_ms": float(np.percentile(latencies, p)) if len(latencies) else None
+                for p in PERCENTILES
+            },
+            "latency_max_ms": float(latencies.max()) if len(latencies) else None,
+            **sampler.summary(),
+        },
+    }
+
+
+def compare_reports(before: dict, after: dict) -> list[str]:
+    lines = [
+        f"| metric | {before['version']} | {after['version']} | change |",
+        "|---|---|---|---|",
+    ]
+    for key, old in before["results"].items():
+        new = after["results"].get(key)
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "-"
+        lines.append(f"| {key} | {old:.4g} | {new:.4g} | {change} |")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="ws_ticker_server load test")
+    parser.add_argument("--clients", type=int, default=LoadTestConfig.clients)
+    parser.add_argument("--rate", type=float, default=LoadTestConfig.rate, help="synthetic ticks per second (all pairs)")
+    parser.add_argument("--seconds", type=float, default=LoadTestConfig.seconds)
+    parser.add_argument("--feed", choices=("relay", "db"), default=LoadTestConfig.feed)
+    parser.add_argument("--workers", type=int, default=LoadTestConfig.workers, help="server workers (relay feed)")
+    parser.add_argument("--client-processes", type=int, default=LoadTestConfig.client_processes)
+    parser.add_argument("--multiplex-ratio", type=float, default=LoadTestConfig.multiplex_ratio)
+    parser.add_argument("--url", default=LoadTestConfig.url)
+    parser.add_argument("--server-pid", type=int, action="append", default=[], help="server pid to sample (db feed)")
+    parser.add_argument("--report", default=None, help="write the report json to this path")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), default=None)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        before, after = reports
+        print("\n".join(compare_reports(before, after)))
+        return
+
+    config = LoadTestConfig(
+        clients=args.clients,
+        rate=args.rate,
+        seconds=args.seconds,
+        feed=args.feed,
+        workers=args.workers,
+        client_processes=args.client_processes,
+        multiplex_ratio=args.multiplex_ratio,
+        url=args.url,
+        server_pids=tuple(args.server_pid),
+    )
+    report = asyncio.run(run_load_test(config))
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
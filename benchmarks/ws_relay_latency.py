@@ -0,0 +1,75 @@
+"""
+ws_ticker_serverのingestionから配信までのlatencyを計測する(notify/poll/bridgeの比較用)
+ingestionと同じ手順(bridgeへ送信 → tickerテーブルへinsert)で現在時刻のtickを流し、
+wsで受信するまでの時間を測る(起点はingestionがtickを受け取った時刻)
+
+    DB_RELAY_MODE=poll python -m src.gmo.ws_ticker_server
+    python -m benchmarks.ws_relay_latency [n_rows] [interval_seconds] db
+
+    DB_RELAY_MODE=notify python -m src.gmo.ws_ticker_server
+    python -m benchmarks.ws_relay_latency [n_rows] [interval_seconds] db
+
+    TICK_BRIDGE_SOCKET=/tmp/tick_bridge.sock python -m src.gmo.ws_ticker_server
+    TICK_BRIDGE_SOCKET=/tmp/tick_bridge.sock python -m benchmarks.ws_relay_latency [n_rows] [interval_seconds] bridge
+"""
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import websockets
+from sqlalchemy import text
+
+from src.config.config import SCHEMA_NAME_TICKER
+from src.database.base import session_scope
+from src.gmo.tick_bridge import TICK_BRIDGE_SOCKET, TickBridgePublisher
+
+URL = "ws://localhost:8765/ws/ticker_usd_jpy"
+TABLE = "ticker_usd_jpy"
+
+
+def insert_row(row_time: datetime) -> None:
+    with session_scope() as session:
+        session.execute(
+            text(f"INSERT INTO {SCHEMA_NAME_TICKER}.{TABLE} (time, bid, ask) VALUES (:time, 150.0, 150.01);"),
+            {"time": row_time.replace(tzinfo=None)},
+        )
+
+
+async def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else 0.37
+    mode = sys.argv[3] if len(sys.argv) > 3 else "db"
+    bridge = TickBridgePublisher(TICK_BRIDGE_SOCKET) if mode == "bridge" else None
+    ingested_at: dict[str, float] = {}
+    received_at: dict[str, float] = {}
+
+    async with websockets.connect(URL) as ws:
+        await asyncio.wait_for(ws.recv(), timeout=5)  # 接続直後のキャッシュ
+
+        async def _receive():
+            while len(received_at) < n_rows:
+                data = json.loads(await ws.recv())
+                if data.get("type") == "ticker":
+                    received_at[data["timestamp"]] = time.perf_counter()
+
+        receiver = asyncio.create_task(_receive())
+        for _ in range(n_rows):
+            now = datetime.now(timezone.utc)
+            row_time = now.replace(microsecond=now.microsecond // 1000 * 1000)
+            ingested_at[row_time.isoformat(timespec="milliseconds").replace("+00:00", "Z")] = time.perf_counter()
+            if bridge is not None:
+                bridge.publish("USD_JPY", int(row_time.timestamp() * 1000), 150.0, 150.01)
+            await asyncio.to_thread(insert_row, row_time)
+            await asyncio.sleep(interval)
+        await asyncio.wait_for(receiver, timeout=60)
+
+    latencies = [(received_at[key] - sent) * 1000 for key, sent in ingested_at.items() if key in received_at]
+    values = np.array(latencies)
+    print(f"mode={mode} rows={len(values)} p50={np.percentile(values, 50):.1f}ms p95={np.percentile(values, 95):.1f}ms max={values.max():.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,6 +8,8 @@ load_dotenv()
 
 SCHEMA_NAME_OHLC = "ohlc"
 SCHEMA_NAME_TICKER = "ticker"
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+CONFIG_DIR = os.path.join(PROJECT_ROOT, "config")
 
 
 ### params for indicator setting ###
@@ -19,6 +21,7 @@ DEFAULT_PERIODS = [14, 28, 56]
 DEFAULT_TIMEFRAMES = ["1m", "5m", "30m", "1h", "4h"]
 DEFAULT_SHORT_PERIOD = 14
 DEFAULT_LONG_PERIOD = 28
+DEFAULT_STRATEGY_DEFINITIONS_PATH = os.path.join(CONFIG_DIR, "strategies.yaml")
 
 
 def _get_str_env(name: str, default: str) -> str:
@@ -43,6 +46,17 @@ def _get_int_env(name: str, default: int) -> int:
         raise ValueError(f"{name} must be an integer: {value!r}") from exc
 
 
+def _get_float_env(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None:
+        return default
+
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be a number: {value!r}") from exc
+
+
 def _get_int_list_env(name: str, default: list[int]) -> list[int]:
     value = os.getenv(name)
     if value is None:
@@ -90,12 +104,7 @@ SMA_FLOW_DEFAULT_PARAMS = {
     "timeframes": _get_str_list_env("DEFAULT_TIMEFRAMES", DEFAULT_TIMEFRAMES),
 }
 
-SMA_GOLDEN_CROSS_PARAMS = {
-    "short_period": _get_int_env("DEFAULT_SHORT_PERIOD", DEFAULT_SHORT_PERIOD),
-    "long_period": _get_int_env("DEFAULT_LONG_PERIOD", DEFAULT_LONG_PERIOD),
-}
-
-SMA_DEAD_CROSS_PARAMS = {
+SMA_CROSS_PARAMS = {
     "short_period": _get_int_env("DEFAULT_SHORT_PERIOD", DEFAULT_SHORT_PERIOD),
     "long_period": _get_int_env("DEFAULT_LONG_PERIOD", DEFAULT_LONG_PERIOD),
 }
@@ -111,3 +120,46 @@ EMA_FLOW_DEFAULT_PARAMS = {
     "periods": _get_int_list_env("DEFAULT_PERIODS", DEFAULT_PERIODS),
     "timeframes": _get_str_list_env("DEFAULT_TIMEFRAMES", DEFAULT_TIMEFRAMES),
 }
+
+SIGNAL_RULES_FLOW_DEFAULT_PARAMS = {
+    "strategy_path": _get_str_env("STRATEGY_DEFINITIONS_PATH", DEFAULT_STRATEGY_DEFINITIONS_PATH),
+    "currency_pair_code": _get_str_env("DEFAULT_CURRENCY_PAIR_CODE", DEFAULT_CURRENCY_PAIR_CODE),
+    "timeframes": _get_str_list_env("DEFAULT_TIMEFRAMES", DEFAULT_TIMEFRAMES),
+}
+
+
+### params for backtest ###
+
+DEFAULT_BACKTEST_CACHE_DIR = os.path.join(PROJECT_ROOT, ".cache", "backtest")
+DEFAULT_BACKTEST_CACHE_MAX_ENTRIES = 256
+
+BACKTEST_CACHE_DIR = _get_str_env("BACKTEST_CACHE_DIR", DEFAULT_BACKTEST_CACHE_DIR)
+BACKTEST_CACHE_MAX_ENTRIES = _get_int_env("BACKTEST_CACHE_MAX_ENTRIES", DEFAULT_BACKTEST_CACHE_MAX_ENTRIES)
+
+
+### params for retention ###
+
+# tick(ticker)は日次、1m足は月次のパーティション。保持期間を過ぎたパーティションはparquetに書き出してdropする
+DEFAULT_ARCHIVE_DIR = os.path.join(PROJECT_ROOT, "archive")
+DEFAULT_TICKER_RETENTION_DAYS = 30
+DEFAULT_OHLC_BASE_RETENTION_DAYS = 365
+DEFAULT_PARTITION_PREMAKE_DAYS = 7
+DEFAULT_RESTORE_HOLD_DAYS = 7
+
+RETENTION_FLOW_DEFAULT_PARAMS = {
+    "archive_dir": _get_str_env("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR),
+    "ticker_retention_days": _get_int_env("TICKER_RETENTION_DAYS", DEFAULT_TICKER_RETENTION_DAYS),
+    "ohlc_base_retention_days": _get_int_env("OHLC_BASE_RETENTION_DAYS", DEFAULT_OHLC_BASE_RETENTION_DAYS),
+    "premake_days": _get_int_env("PARTITION_PREMAKE_DAYS", DEFAULT_PARTITION_PREMAKE_DAYS),
+    "restore_hold_days": _get_int_env("RESTORE_HOLD_DAYS", DEFAULT_RESTORE_HOLD_DAYS),
+}
+
+### params for paper trading ###
+
+DEFAULT_PAPER_TRADING_WS_URL = "ws://localhost:8765"
+DEFAULT_PAPER_TRADING_LATENCY_BUDGET_MS = 50.0
+
+PAPER_TRADING_WS_URL = _get_str_env("PAPER_TRADING_WS_URL", DEFAULT_PAPER_TRADING_WS_URL)
+PAPER_TRADING_LATENCY_BUDGET_MS = _get_float_env(
+    "PAPER_TRADING_LATENCY_BUDGET_MS", DEFAULT_PAPER_TRADING_LATENCY_BUDGET_MS
+)
@@ -0,0 +1,148 @@
+# backtest result cache
+"""
+BacktestFX.runの結果をローカルディスクにキャッシュする。
+
+キーは「正規化したシナリオ(calc_versionとENGINE_VERSIONを含む)」のハッシュと「参照したデータの範囲
+(OHLC/イベントの最終時刻、イベント件数)」のハッシュの組み合わせで、ファイル名は
+<scenario_hash>-<data_hash>.pkl になる。同じシナリオの古いエントリは、新しい足が
+追加されたときに続きを計算する起点として使う。
+
+エントリ数がmax_entriesを超えると、最後に参照された時刻(mtime)が古いものから削除する。
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.config.config import BACKTEST_CACHE_DIR, BACKTEST_CACHE_MAX_ENTRIES
+from src.core.backtest_engine import ENGINE_VERSION, BacktestResult, BacktestScenario
+
+STATS_FILE = "stats.json"
+STAT_KEYS = ("hits", "misses", "extensions", "evictions")
+
+
+@dataclass
+class CacheEntry:
+    watermark: dict
+    result: BacktestResult
+
+
+def _hash(values: dict) -> str:
+    encoded = json.dumps(values, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+def scenario_hash(scenario: BacktestScenario) -> str:
+    return _hash({**scenario.normalized(), "engine_version": ENGINE_VERSION})
+
+
+def data_hash(watermark: dict) -> str:
+    return _hash(watermark)
+
+
+class BacktestResultCache:
+    def __init__(self, cache_dir: str | Path = BACKTEST_CACHE_DIR, max_entries: int = BACKTEST_CACHE_MAX_ENTRIES):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+    ### file helpers ###
+
+    def _path(self, scenario: BacktestScenario, watermark: dict) -> Path:
+        return self.cache_dir / f"{scenario_hash(scenario)}-{data_hash(watermark)}.pkl"
+
+    def _entries(self, pattern: str = "*-*.pkl") -> list[Path]:
+        return list(self.cache_dir.glob(pattern))
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def _touch(self, path: Path) -> None:
+        # ファイル作成時のmtimeは粒度が粗いため、参照順を保つよう明示的に設定する
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _read(self, path: Path) -> CacheEntry | None:
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        stats = self.stats()
+        stats[key] += amount
+        self._write_atomic(
+            self.cache_dir / STATS_FILE,
+            json.dumps({k: stats[k] for k in STAT_KEYS}).encode("utf-8"),
+        )
+
+    ####################
+
+    def get(self, scenario: BacktestScenario, watermark: dict) -> BacktestResult | None:
+        path = self._path(scenario, watermark)
+        entry = self._read(path)
+        if entry is None:
+            self._count("misses")
+            return None
+        # LRUのため参照時刻を更新する
+        self._touch(path)
+        self._count("hits")
+        return entry.result
+
+    def latest(self, scenario: BacktestScenario) -> CacheEntry | None:
+        """
+        同じシナリオで、最も新しい足まで計算済みのエントリ
+        """
+        entries = [self._read(path) for path in self._entries(f"{scenario_hash(scenario)}-*.pkl")]
+        entries = [
+            entry for entry in entries
+            if entry is not None and entry.result.state is not None and entry.watermark["ohlc_max_time"] is not None
+        ]
+        return max(entries, key=lambda entry: entry.watermark["ohlc_max_time"], default=None)
+
+    def put(self, scenario: BacktestScenario, watermark: dict, result: BacktestResult) -> None:
+        entry = CacheEntry(watermark=watermark, result=result)
+        path = self._path(scenario, watermark)
+        self._write_atomic(path, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        self._touch(path)
+        self._evict()
+
+    def record_extension(self) -> None:
+        self._count("extensions")
+
+    def _evict(self) -> None:
+        paths = self._entries()
+        overflow = len(paths) - self.max_entries
+        if overflow <= 0:
+            return
+        paths.sort(key=lambda path: path.stat().st_mtime_ns)
+        for path in paths[:overflow]:
+            path.unlink(missing_ok=True)
+        self._count("evictions", overflow)
+
+    def stats(self) -> dict:
+        try:
+            stats = json.loads((self.cache_dir / STATS_FILE).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            stats = {}
+        stats = {key: int(stats.get(key, 0)) for key in STAT_KEYS}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        paths = self._entries()
+        stats["entries"] = len(paths)
+        stats["bytes"] = sum(path.stat().st_size for path in paths)
+        return stats
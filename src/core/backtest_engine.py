@@ -1,21 +1,352 @@
 # backtest engine
+import json
+import logging
+from dataclasses import asdict, dataclass, field, fields, replace
+from datetime import datetime
 from typing import Optional
+
+import numpy as np
+import yaml
+from sqlalchemy import text
+from sqlalchemy.sql.elements import quoted_name
+
+from src.config.config import (
+    DEFAULT_CURRENCY_PAIR_CODE,
+    DEFAULT_TIMEFRAME_CODE,
+    SCHEMA_NAME_OHLC,
+    SMA_CROSS_PARAMS,
+)
 from src.database.base import session_scope
+import src.etl.flows.transform_helpers as helpers
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+# 損益の計算方法を変えたら上げる(キャッシュ済みの結果を使わない)
+ENGINE_VERSION = "2"
+
+
+@dataclass(frozen=True)
+class BacktestScenario:
+    """
+    バックテストの条件
+    strategy_namesのBUY/SELLイベントを合わせて1つの売買ルールとして扱う
+    """
+    strategy_names: tuple[str, ...] = (
+        helpers.sma_cross_strategy_name(SMA_CROSS_PARAMS["short_period"], SMA_CROSS_PARAMS["long_period"]),
+    )
+    currency_pair_code: str = DEFAULT_CURRENCY_PAIR_CODE
+    timeframe_code: str = DEFAULT_TIMEFRAME_CODE
+    initial_capital: float = 1_000_000.0
+    quantity: float = 10_000.0  # 1回の取引数量(通貨単位)
+    spread: float = 0.0  # 1回の約定毎に片道で spread / 2 を支払う(価格単位)
+    fee_per_trade: float = 0.0  # 1回の約定毎の手数料
+    allow_short: bool = False  # Falseの場合、SELLはポジションの解消のみ
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+    calc_version: str = "0"  # イベントの元になったindicatorのcalc_version
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "BacktestScenario":
+        """
+        yamlなどから読み込んだ辞書をシナリオに変換する
+        """
+        unknown = set(values) - {f.name for f in fields(cls)}
+        if unknown:
+            raise ValueError(f"unknown scenario keys: {sorted(unknown)}")
+
+        converted = dict(values)
+        names = converted.get("strategy_names")
+        if isinstance(names, str):
+            names = [names]
+        if names is not None:
+            converted["strategy_names"] = tuple(names)
+        for key in ("start_time", "end_time"):
+            if isinstance(converted.get(key), str):
+                converted[key] = datetime.fromisoformat(converted[key])
+        for key in ("initial_capital", "quantity", "spread", "fee_per_trade"):
+            if key in converted:
+                converted[key] = float(converted[key])
+        if "calc_version" in converted:
+            converted["calc_version"] = str(converted["calc_version"])
+        return cls(**converted)
+
+    def normalized(self) -> dict:
+        """
+        書き方の違い(strategy_namesの順序、数値の型、日時の表記)に依存しない辞書
+        """
+        values = asdict(self)
+        values["strategy_names"] = sorted(set(self.strategy_names))
+        for key in ("initial_capital", "quantity", "spread", "fee_per_trade"):
+            values[key] = float(values[key])
+        for key in ("start_time", "end_time"):
+            values[key] = values[key].isoformat() if values[key] is not None else None
+        return values
+
+
+@dataclass
+class BacktestState:
+    """
+    最後の足の時点の状態。続きの足だけを追加で計算するときに引き継ぐ
+    """
+    n_bars: int = 0
+    equity: float = 0.0
+    peak: float = 0.0
+    max_drawdown: float = 0.0
+    max_drawdown_pct: float = 0.0
+    signal_position: float = 0.0  # 最後の足のcloseで確定した(次の足のopenで約定する)ポジション
+    held: float = 0.0  # 最後の足で保有していたポジション
+    last_close: float = float("nan")
+    entry_price: float = float("nan")  # 未決済ポジションの約定価格
+    sum_returns: float = 0.0
+    sum_squared_returns: float = 0.0
+    closed_trade_pnls: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+
+    @classmethod
+    def initial(cls, initial_capital: float) -> "BacktestState":
+        return cls(equity=initial_capital, peak=initial_capital)
+
+
+@dataclass
+class BacktestResult:
+    n_bars: int
+    n_trades: int
+    final_equity: float
+    total_return: float
+    max_drawdown: float
+    max_drawdown_pct: float
+    win_rate: float
+    profit_factor: float
+    avg_trade_pnl: float
+    sharpe: float
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+    equity: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    trade_pnls: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    state: BacktestState | None = field(default=None, repr=False)
+
+    def summary(self) -> dict:
+        return {
+            key: getattr(self, key)
+            for key in (
+                "n_bars", "n_trades", "final_equity", "total_return", "max_drawdown", "max_drawdown_pct",
+                "win_rate", "profit_factor", "avg_trade_pnl", "sharpe", "start_time", "end_time",
+            )
+        }
+
+
+def positions_from_signals(n_bars: int,
+                           signal_indices: np.ndarray,
+                           signal_sides: np.ndarray,
+                           initial_position: float = 0.0) -> np.ndarray:
+    """
+    シグナル(足のindex, +1/-1/0)から各足の目標ポジションを前方補完で求める
+    同じ足に複数のシグナルがある場合は後のものを優先する
+    """
+    target = np.full(n_bars, np.nan)
+    target[signal_indices] = signal_sides
+    valid = ~np.isnan(target)
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(n_bars), -1))
+    return np.where(last_valid >= 0, target[np.maximum(last_valid, 0)], initial_position)
+
+
+def run_vectorized_backtest(opens: np.ndarray,
+                            closes: np.ndarray,
+                            signal_indices: np.ndarray,
+                            signal_sides: np.ndarray,
+                            *,
+                            initial_capital: float = 1_000_000.0,
+                            quantity: float = 10_000.0,
+                            spread: float = 0.0,
+                            fee_per_trade: float = 0.0,
+                            bars_per_year: float = SECONDS_PER_YEAR / 60,
+                            state: BacktestState | None = None,
+                            ) -> BacktestResult:
+    """
+    足のcloseで出たシグナルを次の足のopenで約定させ、closeで時価評価する
+    ポジション、約定、損益、ドローダウン、トレード統計をすべて配列演算で求める
+    stateを渡すと、その続きの足として計算する(equityなどの配列は追加分のみ)
+    """
+    state = state or BacktestState.initial(initial_capital)
+    n_bars = len(closes)
+
+    # 各足で保有するポジション(シグナルの1本後の足のopenで約定する)
+    signal_position = positions_from_signals(n_bars, signal_indices, signal_sides, state.signal_position)
+    held = np.empty(n_bars)
+    held[:1] = state.signal_position
+    held[1:] = signal_position[:-1]
+    prev_held = np.empty(n_bars)
+    prev_held[:1] = state.held
+    prev_held[1:] = held[:-1]
+
+    # 前の足のclose -> openのギャップは前のポジション、open -> closeは新しいポジションに帰属する
+    prev_closes = np.empty(n_bars)
+    prev_closes[:1] = opens[:1] if np.isnan(state.last_close) else state.last_close
+    prev_closes[1:] = closes[:-1]
+    gross = quantity * (prev_held * (opens - prev_closes) + held * (closes - opens))
+
+    traded = np.abs(held - prev_held)
+    # 手数料は決済と新規の約定毎(ドテンは2回)。トレード統計の2 * fill_costと合わせる
+    changed = held != prev_held
+    legs = (changed & (prev_held != 0)).astype(float) + (changed & (held != 0))
+    costs = traded * quantity * spread / 2 + legs * fee_per_trade
+    equity = state.equity + np.cumsum(gross - costs)
+
+    peak = np.maximum.accumulate(np.maximum(equity, state.peak))
+    drawdown = equity - peak
+
+    prev_equity = np.empty(n_bars)
+    prev_equity[:1] = state.equity
+    prev_equity[1:] = equity[:-1]
+    returns = (equity - prev_equity) / prev_equity
+
+    # トレード: ポジションが0以外で一定の区間。k番目のexitはk番目のentryを決済する
+    entries = np.flatnonzero(changed & (held != 0))
+    exits = np.flatnonzero(changed & (prev_held != 0))
+    entry_prices = opens[entries]
+    sides = held[entries]
+    if state.held != 0:
+        # 前回から持ち越したポジション
+        entry_prices = np.concatenate([[state.entry_price], entry_prices])
+        sides = np.concatenate([[state.held], sides])
+    fill_cost = quantity * np.abs(sides) * spread / 2 + fee_per_trade
+    n_closed = len(exits)
+    closed_pnls = sides[:n_closed] * quantity * (opens[exits] - entry_prices[:n_closed]) - 2 * fill_cost[:n_closed]
+    closed_trade_pnls = np.concatenate([state.closed_trade_pnls, closed_pnls])
+    trade_pnls = closed_trade_pnls
+    if len(sides) > n_closed:
+        # 未決済のポジションは最後のcloseで評価する
+        last_close = closes[-1] if n_bars else state.last_close
+        open_pnl = sides[-1] * quantity * (last_close - entry_prices[-1]) - 2 * fill_cost[-1]
+        trade_pnls = np.append(closed_trade_pnls, open_pnl)
+
+    total_bars = state.n_bars + n_bars
+    sum_returns = state.sum_returns + returns.sum()
+    sum_squared_returns = state.sum_squared_returns + np.square(returns).sum()
+    mean = sum_returns / total_bars if total_bars else 0.0
+    std = np.sqrt(max(sum_squared_returns / total_bars - mean ** 2, 0.0)) if total_bars else 0.0
+    sharpe = float(mean / std * np.sqrt(bars_per_year)) if std > 0 else 0.0
+
+    final_equity = float(equity[-1]) if n_bars else state.equity
+    max_drawdown = min(state.max_drawdown, float(drawdown.min()) if n_bars else 0.0)
+    max_drawdown_pct = min(state.max_drawdown_pct, float((drawdown / peak).min()) if n_bars else 0.0)
+    new_state = BacktestState(
+        n_bars=total_bars,
+        equity=final_equity,
+        peak=float(peak[-1]) if n_bars else state.peak,
+        max_drawdown=max_drawdown,
+        max_drawdown_pct=max_drawdown_pct,
+        signal_position=float(signal_position[-1]) if n_bars else state.signal_position,
+        held=float(held[-1]) if n_bars else state.held,
+        last_close=float(closes[-1]) if n_bars else state.last_close,
+        entry_price=float(entry_prices[-1]) if len(sides) > n_closed else float("nan"),
+        sum_returns=float(sum_returns),
+        sum_squared_returns=float(sum_squared_returns),
+        closed_trade_pnls=closed_trade_pnls,
+    )
+
+    wins = trade_pnls[trade_pnls > 0]
+    losses = trade_pnls[trade_pnls < 0]
+    gross_loss = -losses.sum()
+
+    return BacktestResult(
+        n_bars=total_bars,
+        n_trades=len(trade_pnls),
+        final_equity=final_equity,
+        total_return=float(final_equity / initial_capital - 1),
+        max_drawdown=max_drawdown,
+        max_drawdown_pct=max_drawdown_pct,
+        win_rate=float(len(wins) / len(trade_pnls)) if len(trade_pnls) else 0.0,
+        profit_factor=float(wins.sum() / gross_loss) if gross_loss > 0 else float("inf") if len(wins) else 0.0,
+        avg_trade_pnl=float(trade_pnls.mean()) if len(trade_pnls) else 0.0,
+        sharpe=sharpe,
+        equity=equity,
+        trade_pnls=trade_pnls,
+        state=new_state,
+    )
+
+
+def load_ohlc_arrays(session,
+                     *,
+                     currency_pair_code: str,
+                     timeframe_code: str,
+                     start_time: datetime | None = None,
+                     end_time: datetime | None = None,
+                     after_time: datetime | None = None,
+                     limit: int | None = None,
+                     ) -> dict:
+    """
+    OHLC(time, open, close)をNumPy配列として読み込む
+    after_timeを指定した場合は、その時刻より後の足のみ読み込む
+    limitを指定した場合は、直近limit本の足のみ読み込む(新しい順にLIMITしてから時刻順に並べ直す)
+    """
+    schema_name = quoted_name(SCHEMA_NAME_OHLC, quote=True)
+    table_name = quoted_name(helpers.ohlc_table(currency_pair_code, timeframe_code), quote=True)
+    params = {
+        "currency_pair_code": currency_pair_code,
+        "timeframe_code": timeframe_code,
+        "start_time": start_time,
+        "end_time": end_time,
+        "after_time": after_time,
+        "limit": limit,
+    }
+
+    ids = session.execute(
+        text(
+            """
+            SELECT c.id, t.id, t.duration_seconds
+            FROM dim_currency c, dim_timeframe t
+            WHERE c.currency_pair_code = :currency_pair_code
+              AND t.timeframe_code = :timeframe_code;
+            """
+        ),
+        params,
+    ).first()
+    if ids is None:
+        raise ValueError(f"Currency pair {currency_pair_code} or timeframe {timeframe_code} not found")
+    currency_id, timeframe_id, duration_seconds = ids
+
+    query = f"""
+    SELECT time, open, close
+    FROM {schema_name}.{table_name}
+    WHERE time >= COALESCE(:start_time, '-infinity'::timestamp)
+      AND time <= COALESCE(:end_time, 'infinity'::timestamp)
+      AND time > COALESCE(:after_time, '-infinity'::timestamp)
+    """
+    if limit is None:
+        query = f"{query} ORDER BY time;"
+    else:
+        query = f"SELECT * FROM ({query} ORDER BY time DESC LIMIT :limit) recent ORDER BY time;"
+    rows = session.execute(text(query), params).all()
+
+    prices = np.array([row[1:] for row in rows], dtype=float).reshape(-1, 2)
+    return {
+        "currency_id": currency_id,
+        "timeframe_id": timeframe_id,
+        "duration_seconds": duration_seconds,
+        "times": np.array([row[0] for row in rows], dtype="datetime64[us]"),
+        "opens": prices[:, 0],
+        "closes": prices[:, 1],
+    }
+
 
 class BacktestEngine:
     pass
 
 class BacktestFX(BacktestEngine):
-    def __init__(self):
-        ...
+    def __init__(self, scenario: BacktestScenario | None = None, scenario_path: str | None = None):
+        if scenario is None and scenario_path is not None:
+            scenario = BacktestScenario.from_dict(self._load_yaml(scenario_path) or {})
+        self.scenario = scenario or BacktestScenario()
 
-    def _load_yaml(self) -> Optional[dict]:
+    def _load_yaml(self, path: str) -> Optional[dict]:
         """
-        トレードシナリオ定義のyamlファイルを
+        トレードシナリオ定義のyamlファイルを読み込む
         """
-        return None
+        with open(path, encoding="utf-8") as f:
+            return yaml.safe_load(f)
 
-    def _generate_buysell_events(self):
+    def _generate_buysell_events(self) -> int:
         """
         yamlファイルの内容をもとにしてfact_buysell_eventsテーブルにevent情報を生成する
         """
@@ -27,18 +358,236 @@ class BacktestFX(BacktestEngine):
 
         with session_scope() as session:
             # fact_buysell_eventsにeventが生成されたことを確認する。
-            # eventが0件であれば通知する
+            count = session.execute(
+                text(
+                    """
+                    SELECT COUNT(*)
+                    FROM fact_buysell_events e
+                    JOIN dim_currency c ON c.id = e.currency_id
+                    JOIN dim_timeframe t ON t.id::text = e.trigger_indicator_timeframe
+                    WHERE e.strategy_name = ANY(:strategy_names)
+                      AND c.currency_pair_code = :currency_pair_code
+                      AND t.timeframe_code = :timeframe_code;
+                    """
+                ),
+                {
+                    "strategy_names": list(self.scenario.strategy_names),
+                    "currency_pair_code": self.scenario.currency_pair_code,
+                    "timeframe_code": self.scenario.timeframe_code,
+                },
+            ).scalar()
             session.commit()
 
+        # eventが0件であれば通知する
+        if not count:
+            logger.warning("no buysell events for %s", self.scenario)
+        return count
+
+    def _event_params(self, currency_id: int, timeframe_id: int) -> dict:
+        scenario = self.scenario
+        return {
+            "strategy_names": list(scenario.strategy_names),
+            "currency_id": currency_id,
+            "timeframe_id": str(timeframe_id),
+            "start_time": scenario.start_time,
+            "end_time": scenario.end_time,
+        }
+
+    def _load_data(self, after_time: datetime | None = None) -> dict:
+        """
+        OHLCとイベントを1回のセッションでNumPy配列として読み込む
+        """
+        scenario = self.scenario
+        with session_scope() as session:
+            data = load_ohlc_arrays(
+                session,
+                currency_pair_code=scenario.currency_pair_code,
+                timeframe_code=scenario.timeframe_code,
+                start_time=scenario.start_time,
+                end_time=scenario.end_time,
+                after_time=after_time,
+            )
+            event_rows = session.execute(
+                text(
+                    """
+                    SELECT event_datetime, event_type
+                    FROM fact_buysell_events
+                    WHERE strategy_name = ANY(:strategy_names)
+                      AND currency_id = :currency_id
+                      AND trigger_indicator_timeframe = :timeframe_id
+                      AND event_datetime >= COALESCE(:start_time, '-infinity'::timestamp)
+                      AND event_datetime <= COALESCE(:end_time, 'infinity'::timestamp)
+                      AND event_datetime > COALESCE(:after_time, '-infinity'::timestamp)
+                    ORDER BY event_datetime;
+                    """
+                ),
+                {**self._event_params(data["currency_id"], data["timeframe_id"]), "after_time": after_time},
+            ).all()
+
+        data["event_times"] = np.array([row[0] for row in event_rows], dtype="datetime64[us]")
+        data["event_types"] = np.array([row[1] for row in event_rows], dtype=object)
+        return data
+
+    def data_watermark(self, ohlc_max_time: datetime | None = None) -> dict:
+        """
+        シナリオが参照するデータの範囲(OHLC/イベントの最終時刻と、最終足までのイベント件数)
+        ohlc_max_timeを指定した場合は、その時刻までのイベント件数を数える
+        """
+        scenario = self.scenario
+        schema_name = quoted_name(SCHEMA_NAME_OHLC, quote=True)
+        table_name = quoted_name(helpers.ohlc_table(scenario.currency_pair_code, scenario.timeframe_code), quote=True)
+        with session_scope() as session:
+            currency_id, timeframe_id = session.execute(
+                text(
+                    """
+                    SELECT c.id, t.id
+                    FROM dim_currency c, dim_timeframe t
+                    WHERE c.currency_pair_code = :currency_pair_code
+                      AND t.timeframe_code = :timeframe_code;
+                    """
+                ),
+                {"currency_pair_code": scenario.currency_pair_code, "timeframe_code": scenario.timeframe_code},
+            ).one()
+            params = self._event_params(currency_id, timeframe_id)
+            if ohlc_max_time is None:
+                ohlc_max_time = session.execute(
+                    text(
+                        f"""
+                        SELECT MAX(time)
+                        FROM {schema_name}.{table_name}
+                        WHERE time >= COALESCE(:start_time, '-infinity'::timestamp)
+                          AND time <= COALESCE(:end_time, 'infinity'::timestamp);
+                        """
+                    ),
+                    params,
+                ).scalar()
+            event_max_time, event_count = session.execute(
+                text(
+                    """
+                    SELECT
+                        MAX(event_datetime),
+                        COUNT(*) FILTER (WHERE event_datetime <= :ohlc_max_time)
+                    FROM fact_buysell_events
+                    WHERE strategy_name = ANY(:strategy_names)
+                      AND currency_id = :currency_id
+                      AND trigger_indicator_timeframe = :timeframe_id
+                      AND event_datetime >= COALESCE(:start_time, '-infinity'::timestamp)
+                      AND event_datetime <= COALESCE(:end_time, 'infinity'::timestamp);
+                    """
+                ),
+                {**params, "ohlc_max_time": ohlc_max_time},
+            ).one()
+        return {
+            "ohlc_max_time": ohlc_max_time,
+            "event_max_time": event_max_time,
+            "event_count": event_count,
+        }
+
+    def _signal_sides(self, event_types: np.ndarray) -> np.ndarray:
+        sell_side = -1.0 if self.scenario.allow_short else 0.0
+        return np.where(event_types == "BUY", 1.0, sell_side)
+
+    def _save_result(self, data: dict, result: BacktestResult) -> None:
+        scenario = self.scenario
+        with session_scope() as session:
+            session.execute(
+                text(
+                    """
+                    INSERT INTO backtest_results (
+                        strategy_names, currency_id, timeframe_id, start_time, end_time,
+                        n_bars, n_trades, final_equity, total_return, max_drawdown, max_drawdown_pct,
+                        win_rate, profit_factor, avg_trade_pnl, sharpe, scenario
+                    )
+                    VALUES (
+                        :strategy_names, :currency_id, :timeframe_id, :start_time, :end_time,
+                        :n_bars, :n_trades, :final_equity, :total_return, :max_drawdown, :max_drawdown_pct,
+                        :win_rate, :profit_factor, :avg_trade_pnl, :sharpe, CAST(:scenario AS JSONB)
+                    );
+                    """
+                ),
+                {
+                    **result.summary(),
+                    "strategy_names": list(scenario.strategy_names),
+                    "currency_id": data["currency_id"],
+                    "timeframe_id": data["timeframe_id"],
+                    "scenario": json.dumps(scenario.normalized()),
+                },
+            )
+
+    def _run_on_data(self, data: dict, previous: BacktestResult | None = None) -> BacktestResult:
+        scenario = self.scenario
+        times = data["times"]
+        state = previous.state if previous is not None else None
 
+        # イベントはそのイベントが属する足のcloseで確定したものとして扱う
+        signal_indices = np.searchsorted(times, data["event_times"], side="right") - 1
+        in_range = signal_indices >= 0
+        signal_sides = self._signal_sides(data["event_types"])
+        if state is not None and not in_range.all():
+            # 前回の最終足と今回の最初の足の間のイベントは、前回の最終足のシグナルとして扱う
+            state = replace(state, signal_position=float(signal_sides[~in_range][-1]))
 
+        result = run_vectorized_backtest(
+            data["opens"],
+            data["closes"],
+            signal_indices[in_range],
+            signal_sides[in_range],
+            initial_capital=scenario.initial_capital,
+            quantity=scenario.quantity,
+            spread=scenario.spread,
+            fee_per_trade=scenario.fee_per_trade,
+            bars_per_year=SECONDS_PER_YEAR / data["duration_seconds"],
+            state=state,
+        )
+        if previous is not None:
+            result.equity = np.concatenate([previous.equity, result.equity])
+            result.start_time = previous.start_time
+            result.end_time = previous.end_time
+        if len(times):
+            result.start_time = result.start_time or times[0].item()
+            result.end_time = times[-1].item()
+        return result
 
-    def run(self):
+    def run(self, save: bool = True, cache=None) -> BacktestResult:
         """
         fact_buysell_eventsの情報を参照してトレードを実行する。
+        cache(BacktestResultCache)を渡すと、シナリオとデータが変わっていなければ保存済みの結果を返し、
+        新しい足が追加されただけであれば前回の状態から続きを計算する。
         """
         # config_dictで指定した条件に基づき、時系列でeventを処理して、
         # 資金の増減を記録する。
+        if cache is None:
+            data = self._load_data()
+            result = self._run_on_data(data)
+            if save:
+                self._save_result(data, result)
+            return result
 
+        watermark = self.data_watermark()
+        cached = cache.get(self.scenario, watermark)
+        if cached is not None:
+            return cached
 
+        previous = cache.latest(self.scenario)
+        if previous is not None and self._can_extend(previous.watermark, watermark):
+            data = self._load_data(after_time=previous.watermark["ohlc_max_time"])
+            result = self._run_on_data(data, previous=previous.result)
+            cache.record_extension()
+        else:
+            data = self._load_data()
+            result = self._run_on_data(data)
 
+        cache.put(self.scenario, watermark, result)
+        if save:
+            self._save_result(data, result)
+        return result
+
+    def _can_extend(self, previous: dict, current: dict) -> bool:
+        """
+        前回の最終足までのイベントが変わっておらず、その後に足が追加されただけの場合のみ続きを計算できる
+        """
+        if previous["ohlc_max_time"] is None or current["ohlc_max_time"] is None:
+            return False
+        if current["ohlc_max_time"] <= previous["ohlc_max_time"]:
+            return False
+        return self.data_watermark(previous["ohlc_max_time"])["event_count"] == previous["event_count"]
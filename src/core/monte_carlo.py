@@ -0,0 +1,151 @@
+# monte carlo robustness analysis
+"""
+バックテストのトレード損益を再標本化して、リターンとドローダウンの分布を求める。
+
+- bootstrap: トレードを復元抽出する
+- shuffle: トレードの順序を入れ替える(最終損益は同じで、ドローダウンの分布が変わる)
+- slippage: 各トレードに約定毎のランダムなスリッページ(|N(0, slippage)|)を加える
+
+シミュレーションはチャンク毎に(n_sims, n_trades)の行列としてNumPyでまとめて計算し、
+チャンクをプロセスプールに分散する。
+
+    python -m src.core.monte_carlo --scenario scenario.yaml --simulations 10000 --method shuffle --slippage 0.002
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from src.core.backtest_engine import BacktestFX
+
+METHODS = ("bootstrap", "shuffle")
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def simulate_chunk(trade_pnls: np.ndarray,
+                   n_simulations: int,
+                   seed: np.random.SeedSequence,
+                   *,
+                   method: str = "bootstrap",
+                   initial_capital: float = 1_000_000.0,
+                   quantity: float = 10_000.0,
+                   slippage: float = 0.0,
+                   ) -> dict[str, np.ndarray]:
+    """
+    n_simulations本の損益パスを作り、パス毎の最終リターンと最大ドローダウンを返す
+    """
+    rng = np.random.default_rng(seed)
+    n_trades = len(trade_pnls)
+    if method == "bootstrap":
+        paths = trade_pnls[rng.integers(0, n_trades, size=(n_simulations, n_trades))]
+    elif method == "shuffle":
+        order = np.argsort(rng.random((n_simulations, n_trades)), axis=1)
+        paths = trade_pnls[order]
+    else:
+        raise ValueError(f"method must be one of {METHODS}")
+
+    if slippage > 0:
+        # 1トレードにつきentry/exitの2回約定する
+        paths -= np.abs(rng.normal(0.0, slippage, size=(n_simulations, n_trades, 2))).sum(axis=2) * quantity
+
+    equity = initial_capital + np.cumsum(paths, axis=1)
+    peak = np.maximum.accumulate(np.maximum(equity, initial_capital), axis=1)
+    drawdown = equity - peak
+    return {
+        "total_return": equity[:, -1] / initial_capital - 1,
+        "max_drawdown": drawdown.min(axis=1),
+        "max_drawdown_pct": (drawdown / peak).min(axis=1),
+    }
+
+
+def run_monte_carlo(trade_pnls: np.ndarray,
+                    *,
+                    n_simulations: int = 10_000,
+                    method: str = "bootstrap",
+                    initial_capital: float = 1_000_000.0,
+                    quantity: float = 10_000.0,
+                    slippage: float = 0.0,
+                    workers: int | None = None,
+                    chunk_size: int = 1_000,
+                    seed: int | None = None,
+                    ) -> tuple[dict[str, np.ndarray], float]:
+    """
+    シミュレーションをchunk_size本ずつに分けてプロセスプールで実行する
+    seedを指定すると、worker数に関係なく同じ結果になる
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    trade_pnls = np.asarray(trade_pnls, dtype=float)
+    if len(trade_pnls) == 0:
+        raise ValueError("no trades to simulate")
+
+    sizes = [min(chunk_size, n_simulations - start) for start in range(0, n_simulations, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    simulate = partial(
+        simulate_chunk,
+        trade_pnls,
+        method=method,
+        initial_capital=initial_capital,
+        quantity=quantity,
+        slippage=slippage,
+    )
+
+    started = time.perf_counter()
+    workers = min(workers or os.cpu_count() or 1, len(sizes))
+    if workers == 1:
+        chunks = list(map(simulate, sizes, seeds))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(simulate, sizes, seeds))
+    elapsed = time.perf_counter() - started
+
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}, elapsed
+
+
+def summarize(results: dict[str, np.ndarray]) -> dict:
+    summary = {
+        key: {f"p{p}": float(value) for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+        for key, values in results.items()
+    }
+    summary["probability_of_loss"] = float((results["total_return"] < 0).mean())
+    return summary
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Monte Carlo robustness analysis of a backtest")
+    parser.add_argument("--scenario", default=None, help="backtest scenario yaml (default scenario if omitted)")
+    parser.add_argument("--simulations", type=int, default=10_000)
+    parser.add_argument("--method", default="bootstrap", choices=METHODS)
+    parser.add_argument("--slippage", type=float, default=0.0, help="std of slippage per fill (price units)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    backtest = BacktestFX(scenario_path=args.scenario)
+    result = backtest.run(save=False)
+    scenario = backtest.scenario
+
+    results, elapsed = run_monte_carlo(
+        result.trade_pnls,
+        n_simulations=args.simulations,
+        method=args.method,
+        initial_capital=scenario.initial_capital,
+        quantity=scenario.quantity,
+        slippage=args.slippage,
+        workers=args.workers,
+        seed=args.seed,
+    )
+
+    print(f"backtest: trades={result.n_trades} return={result.total_return:.4f} max_dd={result.max_drawdown:.1f}")
+    print(f"{args.simulations} simulations ({args.method}) in {elapsed:.2f}s")
+    summary = summarize(results)
+    print(f"probability of loss: {summary.pop('probability_of_loss'):.3f}")
+    for key, percentiles in summary.items():
+        print(f"{key:>18}: " + " ".join(f"{name}={value:.4g}" for name, value in percentiles.items()))
+
+
+if __name__ == "__main__":
+    main()
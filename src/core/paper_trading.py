@@ -0,0 +1,547 @@
+# paper trading engine
+"""
+ライブのtickerを受け取り、足の確定毎にstrategyのルールを評価して仮想の約定を記録する。
+
+- tickはbidで足を組み立てる(update_ohlc_base_tablesと同じ)
+- indicatorは足の確定毎に逐次更新する(talibのSMA/EMA/RSIと同じ値)
+- ルールはsignal_engineの定義(config/strategies.yaml)をそのまま使う
+- 約定は足を確定させたtick(=次の足の始値)で、BUYはask、SELLはbidで行う
+- tickの受信から判断(約定)までの時間を記録し、latency budgetと比較する
+
+tickの入力は2通り:
+
+- ws_ticker_serverへ接続する: python -m src.core.paper_trading --symbols USD_JPY EUR_JPY --timeframe 1m
+- ingestionと同じプロセスで動かす: Streamer(listeners=[ingestion_listener(engine)])
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+import websockets
+from sqlalchemy import text
+
+from src.config.config import (
+    DEFAULT_STRATEGY_DEFINITIONS_PATH,
+    DEFAULT_TIMEFRAME_CODE,
+    PAPER_TRADING_LATENCY_BUDGET_MS,
+    PAPER_TRADING_WS_URL,
+)
+from src.core.backtest_engine import load_ohlc_arrays
+from src.core.signal_engine import (
+    StrategyDefinition,
+    evaluate_rule,
+    load_strategy_definitions,
+    required_series,
+)
+from src.database.base import session_scope
+
+logger = logging.getLogger(__name__)
+
+LATENCY_SAMPLES = 10_000
+MAX_RECENT_FILLS = 1_000
+RECONNECT_BACKOFF_SECONDS = 5
+
+
+@dataclass(frozen=True)
+class Tick:
+    symbol: str
+    time: datetime
+    bid: float
+    ask: float
+    received_ns: int  # time.perf_counter_ns()で受信した時刻
+
+
+def tick_from_payload(data: dict, received_ns: int | None = None) -> Tick | None:
+    """
+    GMOのtickerメッセージ、またはws_ticker_serverのtickerメッセージをTickに変換する
+    """
+    received_ns = received_ns or time.perf_counter_ns()
+    try:
+        timestamp = datetime.fromisoformat(str(data["timestamp"]).replace("Z", "+00:00"))
+        return Tick(
+            symbol=str(data["symbol"]),
+            time=timestamp.astimezone(timezone.utc) if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc),
+            bid=float(data["bid"]),
+            ask=float(data["ask"]),
+            received_ns=received_ns,
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+### bars ###
+
+@dataclass
+class Bar:
+    time: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+
+
+class BarBuilder:
+    """
+    tickをduration_seconds毎の足にまとめ、次の足のtickが来た時点で確定した足を返す
+    """
+    def __init__(self, duration_seconds: int):
+        self.duration_seconds = duration_seconds
+        self._bucket: int | None = None
+        self._bar: Bar | None = None
+
+    def update(self, tick_time: datetime, price: float) -> Bar | None:
+        bucket = int(tick_time.timestamp()) // self.duration_seconds
+        if self._bucket is not None and bucket < self._bucket:
+            # 遅れて届いたtickは確定済みの足を変更しない
+            return None
+
+        closed = None
+        if bucket != self._bucket:
+            closed = self._bar
+            self._bucket = bucket
+            self._bar = Bar(
+                time=datetime.fromtimestamp(bucket * self.duration_seconds, tz=timezone.utc),
+                open=price,
+                high=price,
+                low=price,
+                close=price,
+            )
+        else:
+            bar = self._bar
+            bar.high = max(bar.high, price)
+            bar.low = min(bar.low, price)
+            bar.close = price
+        return closed
+
+############
+
+
+### incremental indicators ###
+
+class IncrementalSMA:
+    def __init__(self, period: int):
+        self.period = period
+        self._window: deque[float] = deque(maxlen=period)
+        self._sum = 0.0
+
+    def update(self, value: float) -> float:
+        if len(self._window) == self.period:
+            self._sum -= self._window[0]
+        self._window.append(value)
+        self._sum += value
+        return self._sum / self.period if len(self._window) == self.period else math.nan
+
+
+class IncrementalEMA:
+    """
+    talib.EMAと同じく、最初のperiod本の単純平均を初期値にする
+    """
+    def __init__(self, period: int):
+        self.period = period
+        self._alpha = 2.0 / (period + 1)
+        self._seed = IncrementalSMA(period)
+        self._value = math.nan
+
+    def update(self, value: float) -> float:
+        if math.isnan(self._value):
+            self._value = self._seed.update(value)
+        else:
+            self._value += self._alpha * (value - self._value)
+        return self._value
+
+
+class IncrementalRSI:
+    """
+    talib.RSIと同じWilderの平滑化
+    """
+    def __init__(self, period: int):
+        self.period = period
+        self._previous = math.nan
+        self._count = 0
+        self._gain = 0.0
+        self._loss = 0.0
+
+    def update(self, value: float) -> float:
+        previous, self._previous = self._previous, value
+        if math.isnan(previous):
+            return math.nan
+
+        change = value - previous
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        self._count += 1
+        if self._count <= self.period:
+            self._gain += gain / self.period
+            self._loss += loss / self.period
+            if self._count < self.period:
+                return math.nan
+        else:
+            self._gain = (self._gain * (self.period - 1) + gain) / self.period
+            self._loss = (self._loss * (self.period - 1) + loss) / self.period
+
+        total = self._gain + self._loss
+        return 100.0 * self._gain / total if total else 0.0
+
+
+INCREMENTAL_INDICATORS = {
+    "sma": IncrementalSMA,
+    "ema": IncrementalEMA,
+    "rsi": IncrementalRSI,
+}
+
+##############################
+
+
+### latency ###
+
+class LatencyStats:
+    """
+    直近LATENCY_SAMPLES件のlatency(ns)を保持してパーセンタイルを返す
+    """
+    def __init__(self, budget_ms: float = PAPER_TRADING_LATENCY_BUDGET_MS, max_samples: int = LATENCY_SAMPLES):
+        self.budget_ms = budget_ms
+        self._samples: deque[int] = deque(maxlen=max_samples)
+        self.count = 0
+        self.over_budget = 0
+
+    def record(self, elapsed_ns: int) -> None:
+        self._samples.append(elapsed_ns)
+        self.count += 1
+        if elapsed_ns > self.budget_ms * 1_000_000:
+            self.over_budget += 1
+
+    def summary(self) -> dict:
+        if not self._samples:
+            return {"count": 0, "over_budget": 0, "budget_ms": self.budget_ms}
+        samples_ms = np.fromiter(self._samples, dtype=float) / 1_000_000
+        p50, p95, p99 = np.percentile(samples_ms, (50, 95, 99))
+        return {
+            "count": self.count,
+            "over_budget": self.over_budget,
+            "budget_ms": self.budget_ms,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(samples_ms.max()),
+        }
+
+###############
+
+
+### positions ###
+
+@dataclass(frozen=True)
+class PaperFill:
+    symbol: str
+    strategy_name: str
+    side: str
+    quantity: float
+    price: float
+    bid: float
+    ask: float
+    tick_time: datetime
+    bar_time: datetime
+    position_after: float
+    realized_pnl: float
+    latency_us: int
+
+
+@dataclass
+class PaperPosition:
+    symbol: str
+    quantity: float = 0.0  # 符号付き(通貨単位)
+    entry_price: float = 0.0
+    realized_pnl: float = 0.0
+
+    def unrealized_pnl(self, bid: float, ask: float) -> float:
+        if self.quantity > 0:
+            return (bid - self.entry_price) * self.quantity
+        if self.quantity < 0:
+            return (ask - self.entry_price) * self.quantity
+        return 0.0
+
+    def move_to(self, target: float, price: float) -> float:
+        """
+        targetまでポジションを変更し、決済で確定した損益を返す
+        """
+        realized = 0.0
+        if self.quantity and (target == 0 or np.sign(target) != np.sign(self.quantity)):
+            realized = (price - self.entry_price) * self.quantity
+            self.quantity = 0.0
+        if target and not self.quantity:
+            self.entry_price = price
+        self.quantity = target
+        self.realized_pnl += realized
+        return realized
+
+#################
+
+
+@dataclass
+class SymbolState:
+    bars: BarBuilder
+    indicators: dict[str, object]
+    position: PaperPosition
+    previous: dict[str, float] = field(default_factory=dict)
+    current: dict[str, float] = field(default_factory=dict)
+    last_tick: Tick | None = None
+
+
+class PaperTradingEngine:
+    """
+    strategiesのBUY/SELLを1つの売買ルールとして扱う(BacktestFXと同じ)
+    BUYでquantityのロング、SELLでポジション解消(allow_shortならショート)
+    """
+    def __init__(self,
+                 strategies: list[StrategyDefinition],
+                 *,
+                 symbols: list[str],
+                 duration_seconds: int,
+                 quantity: float = 10_000.0,
+                 allow_short: bool = False,
+                 latency_budget_ms: float = PAPER_TRADING_LATENCY_BUDGET_MS,
+                 ):
+        self.strategies = strategies
+        self.quantity = quantity
+        self.allow_short = allow_short
+        self.series = required_series(strategies)
+        self.states = {symbol: self._new_state(symbol, duration_seconds) for symbol in symbols}
+        self.decision_latency = LatencyStats(latency_budget_ms)
+        self.fills: deque[PaperFill] = deque(maxlen=MAX_RECENT_FILLS)
+
+    def _new_state(self, symbol: str, duration_seconds: int) -> SymbolState:
+        return SymbolState(
+            bars=BarBuilder(duration_seconds),
+            indicators={
+                item.key: INCREMENTAL_INDICATORS[item.indicator](item.period)
+                for item in self.series if item.period is not None
+            },
+            position=PaperPosition(symbol),
+        )
+
+    def _update_series(self, state: SymbolState, bar: Bar) -> None:
+        state.previous = state.current
+        state.current = {
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": bar.close,
+            **{key: indicator.update(bar.close) for key, indicator in state.indicators.items()},
+        }
+
+    def warm_up(self, symbol: str, closes: np.ndarray) -> None:
+        """
+        過去の終値でindicatorを初期化する(起動直後からクロスを判定できるようにする)
+        """
+        state = self.states[symbol]
+        for close in closes:
+            close = float(close)
+            self._update_series(state, Bar(datetime.min, close, close, close, close))
+
+    def _decide(self, state: SymbolState) -> list[tuple[StrategyDefinition, float]]:
+        if not state.previous:
+            return []
+        keys = [item.key for item in self.series]
+        arrays = {key: np.array([state.previous[key], state.current[key]]) for key in keys}
+        sell_target = -self.quantity if self.allow_short else 0.0
+        return [
+            (strategy, self.quantity if strategy.event_type == "BUY" else sell_target)
+            for strategy in self.strategies
+            if evaluate_rule(strategy.rule, arrays, 2)[-1]
+        ]
+
+    def on_tick(self, tick: Tick) -> list[PaperFill]:
+        state = self.states.get(tick.symbol)
+        if state is None:
+            return []
+        state.last_tick = tick
+        bar = state.bars.update(tick.time, tick.bid)
+        if bar is None:
+            return []
+
+        self._update_series(state, bar)
+        orders = []
+        for strategy, target in self._decide(state):
+            position = state.position
+            if target == position.quantity:
+                continue
+            side = "BUY" if target > position.quantity else "SELL"
+            price = tick.ask if side == "BUY" else tick.bid
+            quantity = abs(target - position.quantity)
+            realized = position.move_to(target, price)
+            orders.append((strategy.name, side, quantity, price, target, realized))
+
+        elapsed_ns = time.perf_counter_ns() - tick.received_ns
+        self.decision_latency.record(elapsed_ns)
+
+        fills = [
+            PaperFill(
+                symbol=tick.symbol,
+                strategy_name=strategy_name,
+                side=side,
+                quantity=quantity,
+                price=price,
+                bid=tick.bid,
+                ask=tick.ask,
+                tick_time=tick.time,
+                bar_time=bar.time,
+                position_after=target,
+                realized_pnl=realized,
+                latency_us=elapsed_ns // 1_000,
+            )
+            for strategy_name, side, quantity, price, target, realized in orders
+        ]
+        self.fills.extend(fills)
+        return fills
+
+    def on_tick_payload(self, data: dict, received_ns: int | None = None) -> list[PaperFill]:
+        """
+        ingestion(Streamer)から受け取ったtickerを処理する(received_nsはStreamerが受信した時刻)
+        """
+        tick = tick_from_payload(data, received_ns)
+        return self.on_tick(tick) if tick is not None else []
+
+    def positions(self) -> dict[str, dict]:
+        positions = {}
+        for symbol, state in self.states.items():
+            position = state.position
+            tick = state.last_tick
+            positions[symbol] = {
+                "quantity": position.quantity,
+                "entry_price": position.entry_price,
+                "realized_pnl": position.realized_pnl,
+                "unrealized_pnl": position.unrealized_pnl(tick.bid, tick.ask) if tick else 0.0,
+            }
+        return positions
+
+
+def record_fill(fill: PaperFill) -> None:
+    with session_scope() as session:
+        session.execute(
+            text(
+                """
+                INSERT INTO paper_trades (
+                    symbol, strategy_name, side, quantity, price, bid, ask,
+                    tick_time, bar_time, position_after, realized_pnl, latency_us
+                )
+                VALUES (
+                    :symbol, :strategy_name, :side, :quantity, :price, :bid, :ask,
+                    :tick_time, :bar_time, :position_after, :realized_pnl, :latency_us
+                );
+                """
+            ),
+            {
+                **asdict(fill),
+                # DBのtimestampはUTCのnaive
+                "tick_time": fill.tick_time.replace(tzinfo=None),
+                "bar_time": fill.bar_time.replace(tzinfo=None),
+            },
+        )
+
+
+def ingestion_listener(engine: PaperTradingEngine, *, record: bool = True) -> Callable[[dict, int], list[PaperFill]]:
+    """
+    Streamerのlistener。約定をpaper_tradesに記録する(consume_ws_tickerと同じ)
+    """
+    def _listener(data: dict, received_ns: int) -> list[PaperFill]:
+        fills = engine.on_tick_payload(data, received_ns)
+        for fill in fills:
+            logger.info("fill: %s", fill)
+            if record:
+                record_fill(fill)
+        return fills
+    return _listener
+
+
+### ws_ticker_server source ###
+
+def ws_ticker_url(base_url: str, symbol: str) -> str:
+    return f"{base_url.rstrip('/')}/ws/ticker_{symbol.lower()}"
+
+
+async def consume_ws_ticker(engine: PaperTradingEngine, base_url: str, symbol: str, *, record: bool = True) -> None:
+    url = ws_ticker_url(base_url, symbol)
+    while True:
+        try:
+            async with websockets.connect(url) as ws:
+                logger.info("connected: %s", url)
+                async for message in ws:
+                    received_ns = time.perf_counter_ns()
+                    data = json.loads(message)
+                    if data.get("type") != "ticker":
+                        continue
+                    tick = tick_from_payload(data, received_ns)
+                    if tick is None:
+                        continue
+                    for fill in engine.on_tick(tick):
+                        logger.info("fill: %s", fill)
+                        if record:
+                            await asyncio.to_thread(record_fill, fill)
+        except (OSError, websockets.exceptions.WebSocketException) as exc:
+            logger.warning("ws error on %s: %s, reconnecting in %ss", url, exc, RECONNECT_BACKOFF_SECONDS)
+            await asyncio.sleep(RECONNECT_BACKOFF_SECONDS)
+
+
+async def report_loop(engine: PaperTradingEngine, interval_seconds: float) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        logger.info("decision latency: %s", engine.decision_latency.summary())
+        logger.info("positions: %s", engine.positions())
+
+###############################
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="paper trading on the live ticker stream")
+    parser.add_argument("--symbols", nargs="+", default=["USD_JPY"])
+    parser.add_argument("--timeframe", default=DEFAULT_TIMEFRAME_CODE)
+    parser.add_argument("--strategies", default=DEFAULT_STRATEGY_DEFINITIONS_PATH)
+    parser.add_argument("--url", default=PAPER_TRADING_WS_URL)
+    parser.add_argument("--quantity", type=float, default=10_000.0)
+    parser.add_argument("--allow-short", action="store_true")
+    parser.add_argument("--warm-up-bars", type=int, default=500)
+    parser.add_argument("--report-interval", type=float, default=60.0)
+    parser.add_argument("--no-record", action="store_true", help="do not write fills to paper_trades")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # 過去の足でindicatorを初期化する
+    history = {}
+    with session_scope() as session:
+        for symbol in args.symbols:
+            history[symbol] = load_ohlc_arrays(
+                session,
+                currency_pair_code=symbol.replace("_", "/"),
+                timeframe_code=args.timeframe,
+                limit=args.warm_up_bars,
+            )
+
+    engine = PaperTradingEngine(
+        load_strategy_definitions(args.strategies),
+        symbols=args.symbols,
+        duration_seconds=next(iter(history.values()))["duration_seconds"],
+        quantity=args.quantity,
+        allow_short=args.allow_short,
+    )
+    for symbol, data in history.items():
+        engine.warm_up(symbol, data["closes"])
+
+    async def _run():
+        await asyncio.gather(
+            report_loop(engine, args.report_interval),
+            *(consume_ws_ticker(engine, args.url, symbol, record=not args.no_record) for symbol in args.symbols),
+        )
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# parameter sweep
+"""
+SMAクロスの(short_period, long_period)の組み合わせをプロセスプールで一括評価する。
+OHLCは1回だけ読み込んで共有メモリに置き、各workerはコピーせずに参照する。
+indicatorはworker内で計算し、DBには保存しない。
+
+    python -m src.core.parameter_sweep --currency-pair USD/JPY --timeframe 1m --short 5:30:5 --long 20:120:10
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import product
+from multiprocessing import shared_memory
+
+import numpy as np
+import talib
+
+from src.config.config import DEFAULT_CURRENCY_PAIR_CODE, DEFAULT_TIMEFRAME_CODE
+from src.core.backtest_engine import SECONDS_PER_YEAR, load_ohlc_arrays, run_vectorized_backtest
+from src.database.base import session_scope
+
+SHARED_ARRAY_KEYS = ("opens", "closes")
+RANK_METRICS = ("sharpe", "total_return", "profit_factor", "win_rate", "max_drawdown")
+
+
+### shared memory ###
+
+@dataclass(frozen=True)
+class SharedArraySpec:
+    """
+    workerへ渡す共有メモリの情報(pickle可能)
+    """
+    name: str
+    shape: tuple[int, int]
+    keys: tuple[str, ...]
+
+
+class SharedArrays:
+    """
+    同じ長さのfloat64配列を1つの共有メモリブロックにまとめて置く
+    """
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        keys = tuple(arrays)
+        n = len(arrays[keys[0]])
+        self._shm = shared_memory.SharedMemory(create=True, size=max(len(keys) * n * 8, 1))
+        block = np.ndarray((len(keys), n), dtype=np.float64, buffer=self._shm.buf)
+        for i, key in enumerate(keys):
+            block[i] = arrays[key]
+        self.spec = SharedArraySpec(self._shm.name, (len(keys), n), keys)
+
+    def close(self) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def attach_shared_arrays(spec: SharedArraySpec) -> tuple[shared_memory.SharedMemory, dict[str, np.ndarray]]:
+    shm = shared_memory.SharedMemory(name=spec.name)
+    block = np.ndarray(spec.shape, dtype=np.float64, buffer=shm.buf)
+    block.flags.writeable = False
+    return shm, {key: block[i] for i, key in enumerate(spec.keys)}
+
+#####################
+
+
+### worker ###
+
+# worker毎に1回だけ初期化する
+_worker_shm: shared_memory.SharedMemory | None = None
+_worker_arrays: dict[str, np.ndarray] = {}
+_worker_options: dict = {}
+_sma_cache: dict[int, np.ndarray] = {}
+
+
+def _init_worker(spec: SharedArraySpec, options: dict) -> None:
+    global _worker_shm, _worker_arrays, _worker_options
+    _worker_shm, _worker_arrays = attach_shared_arrays(spec)
+    _worker_options = options
+    _sma_cache.clear()
+
+
+def _sma(period: int) -> np.ndarray:
+    # 組み合わせはshort_period順に並べて渡すため、同じperiodはworker内で再利用される
+    values = _sma_cache.get(period)
+    if values is None:
+        values = talib.SMA(_worker_arrays["closes"], timeperiod=period)
+        _sma_cache[period] = values
+    return values
+
+
+def sma_cross_signals(short_values: np.ndarray, long_values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    insert_sma_cross_signalsと同じ条件でゴールデン/デッドクロスの足を求める
+    """
+    prev_short, prev_long = short_values[:-1], long_values[:-1]
+    short, long = short_values[1:], long_values[1:]
+    buy = np.flatnonzero((prev_short <= prev_long) & (short > long)) + 1
+    sell = np.flatnonzero((prev_short >= prev_long) & (short < long)) + 1
+    indices = np.concatenate([buy, sell])
+    sides = np.concatenate([np.ones(len(buy)), np.full(len(sell), -1.0)])
+    order = np.argsort(indices, kind="stable")
+    return indices[order], sides[order]
+
+
+def evaluate_sma_cross(opens: np.ndarray,
+                       closes: np.ndarray,
+                       short_values: np.ndarray,
+                       long_values: np.ndarray,
+                       options: dict) -> dict:
+    signal_indices, signal_sides = sma_cross_signals(short_values, long_values)
+    if not options.get("allow_short", False):
+        signal_sides = np.maximum(signal_sides, 0.0)
+    result = run_vectorized_backtest(
+        opens,
+        closes,
+        signal_indices,
+        signal_sides,
+        initial_capital=options.get("initial_capital", 1_000_000.0),
+        quantity=options.get("quantity", 10_000.0),
+        spread=options.get("spread", 0.0),
+        fee_per_trade=options.get("fee_per_trade", 0.0),
+        bars_per_year=options.get("bars_per_year", SECONDS_PER_YEAR / 60),
+    )
+    return result.summary()
+
+
+def _evaluate_combination(combination: tuple[int, int]) -> dict:
+    short_period, long_period = combination
+    summary = evaluate_sma_cross(
+        _worker_arrays["opens"],
+        _worker_arrays["closes"],
+        _sma(short_period),
+        _sma(long_period),
+        _worker_options,
+    )
+    return {"short_period": short_period, "long_period": long_period, **summary}
+
+##############
+
+
+def parse_period_range(value: str) -> list[int]:
+    """
+    "5:30:5" (start:stop:step, stopを含む) または "5,10,20"
+    """
+    try:
+        if ":" in value:
+            start, stop, *step = (int(item) for item in value.split(":"))
+            return list(range(start, stop + 1, step[0] if step else 1))
+        return [int(item) for item in value.split(",")]
+    except ValueError as exc:
+        raise ValueError(f"invalid period range: {value!r}") from exc
+
+
+def build_grid(short_periods: list[int], long_periods: list[int]) -> list[tuple[int, int]]:
+    return sorted((short, long) for short, long in product(short_periods, long_periods) if short < long)
+
+
+def run_sweep(arrays: dict[str, np.ndarray],
+              grid: list[tuple[int, int]],
+              *,
+              workers: int | None = None,
+              options: dict | None = None,
+              metric: str = "sharpe",
+              ) -> tuple[list[dict], float]:
+    """
+    全組み合わせを評価し、metricの降順(max_drawdownは0に近い順)に並べて返す
+    """
+    if metric not in RANK_METRICS:
+        raise ValueError(f"metric must be one of {RANK_METRICS}")
+    if not grid:
+        return [], 0.0
+
+    workers = workers or os.cpu_count() or 1
+    # 同じshort_periodが同じworkerに集まるよう、連続したチャンクで渡す
+    chunksize = max(1, len(grid) // (workers * 4))
+
+    started = time.perf_counter()
+    with SharedArrays({key: arrays[key] for key in SHARED_ARRAY_KEYS}) as shared:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shared.spec, options or {}),
+        ) as executor:
+            results = list(executor.map(_evaluate_combination, grid, chunksize=chunksize))
+    elapsed = time.perf_counter() - started
+
+    results.sort(key=lambda item: item[metric], reverse=True)
+    return results, elapsed
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="SMA cross parameter sweep")
+    parser.add_argument("--currency-pair", default=DEFAULT_CURRENCY_PAIR_CODE)
+    parser.add_argument("--timeframe", default=DEFAULT_TIMEFRAME_CODE)
+    parser.add_argument("--short", default="5:30:5", help="start:stop:step or comma-separated list")
+    parser.add_argument("--long", default="20:120:10", help="start:stop:step or comma-separated list")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--metric", default="sharpe", choices=RANK_METRICS)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--quantity", type=float, default=10_000.0)
+    parser.add_argument("--spread", type=float, default=0.0)
+    parser.add_argument("--allow-short", action="store_true")
+    args = parser.parse_args(argv)
+
+    with session_scope() as session:
+        data = load_ohlc_arrays(session, currency_pair_code=args.currency_pair, timeframe_code=args.timeframe)
+
+    grid = build_grid(parse_period_range(args.short), parse_period_range(args.long))
+    options = {
+        "quantity": args.quantity,
+        "spread": args.spread,
+        "allow_short": args.allow_short,
+        "bars_per_year": SECONDS_PER_YEAR / data["duration_seconds"],
+    }
+    results, elapsed = run_sweep(data, grid, workers=args.workers, options=options, metric=args.metric)
+
+    print(f"{args.currency_pair} {args.timeframe}: {len(data['closes'])} bars, {len(grid)} combinations")
+    print(f"elapsed={elapsed:.2f}s throughput={len(grid) / elapsed if elapsed else 0:.1f} combinations/s")
+    print(f"{'short':>6} {'long':>6} {'trades':>7} {'return':>9} {'max_dd%':>9} {'sharpe':>8}")
+    for item in results[:args.top]:
+        print(
+            f"{item['short_period']:>6} {item['long_period']:>6} {item['n_trades']:>7} "
+            f"{item['total_return']:>9.4f} {item['max_drawdown_pct']:>9.4f} {item['sharpe']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+# signal engine
+"""
+宣言的に定義したstrategyのルールを、(通貨ペア, timeframe)毎に1回ロードした
+indicatorの配列に対してNumPyでまとめて評価し、fact_buysell_eventsへ一括insertする。
+
+ルールの定義例(yaml):
+
+    strategies:
+      - name: rsi_oversold_14
+        event_type: BUY
+        rule:
+          cross_below: [rsi:14, 30]
+      - name: sma_golden_rsi_filter
+        event_type: BUY
+        rule:
+          all:
+            - cross_above: [sma:14, sma:28]
+            - below: [rsi:14, 70]
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import yaml
+from sqlalchemy.sql.elements import quoted_name
+
+from src.config.config import SCHEMA_NAME_OHLC
+import src.etl.flows.transform_helpers as helpers
+
+# series名 -> factテーブル名
+INDICATOR_TABLES = {
+    "sma": "fact_sma",
+    "ema": "fact_ema",
+    "rsi": "fact_rsi",
+}
+PRICE_SERIES = ("open", "high", "low", "close")
+EVENT_TYPES = ("BUY", "SELL")
+
+
+### rule definitions ###
+
+@dataclass(frozen=True)
+class Series:
+    indicator: str
+    period: int | None = None
+
+    @property
+    def key(self) -> str:
+        return self.indicator if self.period is None else f"{self.indicator}:{self.period}"
+
+
+@dataclass(frozen=True)
+class Cross:
+    """
+    leftがrightを上抜け(above)/下抜け(below)した足でTrue
+    rightに数値を指定した場合は閾値のクロスになる
+    """
+    left: Series
+    right: Series | float
+    direction: str
+
+
+@dataclass(frozen=True)
+class Compare:
+    """
+    leftがrightより上(above)/下(below)にある足でTrue
+    """
+    left: Series
+    right: Series | float
+    direction: str
+
+
+@dataclass(frozen=True)
+class AllOf:
+    rules: tuple
+
+
+@dataclass(frozen=True)
+class AnyOf:
+    rules: tuple
+
+
+@dataclass(frozen=True)
+class StrategyDefinition:
+    name: str
+    event_type: str
+    rule: Cross | Compare | AllOf | AnyOf
+    trigger: Series
+
+
+def parse_series(value: str) -> Series:
+    indicator, _, period = str(value).strip().lower().partition(":")
+    if indicator in PRICE_SERIES and not period:
+        return Series(indicator)
+    if indicator not in INDICATOR_TABLES or not period:
+        raise ValueError(f"unsupported series: {value!r}")
+    try:
+        return Series(indicator, int(period))
+    except ValueError as exc:
+        raise ValueError(f"series period must be an integer: {value!r}") from exc
+
+
+def _parse_operand(value) -> Series | float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return parse_series(value)
+
+
+def parse_rule(definition: dict):
+    if not isinstance(definition, dict) or len(definition) != 1:
+        raise ValueError(f"rule must be a single-key mapping: {definition!r}")
+
+    (op, args), = definition.items()
+    if op in ("all", "any"):
+        if not args:
+            raise ValueError(f"{op} requires at least one rule")
+        rules = tuple(parse_rule(item) for item in args)
+        return AllOf(rules) if op == "all" else AnyOf(rules)
+
+    if not isinstance(args, (list, tuple)) or len(args) != 2:
+        raise ValueError(f"{op} requires exactly two operands: {args!r}")
+    left = parse_series(args[0])
+    right = _parse_operand(args[1])
+
+    if op in ("cross_above", "cross_below"):
+        return Cross(left, right, op.removeprefix("cross_"))
+    if op in ("above", "below"):
+        return Compare(left, right, op)
+    raise ValueError(f"unsupported rule: {op!r}")
+
+
+def _first_series(rule) -> Series:
+    if isinstance(rule, (AllOf, AnyOf)):
+        return _first_series(rule.rules[0])
+    return rule.left
+
+
+def parse_strategy(definition: dict) -> StrategyDefinition:
+    name = str(definition.get("name", "")).strip()
+    if not name:
+        raise ValueError("strategy name must not be empty")
+
+    event_type = str(definition.get("event_type", "")).upper()
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"{name}: event_type must be one of {EVENT_TYPES}")
+
+    rule = parse_rule(definition.get("rule"))
+    trigger = definition.get("trigger")
+    return StrategyDefinition(
+        name=name,
+        event_type=event_type,
+        rule=rule,
+        trigger=parse_series(trigger) if trigger else _first_series(rule),
+    )
+
+
+def load_strategy_definitions(path: str | Path) -> list[StrategyDefinition]:
+    with open(path, encoding="utf-8") as f:
+        document = yaml.safe_load(f) or {}
+    strategies = [parse_strategy(item) for item in document.get("strategies", [])]
+
+    names = [strategy.name for strategy in strategies]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"duplicated strategy names: {duplicated}")
+    return strategies
+
+
+def required_series(strategies: list[StrategyDefinition]) -> list[Series]:
+    """
+    全strategyの評価に必要なseriesを重複なく列挙する
+    """
+    found: dict[str, Series] = {"close": Series("close")}
+
+    def _walk(rule):
+        if isinstance(rule, (AllOf, AnyOf)):
+            for child in rule.rules:
+                _walk(child)
+            return
+        for operand in (rule.left, rule.right):
+            if isinstance(operand, Series):
+                found.setdefault(operand.key, operand)
+
+    for strategy in strategies:
+        _walk(strategy.rule)
+        found.setdefault(strategy.trigger.key, strategy.trigger)
+    return list(found.values())
+
+#########################
+
+
+### vectorized evaluation ###
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    shifted = np.empty_like(values)
+    shifted[:1] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+def _operand(operand: Series | float, arrays: dict[str, np.ndarray], size: int) -> np.ndarray:
+    if isinstance(operand, Series):
+        return arrays[operand.key]
+    return np.full(size, operand, dtype=float)
+
+
+def evaluate_rule(rule, arrays: dict[str, np.ndarray], size: int) -> np.ndarray:
+    """
+    ルールを全足に対してまとめて評価し、boolの配列を返す
+    NaNを含む足は比較結果がFalseになるため、シグナルは出ない
+    """
+    if isinstance(rule, AllOf):
+        return np.logical_and.reduce([evaluate_rule(child, arrays, size) for child in rule.rules])
+    if isinstance(rule, AnyOf):
+        return np.logical_or.reduce([evaluate_rule(child, arrays, size) for child in rule.rules])
+
+    left = _operand(rule.left, arrays, size)
+    right = _operand(rule.right, arrays, size)
+    if isinstance(rule, Compare):
+        return left > right if rule.direction == "above" else left < right
+
+    prev_left, prev_right = _shift(left), _shift(right)
+    if rule.direction == "above":
+        return (prev_left <= prev_right) & (left > right)
+    return (prev_left >= prev_right) & (left < right)
+
+
+def evaluate_strategies(strategies: list[StrategyDefinition],
+                        arrays: dict[str, np.ndarray],
+                        size: int) -> dict[str, np.ndarray]:
+    """
+    strategy名 -> シグナルが出た足のindex
+    """
+    return {
+        strategy.name: np.flatnonzero(evaluate_rule(strategy.rule, arrays, size))
+        for strategy in strategies
+    }
+
+#############################
+
+
+### data access ###
+
+def _to_datetime64(values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[us]")
+
+
+def load_aligned_series(connector,
+                        *,
+                        currency_pair_code: str,
+                        timeframe_code: str,
+                        series: list[Series],
+                        since: datetime | None = None,
+                        calc_version: str = "0",
+                        ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    OHLCの時刻を軸に、指定したseriesを同じ長さのfloat配列として揃えて返す
+    indicatorが未計算の末尾の足は切り落とす(次回の実行で評価する)
+    """
+    schema_name = quoted_name(SCHEMA_NAME_OHLC, quote=True)
+    table_name = quoted_name(helpers.ohlc_table(currency_pair_code, timeframe_code), quote=True)
+    currency_id, timeframe_id = helpers.get_ids(connector, currency_pair_code, timeframe_code)
+
+    query = f"""
+    SELECT time, open, high, low, close
+    FROM {schema_name}.{table_name}
+    WHERE time >= COALESCE(:since, '-infinity'::timestamp)
+    ORDER BY time;
+    """
+    rows = connector.execute(query, {"since": since}).all()
+    times = _to_datetime64([row[0] for row in rows])
+    prices = np.array([row[1:] for row in rows], dtype=float).reshape(-1, len(PRICE_SERIES))
+
+    arrays: dict[str, np.ndarray] = {}
+    available = len(times)
+    for item in series:
+        if item.indicator in PRICE_SERIES:
+            arrays[item.key] = prices[:, PRICE_SERIES.index(item.indicator)]
+            continue
+
+        query = f"""
+        SELECT time, value
+        FROM {INDICATOR_TABLES[item.indicator]}
+        WHERE currency_id = :currency_id
+          AND timeframe_id = :timeframe_id
+          AND period = :period
+          AND calc_version = :calc_version
+          AND time >= COALESCE(:since, '-infinity'::timestamp)
+        ORDER BY time;
+        """
+        indicator_rows = connector.execute(
+            query,
+            {
+                "currency_id": currency_id,
+                "timeframe_id": timeframe_id,
+                "period": item.period,
+                "calc_version": calc_version,
+                "since": since,
+            },
+        ).all()
+
+        values = np.full(len(times), np.nan)
+        if indicator_rows:
+            indicator_times = _to_datetime64([row[0] for row in indicator_rows])
+            positions = np.searchsorted(times, indicator_times)
+            matched = positions < len(times)
+            matched[matched] = times[positions[matched]] == indicator_times[matched]
+            values[positions[matched]] = np.array([row[1] for row in indicator_rows], dtype=float)[matched]
+            available = min(available, int(np.searchsorted(times, indicator_times[-1], side="right")))
+        else:
+            available = 0
+        arrays[item.key] = values
+
+    return times[:available], {key: values[:available] for key, values in arrays.items()}
+
+
+def get_watermarks(connector, strategy_names: list[str], currency_id: int, timeframe_id: int) -> dict[str, datetime]:
+    rows = connector.execute(
+        """
+        SELECT strategy_name, last_time
+        FROM etl_signal_watermark
+        WHERE currency_id = :currency_id
+          AND timeframe_id = :timeframe_id;
+        """,
+        {"currency_id": currency_id, "timeframe_id": timeframe_id},
+    ).all()
+    return {name: last_time for name, last_time in rows if name in strategy_names}
+
+
+def run_signal_rules(connector,
+                     *,
+                     strategies: list[StrategyDefinition],
+                     currency_pair_code: str,
+                     timeframe_code: str,
+                     calc_version: str = "0",
+                     ) -> int:
+    """
+    (通貨ペア, timeframe)のデータを1回だけロードし、全strategyを評価してイベントを一括insertする
+    strategy毎のwatermark以降の足のみイベント化する
+    """
+    if not strategies:
+        return 0
+
+    currency_id, timeframe_id = helpers.get_ids(connector, currency_pair_code, timeframe_code)
+    watermarks = get_watermarks(connector, [s.name for s in strategies], currency_id, timeframe_id)
+    # 全strategyにwatermarkがあれば、最も古いwatermarkの足(LAG用の1行)から読み込む
+    since = min(watermarks.values()) if len(watermarks) == len(strategies) else None
+
+    times, arrays = load_aligned_series(
+        connector,
+        currency_pair_code=currency_pair_code,
+        timeframe_code=timeframe_code,
+        series=required_series(strategies),
+        since=since,
+        calc_version=calc_version,
+    )
+    if len(times) == 0:
+        return 0
+
+    signals = evaluate_strategies(strategies, arrays, len(times))
+    closes = arrays["close"]
+
+    insert_rows = []
+    for strategy in strategies:
+        indices = signals[strategy.name]
+        last_time = watermarks.get(strategy.name)
+        if last_time is not None:
+            indices = indices[times[indices] > np.datetime64(last_time, "us")]
+        trigger_values = arrays[strategy.trigger.key]
+        for i in indices:
+            insert_rows.append(
+                {
+                    "strategy_name": strategy.name,
+                    "event_datetime": times[i].item(),
+                    "currency_id": currency_id,
+                    "price": float(closes[i]),
+                    "quantity": 0,
+                    "event_type": strategy.event_type,
+                    "trigger_indicator_name": strategy.trigger.indicator.upper(),
+                    "trigger_indicator_value": float(trigger_values[i]),
+                    "trigger_indicator_timeframe": timeframe_id,
+                    "trigger_indicator_period": strategy.trigger.period or 0,
+                }
+            )
+
+    if insert_rows:
+        connector.execute(
+            """
+            INSERT INTO fact_buysell_events (
+                strategy_name,
+                event_datetime,
+                currency_id,
+                price,
+                quantity,
+                event_type,
+                trigger_indicator_name,
+                trigger_indicator_value,
+                trigger_indicator_timeframe,
+                trigger_indicator_period
+            )
+            VALUES (
+                :strategy_name,
+                :event_datetime,
+                :currency_id,
+                :price,
+                :quantity,
+                :event_type,
+                :trigger_indicator_name,
+                :trigger_indicator_value,
+                :trigger_indicator_timeframe,
+                :trigger_indicator_period
+            )
+            ON CONFLICT DO NOTHING;
+            """,
+            insert_rows,
+        )
+
+    connector.execute(
+        """
+        INSERT INTO etl_signal_watermark (strategy_name, currency_id, timeframe_id, last_time)
+        VALUES (:strategy_name, :currency_id, :timeframe_id, :last_time)
+        ON CONFLICT (strategy_name, currency_id, timeframe_id) DO UPDATE
+        SET last_time = GREATEST(etl_signal_watermark.last_time, EXCLUDED.last_time),
+            updated_at = CURRENT_TIMESTAMP;
+        """,
+        [
+            {
+                "strategy_name": strategy.name,
+                "currency_id": currency_id,
+                "timeframe_id": timeframe_id,
+                "last_time": times[-1].item(),
+            }
+            for strategy in strategies
+        ],
+    )
+    return len(insert_rows)
+
+###################
@@ -0,0 +1,231 @@
+# walk-forward optimisation
+"""
+OHLCをローリングのtrain/testウィンドウに分割し、trainでSMAクロスのパラメータを最適化して
+直後のtestで評価する。ウィンドウはプロセスプールで並列に処理する。
+
+SMAのt本目の値は直近period本のcloseだけで決まるため、全期間で1回だけ計算して共有メモリに置き、
+各ウィンドウはそのスライスを参照する(ウィンドウ数に比例してindicatorを再計算しない)。
+
+    python -m src.core.walk_forward --train-bars 43200 --test-bars 10080 --short 5:30:5 --long 20:120:10
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+import numpy as np
+import talib
+
+from src.core.backtest_engine import SECONDS_PER_YEAR, BacktestScenario, load_ohlc_arrays
+from src.core.parameter_sweep import (
+    RANK_METRICS,
+    SharedArrays,
+    SharedArraySpec,
+    attach_shared_arrays,
+    build_grid,
+    evaluate_sma_cross,
+    parse_period_range,
+)
+from src.database.base import session_scope
+
+
+@dataclass(frozen=True)
+class Window:
+    train_start: int
+    train_end: int  # exclusive
+    test_start: int
+    test_end: int  # exclusive
+
+
+def build_windows(n_bars: int, train_bars: int, test_bars: int, step_bars: int | None = None) -> list[Window]:
+    """
+    train_bars本で学習し、続くtest_bars本で評価するウィンドウをstep_bars本ずつずらして作る
+    """
+    if train_bars <= 0 or test_bars <= 0:
+        raise ValueError("train_bars and test_bars must be positive")
+    step_bars = step_bars or test_bars
+    return [
+        Window(start, start + train_bars, start + train_bars, start + train_bars + test_bars)
+        for start in range(0, n_bars - train_bars - test_bars + 1, step_bars)
+    ]
+
+
+### worker ###
+
+_worker_shm = None
+_worker_arrays: dict[str, np.ndarray] = {}
+_worker_context: dict = {}
+
+
+def _init_worker(spec: SharedArraySpec, context: dict) -> None:
+    global _worker_shm, _worker_arrays, _worker_context
+    _worker_shm, _worker_arrays = attach_shared_arrays(spec)
+    _worker_context = context
+
+
+def _evaluate_slice(start: int, end: int, short_period: int, long_period: int) -> dict:
+    arrays = _worker_arrays
+    return evaluate_sma_cross(
+        arrays["opens"][start:end],
+        arrays["closes"][start:end],
+        arrays[f"sma:{short_period}"][start:end],
+        arrays[f"sma:{long_period}"][start:end],
+        _worker_context["options"],
+    )
+
+
+def _run_window(window: Window) -> dict:
+    metric = _worker_context["metric"]
+    best_params, best_train = None, None
+    for short_period, long_period in _worker_context["grid"]:
+        summary = _evaluate_slice(window.train_start, window.train_end, short_period, long_period)
+        if best_train is None or summary[metric] > best_train[metric]:
+            best_params, best_train = (short_period, long_period), summary
+
+    test = _evaluate_slice(window.test_start, window.test_end, *best_params)
+    return {
+        "window": window,
+        "short_period": best_params[0],
+        "long_period": best_params[1],
+        "train": best_train,
+        "test": test,
+    }
+
+##############
+
+
+def walk_forward(arrays: dict[str, np.ndarray],
+                 grid: list[tuple[int, int]],
+                 windows: list[Window],
+                 *,
+                 workers: int | None = None,
+                 options: dict | None = None,
+                 metric: str = "sharpe",
+                 ) -> tuple[list[dict], float]:
+    if metric not in RANK_METRICS:
+        raise ValueError(f"metric must be one of {RANK_METRICS}")
+    if not grid or not windows:
+        return [], 0.0
+
+    started = time.perf_counter()
+    closes = arrays["closes"]
+    periods = sorted({period for combination in grid for period in combination})
+    shared_arrays = {
+        "opens": arrays["opens"],
+        "closes": closes,
+        **{f"sma:{period}": talib.SMA(closes, timeperiod=period) for period in periods},
+    }
+    context = {"grid": grid, "metric": metric, "options": options or {}}
+
+    with SharedArrays(shared_arrays) as shared:
+        with ProcessPoolExecutor(
+            max_workers=min(workers or os.cpu_count() or 1, len(windows)),
+            initializer=_init_worker,
+            initargs=(shared.spec, context),
+        ) as executor:
+            results = list(executor.map(_run_window, windows))
+    return results, time.perf_counter() - started
+
+
+def summarize_out_of_sample(results: list[dict], initial_capital: float) -> dict:
+    """
+    testウィンドウの結果をつなげた(毎回initial_capitalから開始した)out-of-sampleの成績
+    """
+    test_pnls = np.array([item["test"]["final_equity"] - initial_capital for item in results])
+    return {
+        "n_windows": len(results),
+        "total_pnl": float(test_pnls.sum()),
+        "profitable_windows": int((test_pnls > 0).sum()),
+        "n_trades": int(sum(item["test"]["n_trades"] for item in results)),
+        "worst_drawdown": float(min((item["test"]["max_drawdown"] for item in results), default=0.0)),
+        "mean_test_sharpe": float(np.mean([item["test"]["sharpe"] for item in results])) if results else 0.0,
+    }
+
+
+def run_walk_forward(scenario: BacktestScenario,
+                     grid: list[tuple[int, int]],
+                     *,
+                     train_bars: int,
+                     test_bars: int,
+                     step_bars: int | None = None,
+                     workers: int | None = None,
+                     metric: str = "sharpe",
+                     ) -> tuple[list[dict], dict, float]:
+    """
+    BacktestFXと同じscenario(通貨ペア, timeframe, 期間, コスト)でwalk-forwardを実行する
+    """
+    with session_scope() as session:
+        data = load_ohlc_arrays(
+            session,
+            currency_pair_code=scenario.currency_pair_code,
+            timeframe_code=scenario.timeframe_code,
+            start_time=scenario.start_time,
+            end_time=scenario.end_time,
+        )
+
+    windows = build_windows(len(data["closes"]), train_bars, test_bars, step_bars)
+    options = {
+        "initial_capital": scenario.initial_capital,
+        "quantity": scenario.quantity,
+        "spread": scenario.spread,
+        "fee_per_trade": scenario.fee_per_trade,
+        "allow_short": scenario.allow_short,
+        "bars_per_year": SECONDS_PER_YEAR / data["duration_seconds"],
+    }
+    results, elapsed = walk_forward(data, grid, windows, workers=workers, options=options, metric=metric)
+    times = data["times"]
+    for item in results:
+        window = item["window"]
+        item["test_start_time"] = times[window.test_start].item()
+        item["test_end_time"] = times[window.test_end - 1].item()
+    return results, summarize_out_of_sample(results, scenario.initial_capital), elapsed
+
+
+def main(argv: list[str] | None = None) -> None:
+    defaults = BacktestScenario()
+    parser = argparse.ArgumentParser(description="SMA cross walk-forward optimisation")
+    parser.add_argument("--currency-pair", default=defaults.currency_pair_code)
+    parser.add_argument("--timeframe", default=defaults.timeframe_code)
+    parser.add_argument("--train-bars", type=int, required=True)
+    parser.add_argument("--test-bars", type=int, required=True)
+    parser.add_argument("--step-bars", type=int, default=None)
+    parser.add_argument("--short", default="5:30:5", help="start:stop:step or comma-separated list")
+    parser.add_argument("--long", default="20:120:10", help="start:stop:step or comma-separated list")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--metric", default="sharpe", choices=RANK_METRICS)
+    parser.add_argument("--spread", type=float, default=defaults.spread)
+    parser.add_argument("--allow-short", action="store_true")
+    args = parser.parse_args(argv)
+
+    scenario = replace(
+        defaults,
+        currency_pair_code=args.currency_pair,
+        timeframe_code=args.timeframe,
+        spread=args.spread,
+        allow_short=args.allow_short,
+    )
+    grid = build_grid(parse_period_range(args.short), parse_period_range(args.long))
+    results, summary, elapsed = run_walk_forward(
+        scenario,
+        grid,
+        train_bars=args.train_bars,
+        test_bars=args.test_bars,
+        step_bars=args.step_bars,
+        workers=args.workers,
+        metric=args.metric,
+    )
+
+    print(f"{len(results)} windows x {len(grid)} combinations in {elapsed:.2f}s")
+    print(f"{'test_start':>20} {'short':>6} {'long':>6} {'train_' + args.metric:>14} {'test_pnl':>12} {'test_dd':>12}")
+    for item in results:
+        print(
+            f"{item['test_start_time']!s:>20} {item['short_period']:>6} {item['long_period']:>6} "
+            f"{item['train'][args.metric]:>14.4f} {item['test']['final_equity'] - scenario.initial_capital:>12.1f} "
+            f"{item['test']['max_drawdown']:>12.1f}"
+        )
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+asyncpgのコネクションプール
+イベントループから直接DBを読む処理(ws_ticker_serverのrelayなど)用。スレッドもsession_scopeのロックも経由しない
+
+asyncpgは接続毎に、prepared statementをクエリ文字列をキーにキャッシュする
+(同じ文字列のクエリは2回目以降parse/planを省く)。パラメータは$1..で渡し、クエリ文字列を固定にすること
+"""
+import asyncio
+import os
+import weakref
+
+import asyncpg
+
+from src.config.db_config import get_db_url
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "4"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
+# プールはイベントループに紐づくため、ループ毎に作る
+_pool_tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = weakref.WeakKeyDictionary()
+
+
+def connect_kwargs() -> dict:
+    url = get_db_url()
+    return {
+        "user": url.username,
+        "password": url.password,
+        "host": url.host,
+        "port": url.port,
+        "database": url.database,
+    }
+
+def _failed(task: asyncio.Task) -> bool:
+    return task.done() and (task.cancelled() or task.exception() is not None)
+
+async def _create_pool() -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        **connect_kwargs(),
+    )
+
+async def get_pool() -> asyncpg.Pool:
+    """
+    現在のイベントループのプール。初回の呼び出しで作成する(同時に呼ばれても1つだけ作る)
+    """
+    loop = asyncio.get_running_loop()
+    task = _pool_tasks.get(loop)
+    if task is None or _failed(task):
+        # 作成に失敗したプールは次の呼び出しで作り直す
+        task = loop.create_task(_create_pool())
+        _pool_tasks[loop] = task
+    return await asyncio.shield(task)
+
+async def close_pool() -> None:
+    task = _pool_tasks.pop(asyncio.get_running_loop(), None)
+    if task is not None and task.done() and not _failed(task):
+        await task.result().close()
+
+async def fetch(sql: str, *args) -> list[asyncpg.Record]:
+    pool = await get_pool()
+    return await pool.fetch(sql, *args)
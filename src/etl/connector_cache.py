@@ -0,0 +1,60 @@
+"""
+Prefectのtaskで使うSqlAlchemyConnectorのプロセス内キャッシュ
+
+SqlAlchemyConnector.loadはblockの解決(Prefect APIの呼び出し)とengine(コネクションプール)の作成を毎回行うため、
+同じプロセスのtaskは(blockの型, block名)毎に1つのconnectorを使い回し、プールの接続を再利用する
+connector.executeは呼び出し毎にプールから接続を借りて返すため、taskのスレッド間で共有できる
+(fetch_one/fetch_manyはconnectorにカーソルの状態を持つため、共有したconnectorでは使わない)
+
+forkした子プロセスは親の接続を使わないよう、キャッシュを作り直す
+"""
+import os
+import threading
+
+from prefect_sqlalchemy import SqlAlchemyConnector
+
+_lock = threading.Lock()
+_connectors: dict[tuple[type, str], SqlAlchemyConnector] = {}
+
+
+def get_connector(block_name: str, connector_cls: type = SqlAlchemyConnector) -> SqlAlchemyConnector:
+    """
+    block_nameのconnector(プロセス内で初回だけloadする)
+    taskは`with`で閉じずにそのまま使う(閉じるとengineが破棄される)
+    """
+    key = (connector_cls, block_name)
+    connector = _connectors.get(key)
+    if connector is not None:
+        return connector
+    with _lock:
+        connector = _connectors.get(key)
+        if connector is None:
+            connector = connector_cls.load(block_name)
+            if isinstance(connector, SqlAlchemyConnector):
+                # engineはロック内で作っておく(taskのスレッドから同時に作られないように)
+                connector.get_engine()
+            _connectors[key] = connector
+    return connector
+
+def clear_connectors() -> None:
+    """
+    キャッシュしたconnectorを閉じる(engineのプールの接続も閉じる)
+    """
+    with _lock:
+        connectors = list(_connectors.values())
+        _connectors.clear()
+    for connector in connectors:
+        if isinstance(connector, SqlAlchemyConnector):
+            connector.close()
+
+def _reset_after_fork() -> None:
+    global _lock
+    _lock = threading.Lock()
+    for connector in _connectors.values():
+        if isinstance(connector, SqlAlchemyConnector):
+            # 親の接続は閉じずに手放す(closeすると親が使っている接続まで切断される)
+            connector.get_engine().dispose(close=False)
+    _connectors.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,438 @@
+"""
+ticker(tick)とohlcの1m足の時間パーティションと保持期間(retention)
+
+- tickは日次、1m足は月次のRANGEパーティション(親テーブルはtimeでパーティション分割、範囲外の行はdefaultへ)
+- 保持期間を過ぎたパーティションはparquet(zstd)に書き出し、行数を確認してからDETACH + DROPする(行数に関係なく一定の時間)
+- 書き出したパーティションはretention_archiveに記録し、restore_partitionsで元の範囲に戻せる(backtest用)
+
+DBのtimestampはUTCのnaiveのため、日時はすべてUTCのnaiveで扱う
+"""
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import src.etl.flows.transform_helpers as helpers
+from src.config.config import SCHEMA_NAME_OHLC, SCHEMA_NAME_TICKER
+
+DAILY = "day"
+MONTHLY = "month"
+OHLC_BASE_TIMEFRAME_CODE = "1m"
+ARCHIVE_COMPRESSION = "zstd"
+RESTORE_BATCH_ROWS = 50_000
+
+_BOUND_PATTERN = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+### Class definition ###
+
+@dataclass(frozen=True)
+class RetentionTarget:
+    schema: str
+    table: str
+    granularity: str
+    retention_days: int
+
+    @property
+    def qualified(self) -> str:
+        return f"{self.schema}.{self.table}"
+
+    @property
+    def default_partition(self) -> str:
+        return f"{self.table}_default"
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: datetime | None  # None: MINVALUE
+    end: datetime | None
+    is_default: bool = False
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        if self.is_default:
+            return False
+        return (self.start is None or self.start < end) and (self.end is None or start < self.end)
+
+##############################
+
+
+######## partitions: start ########
+
+def period_start(value: datetime, granularity: str) -> datetime:
+    if granularity == DAILY:
+        return datetime(value.year, value.month, value.day)
+    if granularity == MONTHLY:
+        return datetime(value.year, value.month, 1)
+    raise ValueError(f"unknown granularity: {granularity}")
+
+def next_period(start: datetime, granularity: str) -> datetime:
+    if granularity == DAILY:
+        return start + timedelta(days=1)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+def partition_name(table: str, start: datetime, granularity: str) -> str:
+    return f"{table}_p{start:%Y%m%d}" if granularity == DAILY else f"{table}_p{start:%Y%m}"
+
+def _bound_value(value: str) -> datetime | None:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+def parse_partition_bound(name: str, bound: str) -> Partition:
+    """
+    pg_get_expr(relpartbound)の文字列("FOR VALUES FROM (...) TO (...)" / "DEFAULT")をPartitionにする
+    """
+    if bound == "DEFAULT":
+        return Partition(name, None, None, is_default=True)
+    match = _BOUND_PATTERN.search(bound)
+    if match is None:
+        raise ValueError(f"not a range partition: {name} {bound}")
+    return Partition(name, _bound_value(match.group(1)), _bound_value(match.group(2)))
+
+def _bound_literal(value: datetime | None) -> str:
+    return "MINVALUE" if value is None else f"'{value.isoformat(sep=' ')}'"
+
+def is_partitioned(connector, target: RetentionTarget) -> bool:
+    result = connector.execute(
+        """
+        SELECT 1
+        FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = :table;
+        """,
+        {"schema": target.schema, "table": target.table},
+    )
+    return result.scalar() is not None
+
+def list_partitions(connector, target: RetentionTarget) -> list[Partition]:
+    rows = connector.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        JOIN pg_namespace n ON n.oid = p.relnamespace
+        WHERE n.nspname = :schema AND p.relname = :table
+        ORDER BY c.relname;
+        """,
+        {"schema": target.schema, "table": target.table},
+    ).all()
+    return [parse_partition_bound(name, bound) for name, bound in rows]
+
+def create_partitioned_table(connector, schema: str, table: str, columns: str) -> None:
+    """
+    timeでRANGEパーティション分割した親テーブルとdefaultパーティションを作成する
+    (日次/月次のパーティションはretentionのflowが作る)
+    """
+    query = f"""
+    CREATE TABLE IF NOT EXISTS {schema}.{table} (
+        time TIMESTAMP PRIMARY KEY,
+        {columns}
+    ) PARTITION BY RANGE (time);
+    CREATE TABLE IF NOT EXISTS {schema}.{table}_default PARTITION OF {schema}.{table} DEFAULT;
+    """
+    connector.execute(query)
+
+def ensure_partitions(connector, target: RetentionTarget, start: datetime, end: datetime) -> list[str]:
+    """
+    [start, end)を覆うパーティションを作成する(既存のパーティションと重なる期間は作らない)
+    defaultパーティションに入っている行は、対応するパーティションへ移す
+    アーカイブ済みの範囲は作り直さない(遅れて届いた行はdefaultに残し、アーカイブのファイルを上書きしない)
+    """
+    default_min = connector.execute(
+        f"SELECT MIN(time) FROM {target.schema}.{target.default_partition};"
+    ).scalar()
+    if default_min is not None:
+        start = min(start, default_min)
+
+    partitions = list_partitions(connector, target)
+    partitions += [
+        Partition(name, record["range_start"], record["range_end"])
+        for name, record in _archive_records(connector, target).items()
+    ]
+    created = []
+    period = period_start(start, target.granularity)
+    while period < end:
+        period_end = next_period(period, target.granularity)
+        if not any(partition.overlaps(period, period_end) for partition in partitions):
+            name = partition_name(target.table, period, target.granularity)
+            query = f"""
+            CREATE TABLE {target.schema}.{name} (LIKE {target.qualified} INCLUDING DEFAULTS);
+            WITH moved AS (
+                DELETE FROM {target.schema}.{target.default_partition}
+                WHERE time >= :start AND time < :end
+                RETURNING *
+            )
+            INSERT INTO {target.schema}.{name} SELECT * FROM moved;
+            ALTER TABLE {target.qualified}
+                ATTACH PARTITION {target.schema}.{name}
+                FOR VALUES FROM ({_bound_literal(period)}) TO ({_bound_literal(period_end)});
+            """
+            connector.execute(query, {"start": period, "end": period_end})
+            partitions.append(Partition(name, period, period_end))
+            created.append(name)
+        period = period_end
+    return created
+
+######## partitions: end ########
+
+
+######## archive: start ########
+
+def archive_path(archive_dir: str, target: RetentionTarget, name: str) -> str:
+    return os.path.join(archive_dir, target.schema, target.table, f"{name}.parquet")
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _arrow_schema(columns: list[str]) -> pa.Schema:
+    # tickerもohlcも time + floatの列
+    return pa.schema([(column, pa.timestamp("us") if column == "time" else pa.float64()) for column in columns])
+
+def write_archive(path: str, columns: list[str], batches) -> tuple[int, str]:
+    """
+    行のbatch(タプルのリスト)をparquet(列指向, zstd)に書き出す。途中で失敗しても壊れたファイルは残さない
+    (行数, sha256)を返す
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    schema = _arrow_schema(columns)
+    tmp_path = f"{path}.tmp"
+    row_count = 0
+    with pq.ParquetWriter(tmp_path, schema, compression=ARCHIVE_COMPRESSION) as writer:
+        for rows in batches:
+            if not rows:
+                continue
+            arrays = [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            row_count += len(rows)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    if pq.ParquetFile(tmp_path).metadata.num_rows != row_count:
+        raise RuntimeError(f"archive row count mismatch: {tmp_path}")
+    os.replace(tmp_path, path)
+    return row_count, _file_sha256(path)
+
+def read_archive(path: str) -> pa.Table:
+    return pq.read_table(path)
+
+def _load_archive(connector, qualified: str, table: pa.Table) -> None:
+    # 列毎の配列をunnestして、batch毎に1回のinsertで戻す(executemanyより速い)
+    columns = table.column_names
+    casts = ", ".join(
+        f"CAST(:{column} AS {'timestamp' if column == 'time' else 'double precision'}[])" for column in columns
+    )
+    query = f"INSERT INTO {qualified} ({', '.join(columns)}) SELECT * FROM unnest({casts});"
+    for batch in table.to_batches(max_chunksize=RESTORE_BATCH_ROWS):
+        connector.execute(query, {column: batch.column(i).to_pylist() for i, column in enumerate(columns)})
+
+def _partition_batches(connector, target: RetentionTarget, partition: Partition):
+    # 大きなパーティション(legacy)でもメモリに全件を載せないよう、日次/月次の範囲毎に読む
+    qualified = f"{target.schema}.{partition.name}"
+    start = partition.start or connector.execute(f"SELECT MIN(time) FROM {qualified};").scalar()
+    if start is None:
+        return
+    period = period_start(start, target.granularity)
+    while period < partition.end:
+        period_end = min(next_period(period, target.granularity), partition.end)
+        yield connector.execute(
+            f"SELECT * FROM {qualified} WHERE time >= :start AND time < :end ORDER BY time;",
+            {"start": period, "end": period_end},
+        ).all()
+        period = period_end
+
+def _table_columns(connector, target: RetentionTarget) -> list[str]:
+    return list(connector.execute(
+        """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = :schema AND table_name = :table
+        ORDER BY ordinal_position;
+        """,
+        {"schema": target.schema, "table": target.table},
+    ).scalars())
+
+def _drop_partition(connector, target: RetentionTarget, partition: Partition, path: str, row_count: int, sha256: str):
+    # DETACHでパーティションをロックし、書き出し後に行が増えていないことを確かめてから台帳に記録してDROPする
+    query = f"""
+    ALTER TABLE {target.qualified} DETACH PARTITION {target.schema}.{partition.name};
+    DO $$
+    BEGIN
+        IF (SELECT count(*) FROM {target.schema}.{partition.name}) <> {int(row_count)} THEN
+            RAISE EXCEPTION 'rows changed after archiving %', '{target.schema}.{partition.name}';
+        END IF;
+    END
+    $$;
+    INSERT INTO retention_archive (
+        partition_name, table_schema, table_name, range_start, range_end, path, row_count, sha256
+    )
+    VALUES (:partition_name, :table_schema, :table_name, :range_start, :range_end, :path, :row_count, :sha256)
+    ON CONFLICT (partition_name) DO UPDATE
+    SET path = EXCLUDED.path,
+        row_count = EXCLUDED.row_count,
+        sha256 = EXCLUDED.sha256,
+        archived_at = CURRENT_TIMESTAMP,
+        restored_until = NULL;
+    DROP TABLE {target.schema}.{partition.name};
+    """
+    connector.execute(
+        query,
+        {
+            "partition_name": partition.name,
+            "table_schema": target.schema,
+            "table_name": target.table,
+            "range_start": partition.start,
+            "range_end": partition.end,
+            "path": path,
+            "row_count": row_count,
+            "sha256": sha256,
+        },
+    )
+
+def archive_partition(connector, target: RetentionTarget, partition: Partition, archive_dir: str) -> dict:
+    """
+    パーティションをparquetに書き出し、DETACH + DROPする
+    """
+    path = archive_path(archive_dir, target, partition.name)
+    row_count, sha256 = write_archive(
+        path, _table_columns(connector, target), _partition_batches(connector, target, partition),
+    )
+    _drop_partition(connector, target, partition, path, row_count, sha256)
+    return {"partition": partition.name, "path": path, "rows": row_count}
+
+def _archive_records(connector, target: RetentionTarget) -> dict[str, dict]:
+    rows = connector.execute(
+        """
+        SELECT partition_name, range_start, range_end, path, row_count, sha256, restored_until
+        FROM retention_archive
+        WHERE table_schema = :schema AND table_name = :table;
+        """,
+        {"schema": target.schema, "table": target.table},
+    ).mappings().all()
+    return {row["partition_name"]: dict(row) for row in rows}
+
+def _archive_is_current(connector, target: RetentionTarget, partition: Partition, record: dict | None) -> bool:
+    # restoreしたパーティションが書き出し済みのファイルと同じ(行が増えていない・ファイルが壊れていない)か
+    if record is None or not os.path.exists(record["path"]) or _file_sha256(record["path"]) != record["sha256"]:
+        return False
+    row_count = connector.execute(f"SELECT count(*) FROM {target.schema}.{partition.name};").scalar()
+    return row_count == record["row_count"]
+
+def partitions_to_archive(partitions: list[Partition],
+                          cutoff: datetime,
+                          records: dict[str, dict],
+                          now: datetime) -> list[Partition]:
+    """
+    範囲の終わりがcutoff以前のパーティション(defaultと、restore中のものは除く)
+    """
+    expired = []
+    for partition in partitions:
+        if partition.is_default or partition.end is None or partition.end > cutoff:
+            continue
+        restored_until = records.get(partition.name, {}).get("restored_until")
+        if restored_until is not None and restored_until > now:
+            continue
+        expired.append(partition)
+    return expired
+
+def apply_retention(connector, target: RetentionTarget, archive_dir: str, now: datetime) -> list[dict]:
+    """
+    保持期間(retention_days)を過ぎたパーティションをアーカイブしてDROPする
+    restoreしたパーティションは、保持期限(restored_until)を過ぎたら書き出し済みのファイルを確かめてDROPする
+    (restore後に行が増えていれば書き出し直す)
+    """
+    cutoff = now - timedelta(days=target.retention_days)
+    records = _archive_records(connector, target)
+    archived = []
+    for partition in partitions_to_archive(list_partitions(connector, target), cutoff, records, now):
+        record = records.get(partition.name)
+        if _archive_is_current(connector, target, partition, record):
+            _drop_partition(connector, target, partition, record["path"], record["row_count"], record["sha256"])
+            archived.append({"partition": partition.name, "path": record["path"], "rows": record["row_count"]})
+        else:
+            archived.append(archive_partition(connector, target, partition, archive_dir))
+    return archived
+
+def restore_partitions(connector,
+                       target: RetentionTarget,
+                       start: datetime,
+                       end: datetime,
+                       hold_until: datetime) -> list[dict]:
+    """
+    [start, end)と重なるアーカイブ済みのパーティションを元の範囲に戻す(ATTACH)
+    hold_untilまではretentionで再びDROPしない(既に戻してあるパーティションは期限だけ延ばす)
+    """
+    attached = {partition.name for partition in list_partitions(connector, target)}
+    records = sorted(
+        (record for record in _archive_records(connector, target).values()
+         if (record["range_start"] is None or record["range_start"] < end) and record["range_end"] > start),
+        key=lambda record: record["range_end"],
+    )
+    restored = []
+    for record in records:
+        name = record["partition_name"]
+        if name not in attached:
+            if _file_sha256(record["path"]) != record["sha256"]:
+                raise RuntimeError(f"archive checksum mismatch: {record['path']}")
+            table = read_archive(record["path"])
+            qualified = f"{target.schema}.{name}"
+            # 前回のrestoreが途中で失敗した時の残り(ATTACH前のテーブル)は作り直す
+            connector.execute(f"""
+            DROP TABLE IF EXISTS {qualified};
+            CREATE TABLE {qualified} (LIKE {target.qualified} INCLUDING DEFAULTS);
+            """)
+            _load_archive(connector, qualified, table)
+            # アーカイブ後に遅れて届いてdefaultに入った行も一緒に戻す(残すとATTACHできない)
+            connector.execute(f"""
+            WITH moved AS (
+                DELETE FROM {target.schema}.{target.default_partition}
+                WHERE time >= COALESCE(CAST(:start AS timestamp), '-infinity') AND time < :end
+                RETURNING *
+            )
+            INSERT INTO {qualified}
+            SELECT * FROM moved m WHERE NOT EXISTS (SELECT 1 FROM {qualified} r WHERE r.time = m.time);
+            ALTER TABLE {target.qualified}
+                ATTACH PARTITION {qualified}
+                FOR VALUES FROM ({_bound_literal(record['range_start'])}) TO ({_bound_literal(record['range_end'])});
+            """, {"start": record["range_start"], "end": record["range_end"]})
+        connector.execute(
+            "UPDATE retention_archive SET restored_until = :hold_until WHERE partition_name = :name;",
+            {"hold_until": hold_until, "name": name},
+        )
+        restored.append({"partition": name, "rows": record["row_count"], "restored_until": hold_until})
+    return restored
+
+######## archive: end ########
+
+
+######## targets: start ########
+
+def retention_targets(connector, *, ticker_retention_days: int, ohlc_base_retention_days: int) -> list[RetentionTarget]:
+    """
+    全通貨ペアのtickerテーブル(日次)とohlcの1m足のテーブル(月次)
+    """
+    pairs = connector.execute("SELECT currency_pair_code FROM dim_currency ORDER BY id;").scalars().all()
+    targets = []
+    for pair in pairs:
+        targets.append(RetentionTarget(SCHEMA_NAME_TICKER, helpers.ticker_table(pair), DAILY, ticker_retention_days))
+        targets.append(RetentionTarget(
+            SCHEMA_NAME_OHLC, helpers.ohlc_table(pair, OHLC_BASE_TIMEFRAME_CODE), MONTHLY, ohlc_base_retention_days,
+        ))
+    return targets
+
+def find_target(targets: list[RetentionTarget], qualified: str) -> RetentionTarget:
+    for target in targets:
+        if target.qualified == qualified:
+            return target
+    raise ValueError(f"not a retention target: {qualified}")
+
+######## targets: end ########
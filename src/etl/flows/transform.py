@@ -1,6 +1,10 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+
 from prefect import flow
 
 from prefect_sqlalchemy import SqlAlchemyConnector
+from src.etl.connector_cache import get_connector
 from src.etl.flows.transform_tasks import (
 create_ticker_tables_task,
 create_ohlc_tables_task,
@@ -9,10 +13,20 @@ update_ohlc_derived_tables_task,
 update_rsi_task,
 update_ema_task,
 update_sma_task,
-insert_dead_cross_task,
-insert_golden_cross_task,
+insert_sma_cross_task,
+evaluate_signal_rules_task,
+ensure_partitions_task,
+apply_retention_task,
+restore_partitions_task,
+)
+from src.etl.flows.retention_services import find_target, retention_targets
+from src.config.config import (
+    RSI_FLOW_DEFAULT_PARAMS,
+    SMA_FLOW_DEFAULT_PARAMS,
+    EMA_FLOW_DEFAULT_PARAMS,
+    SIGNAL_RULES_FLOW_DEFAULT_PARAMS,
+    RETENTION_FLOW_DEFAULT_PARAMS,
 )
-from src.config.config import RSI_FLOW_DEFAULT_PARAMS, SMA_FLOW_DEFAULT_PARAMS, EMA_FLOW_DEFAULT_PARAMS
 import src.etl.flows.transform_helpers as helpers
 
 
@@ -31,13 +45,13 @@ def create_ohlc_tables(block_name = "forex-connector"):
     SELECT DISTINCT currency_pair_code
     FROM dim_currency;
     """
-    currencies = list(SqlAlchemyConnector.load(block_name).execute(query).scalars())
+    currencies = list(get_connector(block_name, SqlAlchemyConnector).execute(query).scalars())
 
     query = """
     SELECT DISTINCT timeframe_code
     FROM dim_timeframe;
     """
-    timeframes = list(SqlAlchemyConnector.load(block_name).execute(query).scalars())
+    timeframes = list(get_connector(block_name, SqlAlchemyConnector).execute(query).scalars())
 
     for currency in currencies:
         for timeframe in timeframes:
@@ -51,13 +65,13 @@ def update_ohlc_tables(block_name = "forex-connector"):
     SELECT DISTINCT currency_pair_code
     FROM dim_currency;
     """
-    currencies = list(SqlAlchemyConnector.load(block_name).execute(query).scalars())
+    currencies = list(get_connector(block_name, SqlAlchemyConnector).execute(query).scalars())
 
     query = """
     SELECT DISTINCT timeframe_code, duration_seconds
     FROM dim_timeframe;
     """
-    result = SqlAlchemyConnector.load(block_name).execute(query)
+    result = get_connector(block_name, SqlAlchemyConnector).execute(query)
     timeframes = result.all()
     timeframes_dict = {timeframe_code: duration_seconds for timeframe_code, duration_seconds in timeframes}
     print(timeframes_dict)
@@ -125,11 +139,72 @@ def strategy(block_name: str = "forex-connector"):
     """
     add strategy tasks here
     """
-    insert_golden_cross_task(block_name)
-    insert_dead_cross_task(block_name)
+    insert_sma_cross_task(block_name)
+
+@flow
+def signal_rules(block_name: str = "forex-connector"):
+    """
+    strategy定義ファイルのルールを(通貨ペア, timeframe)毎にまとめて評価する
+    """
+    strategy_path = SIGNAL_RULES_FLOW_DEFAULT_PARAMS.get("strategy_path")
+    currency_pair_code = SIGNAL_RULES_FLOW_DEFAULT_PARAMS.get("currency_pair_code")
+    futures = []
+    for timeframe_code in SIGNAL_RULES_FLOW_DEFAULT_PARAMS.get("timeframes"):
+        f = evaluate_signal_rules_task.submit(block_name, currency_pair_code, timeframe_code, strategy_path)
+        futures.append(f)
+    return futures
+
+def _utcnow() -> datetime:
+    # DBのtimestampはUTCのnaive
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _retention_targets(block_name: str):
+    return retention_targets(
+        get_connector(block_name, SqlAlchemyConnector),
+        ticker_retention_days=RETENTION_FLOW_DEFAULT_PARAMS.get("ticker_retention_days"),
+        ohlc_base_retention_days=RETENTION_FLOW_DEFAULT_PARAMS.get("ohlc_base_retention_days"),
+    )
+
+@flow
+def retention(block_name: str = "forex-connector"):
+    """
+    tick(日次)と1m足(月次)のパーティションを先に作成し、保持期間を過ぎたパーティションをアーカイブしてdropする
+    """
+    archive_dir = RETENTION_FLOW_DEFAULT_PARAMS.get("archive_dir")
+    now = _utcnow()
+    premake_until = now + timedelta(days=RETENTION_FLOW_DEFAULT_PARAMS.get("premake_days"))
+    futures = []
+    for target in _retention_targets(block_name):
+        ensure = ensure_partitions_task.submit(block_name, target, now, premake_until)
+        futures.append(apply_retention_task.submit(block_name, target, archive_dir, now, wait_for=[ensure]))
+    return futures
+
+@flow
+def restore(table: str, start: datetime, end: datetime, block_name: str = "forex-connector"):
+    """
+    アーカイブ済みの[start, end)をtable(schema.table)に戻す。restore_hold_days日はretentionでdropしない
+    """
+    target = find_target(_retention_targets(block_name), table)
+    hold_until = _utcnow() + timedelta(days=RETENTION_FLOW_DEFAULT_PARAMS.get("restore_hold_days"))
+    restore_partitions_task(block_name, target, start, end, hold_until)
 
 
 
 if __name__ == "__main__":
-    ohlc_pipeline()
-    # indicator()
+    parser = argparse.ArgumentParser(description="etl flows")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("retention", help="パーティションの作成と保持期間の適用")
+    restore_parser = subparsers.add_parser("restore", help="アーカイブ済みの範囲を戻す")
+    restore_parser.add_argument("table", help="e.g. ticker.ticker_usd_jpy, ohlc.usd_jpy_1m")
+    restore_parser.add_argument("start", type=datetime.fromisoformat, help="UTC e.g. 2026-09-01")
+    restore_parser.add_argument("end", type=datetime.fromisoformat, help="UTC (含まない) e.g. 2026-09-08")
+    restore_parser.add_argument("--block-name", default="forex-connector")
+    args = parser.parse_args()
+
+    if args.command == "retention":
+        retention()
+    elif args.command == "restore":
+        restore(args.table, args.start, args.end, block_name=args.block_name)
+    else:
+        ohlc_pipeline()
+        # indicator()
@@ -1,8 +1,7 @@
 from src.config.config import (
     RSI_TASK_DEFAULT_PARAMS,
     SMA_TASK_DEFAULT_PARAMS,
-    SMA_GOLDEN_CROSS_PARAMS,
-    SMA_DEAD_CROSS_PARAMS,
+    SMA_CROSS_PARAMS,
     EMA_TASK_DEFAULT_PARAMS,
 )
 
@@ -13,6 +12,9 @@ def ticker_table(currency_pair_code: str) -> str:
 def ohlc_table(currency_pair_code: str, timeframe_code: str):
     return f"{currency_pair_code.replace('/', '_').lower()}_{timeframe_code}"
 
+def sma_cross_strategy_name(short_period: int, long_period: int) -> str:
+    return f"sma_cross_{short_period}_{long_period}"
+
 
 
 def get_ids(connector, currency_pair_code: str, timeframe_code: str) -> tuple[int, int]:
@@ -47,11 +49,8 @@ def build_rsi_params(overrides: dict | None = None) -> dict:
 def build_sma_params(overrides: dict | None = None) -> dict:
     return {**SMA_TASK_DEFAULT_PARAMS, **(overrides or {})}
 
-def build_sma_golden_cross_params(overrides: dict | None = None) -> dict:
-    return {**SMA_GOLDEN_CROSS_PARAMS, **(overrides or {})}
-
-def build_sma_dead_cross_params(overrides: dict | None = None) -> dict:
-    return {**SMA_DEAD_CROSS_PARAMS, **(overrides or {})}
+def build_sma_cross_params(overrides: dict | None = None) -> dict:
+    return {**SMA_CROSS_PARAMS, **(overrides or {})}
 
 def build_ema_params(overrides: dict | None = None) -> dict:
     return {**EMA_TASK_DEFAULT_PARAMS, **(overrides or {})}
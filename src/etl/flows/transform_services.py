@@ -4,6 +4,7 @@ import talib
 from prefect_sqlalchemy import SqlAlchemyConnector
 from src.config.config import SCHEMA_NAME_OHLC, SCHEMA_NAME_TICKER
 import src.etl.flows.transform_helpers as helpers
+from src.etl.flows.retention_services import OHLC_BASE_TIMEFRAME_CODE, create_partitioned_table
 
 ######### create ticker tables: start #########
 def create_ticker_tables(connector):
@@ -16,14 +17,17 @@ def create_ticker_tables(connector):
     for pair in rows:
         schema_name = quoted_name(SCHEMA_NAME_TICKER, quote=True)
         tablename = quoted_name(helpers.ticker_table(pair[0]), quote=True)
-        create_query = f"""
-        CREATE TABLE IF NOT EXISTS {schema_name}.{tablename} (
-            time TIMESTAMP PRIMARY KEY,
-            bid FLOAT,
-            ask FLOAT
-        );
+        # 日次のパーティションはretentionのflowが作る
+        create_partitioned_table(connector, schema_name, tablename, "bid FLOAT, ask FLOAT")
+
+        # ws_ticker_serverへinsertを通知する(notify_ticker_insertはalembicで作成する)
+        trigger_query = f"""
+        DROP TRIGGER IF EXISTS notify_ticker_insert ON {schema_name}.{tablename};
+        CREATE TRIGGER notify_ticker_insert
+        AFTER INSERT ON {schema_name}.{tablename}
+        FOR EACH STATEMENT EXECUTE FUNCTION {schema_name}.notify_ticker_insert();
         """
-        connector.execute(create_query)
+        connector.execute(trigger_query)
 
 ######### create ticker tables: end #########
 
@@ -38,6 +42,10 @@ def create_ohlc_tables(connector: SqlAlchemyConnector, *, currency_pair_code: st
     """
     schema_name = quoted_name(SCHEMA_NAME_OHLC, quote=True)
     ohlc_table = quoted_name(helpers.ohlc_table(currency_pair_code, timeframe_code), quote=True)
+    if timeframe_code == OHLC_BASE_TIMEFRAME_CODE:
+        # 1m足は月次のパーティション(retentionの対象)。上位足は行数が少ないため分割しない
+        create_partitioned_table(connector, schema_name, ohlc_table, "open FLOAT, high FLOAT, low FLOAT, close FLOAT")
+        return
     query = f"""
     CREATE TABLE IF NOT EXISTS {schema_name}.{ohlc_table} (
         time TIMESTAMP PRIMARY KEY,
@@ -377,135 +385,114 @@ def update_ema(connector,
 
 ######## insert signals based on a strategy: start #############
 
-def insert_sma_golden_cross(connector,
-                            *,
-                            short_period: int,
-                            long_period: int,
-                            # currency_pair_code: str,
-                            # timeframe_code: str
-                            ):
-    # **todo**
-    # timeframeを指定する
+def insert_sma_cross_signals(connector,
+                             *,
+                             short_period: int,
+                             long_period: int,
+                             ):
+    """
+    SMA短期/長期のクロス(BUY: ゴールデンクロス, SELL: デッドクロス)を1回の走査で検出する。
+    etl_signal_watermarkに(strategy, 通貨ペア, timeframe)毎の判定済み時刻を保持し、
+    それ以降の行 + LAG用の1行(watermark時点の行)のみを評価する。
+    fact_smaは(period, currency_id, timeframe_id, time)の順のPKで、系列毎にwatermark以降の範囲だけを読む。
+    """
+    strategy_name = helpers.sma_cross_strategy_name(short_period, long_period)
     query = """
-            INSERT INTO fact_buysell_events (
-                event_datetime,
-                currency_id,
-                price,
-                quantity,
-                event_type,
-                trigger_indicator_name,
-                trigger_indicator_value,
-                trigger_indicator_timeframe,
-                trigger_indicator_period
-            )
-            WITH sma AS (
-                SELECT
-                    s.time,
-                    s.currency_id,
-                    s.timeframe_id,
-                    s.calc_version,
-                    s.value AS short_value,
-                    l.value AS long_value
-                FROM fact_sma s
-                         JOIN fact_sma l
-                              ON s.time = l.time
-                                  AND s.currency_id = l.currency_id
-                                  AND s.timeframe_id = l.timeframe_id
-                                  AND s.calc_version = l.calc_version
-                WHERE s.period = :short_period
-                  AND l.period = :long_period
-            ),
-                 flag AS (
-                     SELECT
-                         *,
-                         LAG(short_value) OVER (
-                             PARTITION BY currency_id, timeframe_id, calc_version
-                             ORDER BY time
-                             ) AS prev_short,
-                         LAG(long_value) OVER (
-                             PARTITION BY currency_id, timeframe_id, calc_version
-                             ORDER BY time
-                             ) AS prev_long
-                     FROM sma
-                 )
+    WITH sma AS (
+        SELECT
+            x.time,
+            c.id AS currency_id,
+            tf.id AS timeframe_id,
+            x.calc_version,
+            x.short_value,
+            x.long_value,
+            w.last_time
+        FROM dim_currency c
+        CROSS JOIN dim_timeframe tf
+        LEFT JOIN etl_signal_watermark w
+          ON w.strategy_name = :strategy_name
+         AND w.currency_id = c.id
+         AND w.timeframe_id = tf.id
+        CROSS JOIN LATERAL (
             SELECT
-                time,
-                currency_id,
-                short_value AS price,
-                0 AS quantity,
-                'BUY' AS event_type,
-                'SMA' AS trigger_indicator_name,
-                short_value AS trigger_indicator_value,
-                timeframe_id AS trigger_indicator_timeframe,
-                :short_period AS trigger_indicator_period
-            FROM flag
-            WHERE prev_short <= prev_long
-              AND short_value > long_value
-            ON CONFLICT DO NOTHING; \
-
-            """
-    connector.execute(query, {"short_period": short_period, "long_period": long_period})
-
-
-def insert_sma_dead_cross(connector,*, short_period: int, long_period: int):
-    query = """
-    INSERT INTO fact_buysell_events (
-        event_datetime, 
-        currency_id, 
-        price, 
-        quantity, 
-        event_type, 
-        trigger_indicator_name, 
-        trigger_indicator_value, 
-        trigger_indicator_timeframe, 
-        trigger_indicator_period
+                s.time,
+                s.calc_version,
+                s.value AS short_value,
+                l.value AS long_value
+            FROM fact_sma s
+            JOIN fact_sma l
+              ON l.period = :long_period
+             AND l.currency_id = s.currency_id
+             AND l.timeframe_id = s.timeframe_id
+             AND l.time = s.time
+             AND l.calc_version = s.calc_version
+             AND l.time >= COALESCE(w.last_time, '-infinity'::timestamp)
+            WHERE s.period = :short_period
+              AND s.currency_id = c.id
+              AND s.timeframe_id = tf.id
+              -- watermark時点の行はLAGの参照用として含める
+              AND s.time >= COALESCE(w.last_time, '-infinity'::timestamp)
+            -- 副問い合わせを展開させない(系列毎のPKの範囲スキャンにする。展開すると全系列のhash joinになる)
+            OFFSET 0
+        ) x
+    ),
+    flag AS (
+        SELECT
+            *,
+            LAG(short_value) OVER (
+                PARTITION BY currency_id, timeframe_id, calc_version
+                ORDER BY time
+            ) AS prev_short,
+            LAG(long_value) OVER (
+                PARTITION BY currency_id, timeframe_id, calc_version
+                ORDER BY time
+            ) AS prev_long
+        FROM sma
+    ),
+    events AS (
+        INSERT INTO fact_buysell_events (
+            strategy_name,
+            event_datetime,
+            currency_id,
+            price,
+            quantity,
+            event_type,
+            trigger_indicator_name,
+            trigger_indicator_value,
+            trigger_indicator_timeframe,
+            trigger_indicator_period
+        )
+        SELECT
+            :strategy_name,
+            time,
+            currency_id,
+            short_value AS price,
+            0 AS quantity,
+            CASE WHEN short_value > long_value THEN 'BUY' ELSE 'SELL' END AS event_type,
+            'SMA' AS trigger_indicator_name,
+            short_value AS trigger_indicator_value,
+            timeframe_id AS trigger_indicator_timeframe,
+            :short_period AS trigger_indicator_period
+        FROM flag
+        WHERE (last_time IS NULL OR time > last_time)
+          AND (
+              (prev_short <= prev_long AND short_value > long_value)
+              OR (prev_short >= prev_long AND short_value < long_value)
+          )
+        ON CONFLICT DO NOTHING
     )
-    WITH sma AS (
-    SELECT
-      s.time,
-      s.currency_id,
-      s.timeframe_id,
-      s.calc_version,
-      s.value AS short_value,
-      l.value AS long_value
-    FROM fact_sma s
-    JOIN fact_sma l
-      ON s.time = l.time
-     AND s.currency_id = l.currency_id
-     AND s.timeframe_id = l.timeframe_id
-     AND s.calc_version = l.calc_version
-    WHERE s.period = :short_period
-      AND l.period = :long_period
-  ),
-  flag AS (
-    SELECT
-      *,
-      LAG(short_value) OVER (
-        PARTITION BY currency_id, timeframe_id, calc_version
-        ORDER BY time
-      ) AS prev_short,
-      LAG(long_value) OVER (
-        PARTITION BY currency_id, timeframe_id, calc_version
-        ORDER BY time
-      ) AS prev_long
+    INSERT INTO etl_signal_watermark (strategy_name, currency_id, timeframe_id, last_time)
+    SELECT :strategy_name, currency_id, timeframe_id, MAX(time)
     FROM sma
-  )
-  SELECT
-    time, 
-    currency_id, 
-    short_value AS price, 
-    0 AS quantity,
-    'SELL' AS event_type, 
-    'SMA' AS trigger_indicator_name,
-    short_value AS trigger_indicator_value, 
-    timeframe_id AS trigger_indicator_timeframe, 
-    :short_period AS trigger_indicator_period
-  FROM flag
-  WHERE prev_short >= prev_long
-    AND short_value < long_value
-  ON CONFLICT DO NOTHING;
-"""
-    connector.execute(query, {"short_period": short_period, "long_period": long_period})
+    GROUP BY currency_id, timeframe_id
+    ON CONFLICT (strategy_name, currency_id, timeframe_id) DO UPDATE
+    SET last_time = GREATEST(etl_signal_watermark.last_time, EXCLUDED.last_time),
+        updated_at = CURRENT_TIMESTAMP;
+    """
+    connector.execute(
+        query,
+        {"strategy_name": strategy_name, "short_period": short_period, "long_period": long_period},
+    )
 
 ######## insert signals based on a strategy: end #############
 
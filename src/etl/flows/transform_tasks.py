@@ -1,5 +1,7 @@
+from datetime import datetime
+
 from prefect import task
-from prefect_sqlalchemy import SqlAlchemyConnector
+from src.etl.connector_cache import get_connector
 from src.etl.flows.transform_services import (
 create_ticker_tables,
 create_ohlc_tables,
@@ -8,22 +10,28 @@ update_ohlc_derived_tables,
 update_ema,
 update_rsi,
 update_sma,
-insert_sma_golden_cross,
-insert_sma_dead_cross,
+insert_sma_cross_signals,
+)
+from src.etl.flows.retention_services import (
+RetentionTarget,
+ensure_partitions,
+apply_retention,
+restore_partitions,
 )
+from src.core.signal_engine import load_strategy_definitions, run_signal_rules
 import src.etl.flows.transform_helpers as helpers
 
 ######## tasks: start ########
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
 def create_ticker_tables_task(block_name: str):
-    with SqlAlchemyConnector.load(block_name) as conn:
-        create_ticker_tables(conn)
+    conn = get_connector(block_name)
+    create_ticker_tables(conn)
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
 def update_ohlc_base_tables_task(block_name: str, currency_pair_code: str, base_timeframe_code: str):
-    with SqlAlchemyConnector.load(block_name) as conn:
-        update_ohlc_base_tables(conn, currency_pair_code, base_timeframe_code)
+    conn = get_connector(block_name)
+    update_ohlc_base_tables(conn, currency_pair_code, base_timeframe_code)
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
 def update_ohlc_derived_tables_task(
@@ -32,18 +40,18 @@ def update_ohlc_derived_tables_task(
         timeframe_code: str,
         timeframe_duration_seconds: int,
         base_timeframe_code: str = '1m'):
-    with SqlAlchemyConnector.load(block_name) as conn:
-        update_ohlc_derived_tables(
-            conn,
-            currency_pair_code,
-            timeframe_code,
-            timeframe_duration_seconds,
-            base_timeframe_code)
+    conn = get_connector(block_name)
+    update_ohlc_derived_tables(
+        conn,
+        currency_pair_code,
+        timeframe_code,
+        timeframe_duration_seconds,
+        base_timeframe_code)
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
 def create_ohlc_tables_task(block_name: str, currency_pair_code: str, timeframe_code: str):
-    with SqlAlchemyConnector.load(block_name) as conn:
-        create_ohlc_tables(conn, currency_pair_code=currency_pair_code, timeframe_code=timeframe_code)
+    conn = get_connector(block_name)
+    create_ohlc_tables(conn, currency_pair_code=currency_pair_code, timeframe_code=timeframe_code)
 
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
@@ -51,36 +59,66 @@ def update_rsi_task(block_name: str,
                     rsi_params: dict | None = None,
                     ):
     params = helpers.build_rsi_params(rsi_params)
-    with SqlAlchemyConnector.load(block_name) as conn:
-        update_rsi(conn, **params)
+    conn = get_connector(block_name)
+    update_rsi(conn, **params)
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
 def update_sma_task(block_name: str,
                     sma_params: dict | None = None,
                     ):
     params = helpers.build_sma_params(sma_params)
-    with SqlAlchemyConnector.load(block_name) as conn:
-        update_sma(conn, **params)
+    conn = get_connector(block_name)
+    update_sma(conn, **params)
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
-def insert_golden_cross_task(block_name: str,
-                             sma_golden_cross_params: dict | None = None
-                             ):
-    params = helpers.build_sma_golden_cross_params()
-    with SqlAlchemyConnector.load(block_name) as conn:
-        insert_sma_golden_cross(conn, **params)
+def insert_sma_cross_task(block_name: str,
+                          sma_cross_params: dict | None = None):
+    params = helpers.build_sma_cross_params(sma_cross_params)
+    conn = get_connector(block_name)
+    insert_sma_cross_signals(conn, **params)
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
-def insert_dead_cross_task(block_name: str,
-                           sma_dead_cross_param: dict | None = None):
-    params = helpers.build_sma_dead_cross_params(sma_dead_cross_param)
-    with SqlAlchemyConnector.load(block_name) as conn:
-        insert_sma_dead_cross(conn, **params)
+def evaluate_signal_rules_task(block_name: str,
+                               currency_pair_code: str,
+                               timeframe_code: str,
+                               strategy_path: str):
+    strategies = load_strategy_definitions(strategy_path)
+    conn = get_connector(block_name)
+    inserted = run_signal_rules(
+        conn,
+        strategies=strategies,
+        currency_pair_code=currency_pair_code,
+        timeframe_code=timeframe_code,
+    )
+    print(f"{currency_pair_code} {timeframe_code}: {inserted} events from {len(strategies)} strategies")
 
 @task(retries=2, retry_delay_seconds=30, log_prints=True)
 def update_ema_task(block_name: str,
                     ema_params: dict | None = None):
-    with SqlAlchemyConnector.load(block_name) as conn:
-        update_ema(conn, **ema_params)
+    conn = get_connector(block_name)
+    update_ema(conn, **ema_params)
+
+@task(retries=2, retry_delay_seconds=30, log_prints=True)
+def ensure_partitions_task(block_name: str, target: RetentionTarget, start: datetime, end: datetime):
+    conn = get_connector(block_name)
+    created = ensure_partitions(conn, target, start, end)
+    print(f"{target.qualified}: created {created}")
+
+@task(retries=2, retry_delay_seconds=30, log_prints=True)
+def apply_retention_task(block_name: str, target: RetentionTarget, archive_dir: str, now: datetime):
+    conn = get_connector(block_name)
+    for archived in apply_retention(conn, target, archive_dir, now):
+        print(f"{target.qualified}: archived {archived['partition']} ({archived['rows']} rows) -> {archived['path']}")
+
+@task(retries=2, retry_delay_seconds=30, log_prints=True)
+def restore_partitions_task(block_name: str,
+                            target: RetentionTarget,
+                            start: datetime,
+                            end: datetime,
+                            hold_until: datetime):
+    conn = get_connector(block_name)
+    for restored in restore_partitions(conn, target, start, end, hold_until):
+        print(f"{target.qualified}: restored {restored['partition']} ({restored['rows']} rows) "
+              f"until {restored['restored_until']}")
 
 ######## tasks: end ########
@@ -0,0 +1,70 @@
+"""
+ingestion(ws-connection.py)からws_ticker_serverへ、DBを経由せずにtickを渡すローカルのbridge
+
+Unix datagram socketで1 tick = 1 datagramを送る。serverが起動していない・受信が溢れた場合は捨てる
+(DBへの保存とDB経由の配信はそのまま動くため、取りこぼしはDB側が補う)
+
+datagram: <qqdd(ingestionの受信時刻 ns, tickの時刻 epoch ms, bid, ask) + symbol(utf-8)
+"""
+import os
+import socket
+import struct
+import time
+from datetime import datetime
+
+TICK_BRIDGE_SOCKET = os.getenv("TICK_BRIDGE_SOCKET", "")
+BRIDGE_TICK = struct.Struct("<qqdd")
+
+
+def encode_bridge_tick(symbol: str, epoch_ms: int, bid: float, ask: float, received_ns: int) -> bytes:
+    return BRIDGE_TICK.pack(received_ns, epoch_ms, bid, ask) + symbol.encode("utf-8")
+
+def decode_bridge_tick(datagram: bytes) -> tuple[str, int, float, float, int]:
+    """
+    (symbol, epoch_ms, bid, ask, received_ns)
+    """
+    received_ns, epoch_ms, bid, ask = BRIDGE_TICK.unpack_from(datagram)
+    return datagram[BRIDGE_TICK.size:].decode("utf-8"), epoch_ms, bid, ask, received_ns
+
+
+class TickBridgePublisher:
+    """
+    ingestion側: 受信したtickをnon-blockingでserverへ送る
+    送信できなかったtickは数えるだけで、受信処理を止めない
+    """
+    def __init__(self, socket_path: str = TICK_BRIDGE_SOCKET):
+        if not socket_path:
+            raise ValueError("socket_path is required")
+        self.socket_path = socket_path
+        self.sent = 0
+        self.dropped = 0
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def publish(self, symbol: str, epoch_ms: int, bid: float, ask: float, received_ns: int | None = None) -> bool:
+        if received_ns is None:
+            received_ns = time.time_ns()
+        try:
+            self._socket.sendto(encode_bridge_tick(symbol, epoch_ms, bid, ask, received_ns), self.socket_path)
+        except OSError:
+            # serverが未起動(FileNotFoundError/ConnectionRefusedError)、受信バッファが一杯(BlockingIOError)
+            self.dropped += 1
+            return False
+        self.sent += 1
+        return True
+
+    def publish_payload(self, data: dict, received_ns: int | None = None) -> bool:
+        """
+        coin.zのtickerメッセージ(symbol, timestamp, bid, ask)を送る
+        """
+        timestamp = datetime.fromisoformat(data["timestamp"].replace("Z", "+00:00"))
+        return self.publish(
+            data["symbol"],
+            int(timestamp.timestamp() * 1000),
+            float(data["bid"]),
+            float(data["ask"]),
+            received_ns,
+        )
+
+    def close(self) -> None:
+        self._socket.close()
@@ -1,14 +1,18 @@
 import json
+import logging
 import os
 import time
 import websocket
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 from src.database.base import session_scope
+from src.gmo.tick_bridge import TICK_BRIDGE_SOCKET, TickBridgePublisher
 from src.database.base import Base
 from sqlalchemy import Column, DateTime, Float, text
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 UTC = timezone.utc
 JST = ZoneInfo('Asia/Tokyo')
 SUBSCRIBE_INTERVAL_SECONDS = float(os.getenv("COINZ_SUBSCRIBE_INTERVAL_SECONDS", "1.0"))
@@ -100,8 +104,12 @@ class Streamer:
     if __debug__:
         websocket.enableTrace(True)
 
-    def __init__(self, currency_pair_symbol):
+    def __init__(self, currency_pair_symbol, listeners=None, bridge: TickBridgePublisher | None = None):
         self.currency_pair_symbol = currency_pair_symbol
+        # 受信したtickerを同じプロセスで処理する関数 listener(data, received_ns)(例: paper_trading.ingestion_listener)
+        self.listeners = list(listeners or [])
+        # DBへの保存を待たずにws_ticker_serverへtickを渡す(TICK_BRIDGE_SOCKETを設定した場合)
+        self.bridge = bridge
         self.rate_limit_hit = False
         self.ws = websocket.WebSocketApp(
             'wss://forex-api.coin.z.com/ws/public/v1',
@@ -129,6 +137,8 @@ class Streamer:
             time.sleep(SUBSCRIBE_INTERVAL_SECONDS)
 
     def on_message(self, ws, message):
+        # listenerの判断までの時間はDBへの保存も含めて受信時刻から測る
+        received_ns = time.perf_counter_ns()
         try:
             data = json.loads(message)
             if data.get("error") == RATE_LIMIT_ERROR:
@@ -144,17 +154,25 @@ class Streamer:
                 print(f"[{self.currency_pair_symbol}] non-ticker message: {data}")
                 return
 
-            time = datetime.fromisoformat(data['timestamp'].replace("Z", "+00:00")).astimezone(UTC)
+            tick_time = datetime.fromisoformat(data['timestamp'].replace("Z", "+00:00")).astimezone(UTC)
             bid = float(data['bid'])
             ask = float(data['ask'])
             symbol = data['symbol']
-            print(symbol, time, bid, ask)
+            print(symbol, tick_time, bid, ask)
 
             ticker = ticker_factory.get(symbol)
             if ticker is None:
                 print(f"unsupported symbol: {symbol}")
                 return
-            ticker.add_ticker(time, bid, ask)
+            if self.bridge is not None:
+                self.bridge.publish_payload(data)
+            ticker.add_ticker(tick_time, bid, ask)
+            for listener in self.listeners:
+                try:
+                    listener(data, received_ns)
+                except Exception:
+                    # strategy側の不具合でingestionを止めない
+                    logger.exception("[%s] listener error", self.currency_pair_symbol)
         except Exception as e:
             print(f"[{self.currency_pair_symbol}] on_message error: {e}")
             raise
@@ -173,4 +191,5 @@ class Streamer:
 
 if __name__ == '__main__':
     load_dotenv()
-    Streamer(ticker_list).run()
+    bridge = TickBridgePublisher(TICK_BRIDGE_SOCKET) if TICK_BRIDGE_SOCKET else None
+    Streamer(ticker_list, bridge=bridge).run()
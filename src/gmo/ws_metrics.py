@@ -0,0 +1,109 @@
+"""
+ws_ticker_serverのメトリクス(Prometheus形式)とhealth check用のHTTPエンドポイント
+wsのportとは別のport(WS_METRICS_PORT, 0で無効)でlistenする
+
+    GET /metrics  Prometheusのテキスト形式
+    GET /healthz  プロセス(イベントループ)が応答すれば200
+    GET /readyz   全通貨ペアのtickがWS_STALE_SECONDS以内に届いていれば200、それ以外は503
+"""
+import asyncio
+import json
+import logging
+import os
+from collections.abc import Callable
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+
+logger = logging.getLogger(__name__)
+
+WS_METRICS_HOST = os.getenv("WS_METRICS_HOST", "0.0.0.0")
+WS_METRICS_PORT = int(os.getenv("WS_METRICS_PORT", "8766"))
+# 最後のtickからこれ以上経った通貨ペアがあれば、readinessを失敗させる
+WS_STALE_SECONDS = float(os.getenv("WS_STALE_SECONDS", "60"))
+
+HTTP_READ_TIMEOUT_SECONDS = 5
+HTTP_REASONS = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}
+
+SEND_SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+POLL_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+TICK_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+### metrics ###
+
+MESSAGES_SENT = Counter("ws_messages_sent", "Frames sent to clients", ["encoding"])
+# JSONはASCIIでエンコードしているため、文字数 = bytes(圧縮前)
+BYTES_SENT = Counter("ws_bytes_sent", "Frame bytes sent to clients, before compression", ["encoding"])
+SEND_SECONDS = Histogram(
+    "ws_send_seconds", "Time to hand one frame to the connection", ["encoding"], buckets=SEND_SECONDS_BUCKETS,
+)
+DROPPED_MESSAGES = Counter("ws_dropped_messages", "Messages dropped for slow consumers", ["policy"])
+
+RELAY_POLL_SECONDS = Histogram(
+    "ws_relay_poll_seconds", "Duration of one db relay query", buckets=POLL_SECONDS_BUCKETS,
+)
+RELAY_ROWS = Counter("ws_relay_rows", "Ticker rows fetched by the db relay", ["symbol"])
+TICK_LATENCY_SECONDS = Histogram(
+    "ws_tick_latency_seconds",
+    "Tick time (db) or ingestion receipt (bridge) to dispatch",
+    ["source"],
+    buckets=TICK_LATENCY_BUCKETS,
+)
+
+##############################
+
+
+async def handle_http(reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter,
+                      readiness: Callable[[], tuple[bool, dict]]) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=HTTP_READ_TIMEOUT_SECONDS)
+        # ヘッダは使わないため読み捨てる
+        while (await asyncio.wait_for(reader.readline(), timeout=HTTP_READ_TIMEOUT_SECONDS)) not in (b"\r\n", b"\n", b""):
+            pass
+    except (TimeoutError, ConnectionError):
+        writer.close()
+        return
+
+    parts = request_line.decode("latin-1").split()
+    path = parts[1].split("?")[0] if len(parts) >= 2 else ""
+    if path == "/metrics":
+        status, content_type, body = 200, CONTENT_TYPE_LATEST, generate_latest(REGISTRY)
+    elif path == "/healthz":
+        status, content_type, body = 200, "application/json", b'{"status": "ok"}'
+    elif path == "/readyz":
+        ready, detail = readiness()
+        status, content_type = (200 if ready else 503), "application/json"
+        body = json.dumps({"status": "ready" if ready else "stale", **detail}).encode()
+    else:
+        status, content_type, body = 404, "text/plain", b"not found"
+
+    header = (
+        f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    try:
+        writer.write(header.encode("latin-1") + body)
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve_metrics(readiness: Callable[[], tuple[bool, dict]],
+                        host: str = WS_METRICS_HOST,
+                        port: int = WS_METRICS_PORT) -> None:
+    """
+    readiness: (ready, 詳細のdict)を返す関数
+    """
+    try:
+        http_server = await asyncio.start_server(lambda r, w: handle_http(r, w, readiness), host=host, port=port)
+    except OSError:
+        # メトリクスが出せなくても配信は止めない
+        logger.exception("failed to serve metrics on %s:%s", host, port)
+        return
+    logger.info("serving metrics on %s:%s", host, port)
+    async with http_server:
+        await http_server.serve_forever()
@@ -0,0 +1,281 @@
+"""
+ws_ticker_serverのマルチプロセス構成
+
+- relay(親プロセス): DB(とingestionからのbridge)から新しいtickを受け取り、全workerへUnix socketで転送する
+  DBへの問い合わせはworker数に関係なくrelayの1本だけ
+- worker(子プロセス): SO_REUSEPORTで同じportをlistenし、clientを受け付けて配信する
+- メトリクス: relayはWS_METRICS_PORT、i番目のworkerはWS_METRICS_PORT + 1 + iで公開する
+
+relay→workerのフレームはbinaryエンコーディングと同じ形式(ヘッダ<BBH + tick毎に<Bqdd)
+workerが接続すると、relayはバッファ済みのtickをREPLAYで送ってからTICKの転送を始める
+
+    python -m src.gmo.ws_ticker_cluster --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+
+from websockets.asyncio.server import serve
+
+from src.gmo import ws_ticker_server as server
+from src.gmo.ws_metrics import WS_METRICS_PORT, serve_metrics
+
+logger = logging.getLogger(__name__)
+
+WS_WORKERS = int(os.getenv("WS_WORKERS", str(os.cpu_count() or 1)))
+WS_RELAY_SOCKET = os.getenv("WS_RELAY_SOCKET", "/tmp/ws_ticker_relay.sock")
+# workerの受信が追いつかず、送信バッファがこれを超えたら切断する(workerは再接続してREPLAYから受け直す)
+RELAY_MAX_WRITE_BUFFER = int(os.getenv("RELAY_MAX_WRITE_BUFFER", str(16 * 1024 * 1024)))
+RELAY_RECONNECT_SECONDS = 1.0
+
+IPC_KIND_TICK = server.BINARY_KIND_TICKER
+IPC_KIND_REPLAY = 2
+
+
+### helper methods ###
+def encode_relay_frame(kind: int, records: list[bytes]) -> bytes:
+    return server.BINARY_HEADER.pack(server.BINARY_VERSION, kind, len(records)) + b"".join(records)
+
+def decode_relay_records(body: bytes) -> list[tuple[server.StreamConfig, server.EncodedMessage]]:
+    """
+    tickのレコード列をpath_configとEncodedMessageに戻す
+    レコードはそのままbinaryのclientへ送るため、再エンコードしない
+    """
+    ticks = []
+    size = server.BINARY_TICK.size
+    for offset in range(0, len(body), size):
+        record = body[offset:offset + size]
+        symbol_id, epoch_ms, bid, ask = server.BINARY_TICK.unpack(record)
+        symbol = server.SYMBOLS[symbol_id]
+        payload = {
+            "bid": bid,
+            "ask": ask,
+            "timestamp": server.format_epoch_ms(epoch_ms),
+            "type": "ticker",
+            "symbol": symbol,
+            "mid": (bid + ask) / 2,
+        }
+        message = server.EncodedMessage(payload, epoch_ms)
+        message._binary = record
+        ticks.append((server.PATH_CONFIG_BY_PATH[server.PATH_BY_SYMBOL[symbol]], message))
+    return ticks
+
+#######################
+
+
+### Class definition ###
+
+class RelayPublisher:
+    """
+    relay側: 接続中のworkerへtickを転送する
+    同じイベントループの周回で届いたtickは1フレームにまとめ、全workerへ同じbytesを書き込む
+    """
+    def __init__(self, max_write_buffer: int = RELAY_MAX_WRITE_BUFFER):
+        self.max_write_buffer = max_write_buffer
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._pending: list[bytes] = []
+        self._scheduled = False
+
+    def __len__(self) -> int:
+        return len(self._writers)
+
+    def publish(self, path_config: server.StreamConfig, message: server.EncodedMessage) -> None:
+        record = message.binary
+        if record is None:
+            return
+        self._pending.append(record)
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self) -> None:
+        self._scheduled = False
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), server.BINARY_MAX_TICKS_PER_FRAME):
+            frame = encode_relay_frame(IPC_KIND_TICK, pending[start:start + server.BINARY_MAX_TICKS_PER_FRAME])
+            for writer in list(self._writers):
+                self._write(writer, frame)
+
+    def _write(self, writer: asyncio.StreamWriter, frame: bytes) -> None:
+        if writer.is_closing():
+            self._writers.discard(writer)
+            return
+        writer.write(frame)
+        if writer.transport.get_write_buffer_size() > self.max_write_buffer:
+            logger.warning("relay worker is too slow, disconnecting")
+            self._writers.discard(writer)
+            writer.close()
+
+    def _replay_records(self) -> list[bytes]:
+        records = []
+        for config in server.PATH_CONFIG_BY_PATH.values():
+            symbol_id = server.SYMBOL_IDS[config.symbol]
+            times, bids, asks = server.tick_buffer_by_path[config.path].last(server.WS_TICK_BUFFER_SIZE)
+            records.extend(
+                server.BINARY_TICK.pack(symbol_id, int(epoch_ms), float(bid), float(ask))
+                for epoch_ms, bid, ask in zip(times, bids, asks)
+            )
+        return records
+
+    async def handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # 未送信のtickはバッファに入っているため、先に既存workerへ流してからREPLAYを送る(重複させない)
+        self.flush()
+        records = self._replay_records()
+        for start in range(0, len(records), server.BINARY_MAX_TICKS_PER_FRAME):
+            writer.write(encode_relay_frame(IPC_KIND_REPLAY, records[start:start + server.BINARY_MAX_TICKS_PER_FRAME]))
+        self._writers.add(writer)
+        logger.info("relay worker connected (%d workers)", len(self._writers))
+        try:
+            # workerからは何も送られてこない。EOFで切断を検知する
+            await reader.read()
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            logger.info("relay worker disconnected (%d workers)", len(self._writers))
+
+#########################
+
+
+### main functions ###
+
+async def handle_relay_frame(kind: int, body: bytes) -> None:
+    """
+    worker側: relayから受け取ったフレームを処理する
+    TICKはclientへ配信し、REPLAYはバッファ・キャッシュだけを埋める(既にあるtickは飛ばす)
+    """
+    ticks = decode_relay_records(body)
+    if kind == IPC_KIND_TICK:
+        for path_config, message in ticks:
+            await server.dispatch_tick(path_config, message)
+    elif kind == IPC_KIND_REPLAY:
+        paths = set()
+        for path_config, message in ticks:
+            tick_buffer = server.tick_buffer_by_path[path_config.path]
+            if tick_buffer.latest_epoch_ms is not None and message.epoch_ms <= tick_buffer.latest_epoch_ms:
+                continue
+            tick_buffer.append(message.epoch_ms, message.payload["bid"], message.payload["ask"])
+            await server.latest_ticker_by_path[path_config.path].set(message.payload)
+            paths.add(path_config.path)
+        for path in paths:
+            server.replay_live_bars(path)
+    else:
+        logger.warning("unknown relay frame kind: %s", kind)
+
+async def relay_client_loop(socket_path: str = WS_RELAY_SOCKET) -> None:
+    """
+    worker側: relayへ接続してフレームを受け取り続ける。切断されたら再接続する
+    """
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+        except OSError:
+            await asyncio.sleep(RELAY_RECONNECT_SECONDS)
+            continue
+
+        logger.info("connected to relay %s", socket_path)
+        try:
+            while True:
+                version, kind, count = server.BINARY_HEADER.unpack(await reader.readexactly(server.BINARY_HEADER.size))
+                body = await reader.readexactly(count * server.BINARY_TICK.size)
+                if version != server.BINARY_VERSION:
+                    raise ValueError(f"unsupported relay frame version: {version}")
+                await handle_relay_frame(kind, body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.warning("relay connection lost, reconnecting")
+        except Exception:
+            logger.exception("relay frame handling failed, reconnecting")
+        finally:
+            writer.close()
+        await asyncio.sleep(RELAY_RECONNECT_SECONDS)
+
+async def run_relay(socket_path: str = WS_RELAY_SOCKET, publisher: RelayPublisher | None = None) -> None:
+    """
+    relay: 直近のtickを読み込んでからworkerの接続を受け付け、DBのrelayを始める
+    """
+    publisher = publisher or RelayPublisher()
+    server.tick_listeners.append(publisher.publish)
+    last_time_by_path = await server.bootstrap_tick_buffers(list(server.PATH_CONFIG_BY_PATH.values()))
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    unix_server = await asyncio.start_unix_server(publisher.handle_worker, path=socket_path)
+    async with unix_server:
+        relay_tasks = [server.db_relay_coordinator_loop(last_time_by_path)]
+        if server.DB_RELAY_MODE == "notify":
+            relay_tasks.append(server.notify_listener.run())
+        if server.TICK_BRIDGE_SOCKET:
+            relay_tasks.append(server.tick_bridge_loop())
+        if WS_METRICS_PORT:
+            relay_tasks.append(serve_metrics(server.readiness))
+        await asyncio.gather(server.relay_latency_report_loop(), *relay_tasks)
+
+async def run_worker(host: str, port: int, socket_path: str = WS_RELAY_SOCKET, metrics_port: int = 0) -> None:
+    """
+    worker: SO_REUSEPORTで同じportをlistenし、relayから受け取ったtickを配信する
+    """
+    # 確定済みの足はworker毎に起動時に1回だけDBから読み込む(以降の足はrelayのtickから組み立てる)
+    await server.bootstrap_live_bars()
+    async with serve(server.handler, host=host, port=port, reuse_port=True, **server.compression_options()):
+        metrics_tasks = [serve_metrics(server.readiness, port=metrics_port)] if metrics_port else []
+        await asyncio.gather(server.heart_beat_loop(), relay_client_loop(socket_path), *metrics_tasks)
+
+def worker_main(host: str, port: int, socket_path: str, metrics_port: int = 0) -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s %(levelname)s %(name)s[worker {os.getpid()}]: %(message)s",
+    )
+    try:
+        asyncio.run(run_worker(host, port, socket_path, metrics_port))
+    except KeyboardInterrupt:
+        pass
+
+def start_workers(n_workers: int,
+                  host: str,
+                  port: int,
+                  socket_path: str,
+                  metrics_port: int = 0) -> list[multiprocessing.Process]:
+    """
+    metrics_portを指定すると、i番目のworkerはmetrics_port + 1 + iでメトリクスを公開する
+    """
+    # 親のイベントループや接続を引き継がないよう、spawnで起動する
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=worker_main,
+            args=(host, port, socket_path, metrics_port + 1 + i if metrics_port else 0),
+            daemon=True,
+        )
+        for i in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="multi-process ticker websocket server")
+    parser.add_argument("--workers", type=int, default=WS_WORKERS)
+    parser.add_argument("--host", default=os.getenv("WS_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WS_PORT", 8765)))
+    parser.add_argument("--socket", default=WS_RELAY_SOCKET)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s[relay]: %(message)s",
+    )
+    workers = start_workers(args.workers, args.host, args.port, args.socket, WS_METRICS_PORT)
+    logger.info("started %d workers on %s:%s", len(workers), args.host, args.port)
+    try:
+        asyncio.run(run_relay(args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,52 @@
 import asyncio
 import json
+import math
 import os
+import socket
+import struct
+import time
+from collections import defaultdict, deque
+from functools import cache
+from collections.abc import Callable
 from datetime import datetime, timezone
 import logging
-
-from src.config.config import SCHEMA_NAME_TICKER
+from urllib.parse import parse_qs, urlsplit
+
+import asyncpg
+import numpy as np
+
+from src.config.config import DEFAULT_STRATEGY_DEFINITIONS_PATH, SCHEMA_NAME_OHLC, SCHEMA_NAME_TICKER
+from src.core.paper_trading import INCREMENTAL_INDICATORS
+from src.core.signal_engine import (
+    PRICE_SERIES,
+    Series,
+    StrategyDefinition,
+    evaluate_rule,
+    load_strategy_definitions,
+    parse_series,
+    required_series,
+)
+from src.database import async_base
 from src.database.base import session_scope
+from src.gmo.tick_bridge import TICK_BRIDGE_SOCKET, decode_bridge_tick
+from src.gmo.ws_metrics import (
+    BYTES_SENT,
+    DROPPED_MESSAGES,
+    MESSAGES_SENT,
+    RELAY_POLL_SECONDS,
+    RELAY_ROWS,
+    SEND_SECONDS,
+    TICK_LATENCY_SECONDS,
+    WS_METRICS_PORT,
+    WS_STALE_SECONDS,
+    serve_metrics,
+)
+import src.etl.flows.transform_helpers as helpers
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
 from sqlalchemy import text
 from websockets.asyncio.server import ServerConnection, serve
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
 from websockets.exceptions import ConnectionClosed
 from dataclasses import dataclass
 
@@ -48,11 +87,77 @@ PATH_CONFIG_BY_PATH = {
 }
 
 
+# 複数の通貨ペア/チャンネルを1本の接続で購読するエンドポイント
+MULTIPLEX_PATH = "/ws/stream"
+CHANNELS = ("ticker",)
+SYMBOLS = tuple(config.symbol for config in PATH_CONFIG_BY_PATH.values())
+PATH_BY_SYMBOL = {config.symbol: config.path for config in PATH_CONFIG_BY_PATH.values()}
+
+# 接続時に ?encoding=json|binary で選ぶ
+# binaryのtickerフレーム: header <BBH (version, kind, 件数) + 1件毎に <Bqdd (symbol_id, epoch ms, bid, ask)
+# symbol_idはSYMBOLSのindex。ticker以外のメッセージはbinaryでもJSONのテキストフレームで送る
+ENCODINGS = ("json", "binary")
+SYMBOL_IDS = {symbol: i for i, symbol in enumerate(SYMBOLS)}
+BINARY_VERSION = 1
+BINARY_KIND_TICKER = 1
+BINARY_HEADER = struct.Struct("<BBH")
+BINARY_TICK = struct.Struct("<Bqdd")
+BINARY_MAX_TICKS_PER_FRAME = 0xFFFF
+# ?batch_ms=N を指定した場合、N ms内に積まれたメッセージを1フレームにまとめる
+MAX_BATCH_MS = 1000
+
+# permessage-deflate: deflate / none
+WS_COMPRESSION = os.getenv("WS_COMPRESSION", "deflate")
+WS_COMPRESSION_LEVEL = int(os.getenv("WS_COMPRESSION_LEVEL", "6"))
+WS_COMPRESSION_WINDOW_BITS = int(os.getenv("WS_COMPRESSION_WINDOW_BITS", "12"))
+WS_COMPRESSION_MEM_LEVEL = int(os.getenv("WS_COMPRESSION_MEM_LEVEL", "5"))
+
 HEARTBEAT_INTERVAL_SECONDS = 30
 
+# relayのDBアクセス: asyncpg(イベントループから直接) | thread(SQLAlchemyをasyncio.to_threadで)
+WS_DB_DRIVER = os.getenv("WS_DB_DRIVER", "asyncpg")
 DB_POLL_INTERVAL_SECONDS = float(os.getenv("DB_POLL_INTERVAL_SECONDS", "1.0"))
 DB_ERROR_RETRY_SECONDS = 3
 
+# notify: tickerテーブルへのinsert時のpg_notifyで該当pathだけを起こす(LISTENできない間はpollする)
+# poll: DB_POLL_INTERVAL_SECONDS毎に全pathを問い合わせる
+DB_RELAY_MODE = os.getenv("DB_RELAY_MODE", "notify")
+DB_NOTIFY_CHANNEL = "ticker_insert"
+# notifyを取りこぼした場合に備えて、notifyが無くてもこの間隔で問い合わせる
+DB_NOTIFY_FALLBACK_SECONDS = float(os.getenv("DB_NOTIFY_FALLBACK_SECONDS", "30.0"))
+# LISTENの接続が黙って切れていないか、この間隔でSELECT 1を送って確かめる(応答が無ければ接続し直す)
+DB_NOTIFY_KEEPALIVE_SECONDS = float(os.getenv("DB_NOTIFY_KEEPALIVE_SECONDS", "10.0"))
+
+# client毎の送信キューの長さと、キューが溢れた(clientの受信が遅い)場合の扱い
+# drop_oldest: 古いメッセージから捨てる / conflate: キューを最新の1件に置き換える / disconnect: 切断する
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "conflate", "disconnect")
+
+# path毎にメモリに保持する直近のtick数(接続時のsnapshot用)
+WS_TICK_BUFFER_SIZE = int(os.getenv("WS_TICK_BUFFER_SIZE", "3600"))
+
+# /ws/ohlc/<pair>/<timeframe> (例: /ws/ohlc/usd_jpy/5m)
+OHLC_PATH_PREFIX = "/ws/ohlc/"
+# dim_timeframeと同じ。起動時にDBから読み込み直す
+OHLC_TIMEFRAMES: dict[str, int] = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "4h": 14400}
+OHLC_BAR_CACHE_SIZE = int(os.getenv("OHLC_BAR_CACHE_SIZE", "500"))
+OHLC_SNAPSHOT_BARS = 100
+# 未確定の足の更新を送る最短の間隔
+OHLC_UPDATE_INTERVAL_SECONDS = float(os.getenv("OHLC_UPDATE_INTERVAL_SECONDS", "0.25"))
+
+# /ws/indicator/<pair>/<timeframe>?series=sma:14,rsi:14
+INDICATOR_PATH_PREFIX = "/ws/indicator/"
+MAX_INDICATOR_PERIOD = 1000
+
+# ingestionからのbridge(TICK_BRIDGE_SOCKETを設定した場合)で受け取ったtickの待ち行列
+TICK_BRIDGE_QUEUE_SIZE = int(os.getenv("TICK_BRIDGE_QUEUE_SIZE", "10000"))
+# bridgeで配信した秒を覚えておく時間。DBの行がこれより遅れて届いた場合は配信しない(重複を避ける)
+TICK_BRIDGE_SECONDS_RETENTION = int(os.getenv("TICK_BRIDGE_SECONDS_RETENTION", "600"))
+
+RELAY_LATENCY_SAMPLES = 10_000
+RELAY_LATENCY_REPORT_SECONDS = float(os.getenv("RELAY_LATENCY_REPORT_SECONDS", "60.0"))
+
 ### helper methods ###
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
@@ -62,29 +167,314 @@ def normalize_utc_timestamp(dt: datetime) -> datetime:
         return dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(timezone.utc)
 
+def to_epoch_ms(dt: datetime) -> int:
+    return int(normalize_utc_timestamp(dt).timestamp() * 1000)
+
+def format_epoch_ms(epoch_ms: int) -> str:
+    dt = datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+    return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+def parse_iso_timestamp(value: str) -> datetime:
+    return normalize_utc_timestamp(datetime.fromisoformat(str(value).replace("Z", "+00:00")))
+
 #######################
 
 
 ### Class definition ###
 
+class EncodedMessage:
+    """
+    payloadをencoding毎に1回だけエンコードし、同じencodingのclientで共有する
+    """
+    __slots__ = ("_binary", "_json", "epoch_ms", "payload")
+
+    def __init__(self, payload: dict, epoch_ms: int | None = None):
+        self.payload = payload
+        self.epoch_ms = epoch_ms
+        self._json: str | None = None
+        self._binary: bytes | None = None
+
+    @property
+    def json(self) -> str:
+        if self._json is None:
+            self._json = json.dumps(self.payload)
+        return self._json
+
+    @property
+    def binary(self) -> bytes | None:
+        """
+        tickerの1件分のレコード(ヘッダはwriterが付ける)。ticker以外はNone
+        """
+        payload = self.payload
+        if self._binary is None and payload.get("type") == "ticker" and payload.get("symbol") in SYMBOL_IDS:
+            epoch_ms = self.epoch_ms
+            if epoch_ms is None:
+                epoch_ms = to_epoch_ms(parse_iso_timestamp(payload["timestamp"]))
+            self._binary = BINARY_TICK.pack(SYMBOL_IDS[payload["symbol"]], epoch_ms, payload["bid"], payload["ask"])
+        return self._binary
+
+    def for_encoding(self, encoding: str) -> str | bytes:
+        if encoding == "binary":
+            binary = self.binary
+            if binary is not None:
+                return binary
+        return self.json
+
+
+def decode_binary_frame(frame: bytes) -> list[dict]:
+    """
+    binaryのtickerフレームをtickerのdictに戻す(client, テスト用)
+    """
+    version, kind, count = BINARY_HEADER.unpack_from(frame)
+    if version != BINARY_VERSION or kind != BINARY_KIND_TICKER:
+        raise ValueError(f"unsupported frame: version={version} kind={kind}")
+    ticks = []
+    for symbol_id, epoch_ms, bid, ask in BINARY_TICK.iter_unpack(frame[BINARY_HEADER.size:]):
+        ticks.append(
+            {
+                "type": "ticker",
+                "symbol": SYMBOLS[symbol_id],
+                "bid": bid,
+                "ask": ask,
+                "mid": (bid + ask) / 2,
+                "timestamp": format_epoch_ms(epoch_ms),
+            }
+        )
+    if len(ticks) != count:
+        raise ValueError(f"frame has {len(ticks)} ticks, header says {count}")
+    return ticks
+
+
+class ClientSession:
+    """
+    clientへの送信キュー
+    broadcastはエンコード済みのメッセージをキューに積むだけで、送信はclient毎のwriterタスクが行う
+    (受信の遅いclientが他のclientへの配信を待たせない)
+    """
+    def __init__(self,
+                 client: ServerConnection,
+                 *,
+                 max_queue: int = WS_SEND_QUEUE_SIZE,
+                 policy: str = WS_SLOW_CONSUMER_POLICY,
+                 encoding: str = "json",
+                 batch_ms: int = 0):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"policy must be one of {SLOW_CONSUMER_POLICIES}")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {ENCODINGS}")
+        self.client = client
+        self.max_queue = max_queue
+        self.policy = policy
+        self.encoding = encoding
+        self.batch_interval = batch_ms / 1000
+        self.dropped = 0
+        self._dropped_counter = DROPPED_MESSAGES.labels(policy)
+        self.closed = False
+        self._queue: deque[str | bytes] = deque()
+        self._ready = asyncio.Event()
+        self._close_task: asyncio.Task | None = None
+
+    def send_message(self, message: EncodedMessage) -> None:
+        self.enqueue(message.for_encoding(self.encoding))
+
+    def enqueue(self, message: str | bytes) -> None:
+        if self.closed:
+            return
+        if len(self._queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                self.dropped += len(self._queue) + 1
+                self._dropped_counter.inc(len(self._queue) + 1)
+                self._queue.clear()
+                self.closed = True
+                self._ready.set()
+                self._close_task = asyncio.create_task(self.client.close(code=1013, reason="slow consumer"))
+                return
+            if self.policy == "conflate":
+                self.dropped += len(self._queue)
+                self._dropped_counter.inc(len(self._queue))
+                self._queue.clear()
+            else:
+                self._queue.popleft()
+                self.dropped += 1
+                self._dropped_counter.inc()
+        self._queue.append(message)
+        self._ready.set()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _next_frame(self) -> str | bytes:
+        first = self._queue.popleft()
+        if isinstance(first, bytes):
+            # 続けて積まれているbinaryのtickは1フレームにまとめる
+            records = [first]
+            while self._queue and isinstance(self._queue[0], bytes) and len(records) < BINARY_MAX_TICKS_PER_FRAME:
+                records.append(self._queue.popleft())
+            return BINARY_HEADER.pack(BINARY_VERSION, BINARY_KIND_TICKER, len(records)) + b"".join(records)
+
+        if not self.batch_interval:
+            return first
+        messages = [first]
+        while self._queue and isinstance(self._queue[0], str):
+            messages.append(self._queue.popleft())
+        if len(messages) == 1:
+            return first
+        return '{"type": "batch", "messages": [' + ", ".join(messages) + "]}"
+
+    async def run_writer(self) -> None:
+        try:
+            while not self.closed:
+                if not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                if self.batch_interval:
+                    await asyncio.sleep(self.batch_interval)
+                    if not self._queue:
+                        continue
+                frame = self._next_frame()
+                messages_sent, bytes_sent, send_seconds = send_metrics_by_type[type(frame)]
+                started = time.perf_counter()
+                await self.client.send(frame)
+                send_seconds.observe(time.perf_counter() - started)
+                messages_sent.inc()
+                bytes_sent.inc(len(frame))
+        except ConnectionClosed:
+            pass
+
+
+class MultiplexSession:
+    """
+    /ws/streamのclient
+    購読中の(channel, symbol)のメッセージだけを送り、max_rateを指定された場合は
+    (channel, symbol)毎に1/max_rate秒の間隔で、その間に届いた最新のメッセージだけを送る
+    """
+    def __init__(self, session: ClientSession):
+        self.session = session
+        self.subscriptions: set[tuple[str, str]] = set()
+        self.min_interval = 0.0
+        self._pending: dict[tuple[str, str], EncodedMessage] = {}
+        self._last_sent: dict[tuple[str, str], float] = {}
+        self._timers: dict[tuple[str, str], asyncio.TimerHandle] = {}
+
+    def set_max_rate(self, max_rate: float | None) -> None:
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+
+    def publish(self, key: tuple[str, str], message: EncodedMessage) -> None:
+        if not self.min_interval:
+            self.session.send_message(message)
+            return
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        wait = self._last_sent.get(key, -math.inf) + self.min_interval - now
+        if wait <= 0 and key not in self._timers:
+            self._send(key, message, now)
+            return
+
+        # 間隔内に届いたメッセージは最新の1件だけ残す
+        self._pending[key] = message
+        if key not in self._timers:
+            self._timers[key] = loop.call_later(wait, self._flush, key)
+
+    def _flush(self, key: tuple[str, str]) -> None:
+        self._timers.pop(key, None)
+        message = self._pending.pop(key, None)
+        if message is not None and key in self.subscriptions:
+            self._send(key, message, asyncio.get_running_loop().time())
+
+    def _send(self, key: tuple[str, str], message: EncodedMessage, now: float) -> None:
+        self._last_sent[key] = now
+        self.session.send_message(message)
+
+    def discard(self, keys) -> None:
+        for key in keys:
+            self._pending.pop(key, None)
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+
+    def close(self) -> None:
+        self.discard(list(self._timers))
+
+
+class SubscriptionHub:
+    """
+    (channel, symbol) -> 購読中のMultiplexSession
+    """
+    def __init__(self) -> None:
+        self._sessions: set[MultiplexSession] = set()
+        self._by_key: dict[tuple[str, str], set[MultiplexSession]] = defaultdict(set)
+
+    def add(self, session: MultiplexSession) -> None:
+        self._sessions.add(session)
+
+    def remove(self, session: MultiplexSession) -> None:
+        self.unsubscribe(session, set(session.subscriptions))
+        self._sessions.discard(session)
+        session.close()
+
+    def subscribe(self, session: MultiplexSession, keys: set[tuple[str, str]]) -> set[tuple[str, str]]:
+        added = keys - session.subscriptions
+        for key in added:
+            self._by_key[key].add(session)
+        session.subscriptions |= added
+        return added
+
+    def unsubscribe(self, session: MultiplexSession, keys: set[tuple[str, str]]) -> None:
+        for key in keys & session.subscriptions:
+            subscribers = self._by_key[key]
+            subscribers.discard(session)
+            if not subscribers:
+                del self._by_key[key]
+        session.subscriptions -= keys
+        session.discard(keys)
+
+    def publish(self, channel: str, symbol: str, message: EncodedMessage) -> None:
+        key = (channel, symbol)
+        for session in list(self._by_key.get(key, ())):
+            session.publish(key, message)
+
+    def client_sessions(self) -> list[ClientSession]:
+        return [session.session for session in self._sessions]
+
+    def publish_all(self, message: EncodedMessage) -> None:
+        """
+        heartbeatなど、購読に関係なく全clientへ送るメッセージ
+        """
+        for session in self._sessions:
+            session.session.send_message(message)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
 class ClientRegistry:
     def __init__(self):
-        self._clients: set[ServerConnection] = set()
+        self._clients: set[ClientSession] = set()
         self._lock = asyncio.Lock()
 
-    async def add(self, client: ServerConnection) -> int:
+    async def add(self, client: ClientSession) -> int:
         async with self._lock:
             self._clients.add(client)
 
-    async def remove(self, client: ServerConnection) -> int:
+    async def remove(self, client: ClientSession) -> int:
         async with self._lock:
             self._clients.discard(client)
             return len(self._clients)
 
-    async def snapshot(self) -> list[ServerConnection]:
+    async def snapshot(self) -> list[ClientSession]:
         async with self._lock:
             return list(self._clients)
 
+    def snapshot_nowait(self) -> list[ClientSession]:
+        # timerのcallbackなど、awaitできない箇所から送る場合
+        return list(self._clients)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
 class LatestTickerCache:
     def __init__(self) -> None:
         self._ticker: dict | None = None
@@ -98,6 +488,457 @@ class LatestTickerCache:
         async with self._lock:
             return dict(self._ticker) if self._ticker is not None else None
 
+class TickRingBuffer:
+    """
+    直近capacity件のtick(epoch ms, bid, ask)を固定長のNumPy配列に保持する
+    relayは時刻順に追加するため、バッファ内も時刻順になる
+    """
+    def __init__(self, capacity: int = WS_TICK_BUFFER_SIZE):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._times = np.zeros(capacity, dtype=np.int64)
+        self._bids = np.zeros(capacity, dtype=np.float64)
+        self._asks = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, epoch_ms: int, bid: float, ask: float) -> None:
+        i = self._next
+        self._times[i] = epoch_ms
+        self._bids[i] = bid
+        self._asks[i] = ask
+        self._next = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    @property
+    def latest_epoch_ms(self) -> int | None:
+        if self._size == 0:
+            return None
+        return int(self._times[(self._next - 1) % self.capacity])
+
+    def _ordered(self, count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        indices = (self._next - count + np.arange(count)) % self.capacity
+        return self._times[indices], self._bids[indices], self._asks[indices]
+
+    def last(self, n: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._ordered(max(0, min(n, self._size)))
+
+    def since(self, epoch_ms: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        epoch_msより後のtick
+        """
+        times, bids, asks = self._ordered(self._size)
+        start = int(np.searchsorted(times, epoch_ms, side="right"))
+        return times[start:], bids[start:], asks[start:]
+
+    def insert(self, epoch_ms: int, bid: float, ask: float) -> None:
+        """
+        時刻順の位置へ追加する(bridgeの取りこぼしをDBの行で後から補った場合)。満杯なら最も古いtickを捨てる
+        """
+        latest_epoch_ms = self.latest_epoch_ms
+        if latest_epoch_ms is None or epoch_ms >= latest_epoch_ms:
+            self.append(epoch_ms, bid, ask)
+            return
+        times, bids, asks = self._ordered(self._size)
+        position = int(np.searchsorted(times, epoch_ms, side="right"))
+        times = np.insert(times, position, epoch_ms)[-self.capacity:]
+        bids = np.insert(bids, position, bid)[-self.capacity:]
+        asks = np.insert(asks, position, ask)[-self.capacity:]
+        size = len(times)
+        self._times[:size], self._bids[:size], self._asks[:size] = times, bids, asks
+        self._size = size
+        self._next = size % self.capacity
+
+
+@dataclass(slots=True)
+class OhlcBar:
+    start_ms: int
+    open: float
+    high: float
+    low: float
+    close: float
+    # 起動時に、足の開始時刻より前のtickがバッファに残っていなかった足
+    partial: bool = False
+
+
+class LiveBarSeries:
+    """
+    1つの(通貨ペア, timeframe)の足
+    tick(bid)毎にO(1)で未確定の足を更新し、次の足のtickが来た時点で確定させる(ohlcテーブルと同じ)
+    確定した足は直近cache_size本を保持する
+    """
+    def __init__(self,
+                 symbol: str,
+                 timeframe: str,
+                 duration_seconds: int,
+                 cache_size: int = OHLC_BAR_CACHE_SIZE,
+                 update_interval: float = OHLC_UPDATE_INTERVAL_SECONDS):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.duration_ms = duration_seconds * 1000
+        self.update_interval = update_interval
+        self.closed: deque[OhlcBar] = deque(maxlen=cache_size)
+        self.open_bar: OhlcBar | None = None
+        self.registry = ClientRegistry()
+        # これより前のtickは反映済み(再送・遅延したtickを二重に数えない)
+        self.last_epoch_ms = -1
+        self._last_update_sent = -math.inf
+        self._timer: asyncio.TimerHandle | None = None
+
+    def load_closed(self, bars: list[OhlcBar]) -> None:
+        self.closed.extend(bars)
+        if bars:
+            self.last_epoch_ms = max(self.last_epoch_ms, bars[-1].start_ms + self.duration_ms - 1)
+
+    def update(self, epoch_ms: int, price: float, partial: bool = False) -> OhlcBar | None:
+        """
+        tickを反映し、確定した足があれば返す
+        """
+        if epoch_ms < self.last_epoch_ms:
+            return None
+        self.last_epoch_ms = epoch_ms
+
+        start_ms = epoch_ms - epoch_ms % self.duration_ms
+        bar = self.open_bar
+        if bar is not None and bar.start_ms == start_ms:
+            bar.high = max(bar.high, price)
+            bar.low = min(bar.low, price)
+            bar.close = price
+            return None
+
+        self.open_bar = OhlcBar(start_ms, price, price, price, price, partial)
+        if bar is not None:
+            self.closed.append(bar)
+        return bar
+
+    def payload(self, bar: OhlcBar, closed: bool) -> dict:
+        return {
+            "type": "ohlc",
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "closed": closed,
+            "bar": bar_payload(bar),
+            "timestamp": utc_now_iso(),
+        }
+
+    def snapshot_payload(self, last: int) -> dict:
+        bars = list(self.closed)[-last:] if last > 0 else []
+        return {
+            "type": "ohlc_snapshot",
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "bars": [bar_payload(bar) for bar in bars],
+            "open": bar_payload(self.open_bar) if self.open_bar is not None else None,
+            "timestamp": utc_now_iso(),
+        }
+
+    def notify_update(self) -> None:
+        """
+        未確定の足の更新を、update_interval毎に最新の状態だけ送る
+        """
+        if self._timer is not None or not len(self.registry) or self.open_bar is None:
+            return
+        loop = asyncio.get_running_loop()
+        wait = self._last_update_sent + self.update_interval - loop.time()
+        if wait <= 0:
+            self._send_update()
+        else:
+            self._timer = loop.call_later(wait, self._send_update)
+
+    def _send_update(self) -> None:
+        self._timer = None
+        self._last_update_sent = asyncio.get_running_loop().time()
+        if self.open_bar is None:
+            return
+        message = EncodedMessage(self.payload(self.open_bar, closed=False))
+        for client in self.registry.snapshot_nowait():
+            client.send_message(message)
+
+
+class LiveIndicatorState:
+    """
+    1つの(通貨ペア, timeframe)のindicatorとstrategyの状態
+    足の確定毎にindicatorを逐次更新し(talibと同じ値)、値とシグナルを購読中のclientへ送る
+    """
+    def __init__(self, bars: LiveBarSeries, strategies: list[StrategyDefinition]):
+        self.bars = bars
+        self.strategies = strategies
+        self.indicators: dict[str, object] = {}
+        self.current: dict[str, float] = {}
+        self.previous: dict[str, float] = {}
+        self.last_time_ms: int | None = None
+        # session -> 購読中のseriesのkey
+        self.sessions: dict[ClientSession, tuple[str, ...]] = {}
+        self.lock = asyncio.Lock()
+
+    def missing(self, series_list: list[Series]) -> list[Series]:
+        return [
+            series for series in series_list
+            if series.indicator not in PRICE_SERIES and series.key not in self.indicators
+        ]
+
+    def add_indicators(self, series_list: list[Series], closes: list[tuple[int, float]]) -> None:
+        """
+        新しいindicatorを過去の終値で初期化する
+        既存のindicatorと同じ足(last_time_msまで)を使い、以降は足の確定毎に一緒に更新する
+        """
+        if self.last_time_ms is not None:
+            closes = [(time_ms, close) for time_ms, close in closes if time_ms <= self.last_time_ms]
+        for series in series_list:
+            indicator = INCREMENTAL_INDICATORS[series.indicator](series.period)
+            values = [indicator.update(close) for _, close in closes]
+            self.indicators[series.key] = indicator
+            self.current[series.key] = values[-1] if values else math.nan
+            self.previous[series.key] = values[-2] if len(values) > 1 else math.nan
+        if closes and self.last_time_ms is None:
+            self.last_time_ms = closes[-1][0]
+            self.current["close"] = closes[-1][1]
+
+    def on_bar_close(self, bar: OhlcBar) -> list[dict]:
+        """
+        確定した足でindicatorを更新し、シグナルのpayloadを返す
+        """
+        if not self.indicators or (self.last_time_ms is not None and bar.start_ms <= self.last_time_ms):
+            return []
+        self.last_time_ms = bar.start_ms
+        self.previous = self.current
+        self.current = {
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": bar.close,
+            **{key: indicator.update(bar.close) for key, indicator in self.indicators.items()},
+        }
+
+        signals = []
+        for strategy in self.strategies:
+            keys = [series.key for series in required_series([strategy])]
+            arrays = {key: np.array([self.previous.get(key, math.nan), self.current[key]]) for key in keys}
+            if evaluate_rule(strategy.rule, arrays, 2)[-1]:
+                signals.append(
+                    {
+                        "type": "signal",
+                        "symbol": self.bars.symbol,
+                        "timeframe": self.bars.timeframe,
+                        "strategy": strategy.name,
+                        "event_type": strategy.event_type,
+                        "time": format_epoch_ms(bar.start_ms),
+                        "price": bar.close,
+                        "trigger": strategy.trigger.key,
+                        "trigger_value": json_float(self.current[strategy.trigger.key]),
+                        "timestamp": utc_now_iso(),
+                    }
+                )
+        return signals
+
+    def values_payload(self, keys: tuple[str, ...], message_type: str = "indicator") -> dict:
+        return {
+            "type": message_type,
+            "symbol": self.bars.symbol,
+            "timeframe": self.bars.timeframe,
+            "time": format_epoch_ms(self.last_time_ms) if self.last_time_ms is not None else None,
+            "values": {key: json_float(self.current.get(key, math.nan)) for key in keys},
+            "timestamp": utc_now_iso(),
+        }
+
+    def publish(self, signals: list[dict]) -> None:
+        # 同じseriesを購読しているclientには、同じエンコード済みのメッセージを送る
+        messages: dict[tuple[str, ...], EncodedMessage] = {}
+        signal_messages = [EncodedMessage(signal) for signal in signals]
+        for session, keys in list(self.sessions.items()):
+            if keys not in messages:
+                messages[keys] = EncodedMessage(self.values_payload(keys))
+            session.send_message(messages[keys])
+            for message in signal_messages:
+                session.send_message(message)
+
+
+class RelayLatency:
+    """
+    tickerの時刻(DBのtime)から配信までの時間を記録する
+    ingestionは秒単位に切り捨てて保存するため、値には最大1秒の切り捨て分を含む
+    """
+    def __init__(self, max_samples: int = RELAY_LATENCY_SAMPLES, histogram=None):
+        self._samples_ms: deque[float] = deque(maxlen=max_samples)
+        # Prometheusのhistogram(ws_tick_latency_seconds)にも記録する
+        self._histogram = histogram
+
+    def record(self, ticker_time: datetime) -> None:
+        self.record_ms((datetime.now(timezone.utc) - ticker_time).total_seconds() * 1000)
+
+    def record_ms(self, latency_ms: float) -> None:
+        self._samples_ms.append(latency_ms)
+        if self._histogram is not None:
+            self._histogram.observe(latency_ms / 1000)
+
+    def summary(self) -> dict:
+        if not self._samples_ms:
+            return {"count": 0}
+        samples = sorted(self._samples_ms)
+        return {
+            "count": len(samples),
+            "p50_ms": round(samples[len(samples) // 2], 1),
+            "p95_ms": round(samples[int(len(samples) * 0.95)], 1),
+            "p99_ms": round(samples[int(len(samples) * 0.99)], 1),
+            "max_ms": round(samples[-1], 1),
+        }
+
+    def reset(self) -> None:
+        self._samples_ms.clear()
+
+
+class RelayWakeup:
+    """
+    新しい行が届いた可能性のあるpathを集め、coordinatorを起こす
+    """
+    def __init__(self) -> None:
+        self._paths: set[str] = set()
+        self._event = asyncio.Event()
+
+    def mark(self, paths) -> None:
+        self._paths.update(paths)
+        self._event.set()
+
+    async def wait(self, timeout: float) -> set[str]:
+        """
+        markされたpathを返す。timeoutまでmarkされなければ全pathを返す
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except TimeoutError:
+            return set(PATH_CONFIG_BY_PATH)
+        self._event.clear()
+        paths, self._paths = self._paths, set()
+        return paths
+
+
+class NotifyListener:
+    """
+    1本のasyncpg接続でLISTENし、notifyのpayload(テーブル名)に対応するpathをwakeupへ渡す
+    """
+    def __init__(self, wakeup: RelayWakeup):
+        self._wakeup = wakeup
+        self._path_by_table = {config.table: config.path for config in PATH_CONFIG_BY_PATH.values()}
+        self.connected = False
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        path = self._path_by_table.get(payload)
+        if path is not None:
+            self._wakeup.mark([path])
+
+    def _wake_all(self) -> None:
+        self._wakeup.mark(PATH_CONFIG_BY_PATH)
+
+    @staticmethod
+    async def _keepalive(connection, terminated: asyncio.Event) -> None:
+        # 接続が閉じられるまで待つ。応答の無い接続(相手が落ちたソケット)は例外にする
+        while True:
+            try:
+                await asyncio.wait_for(terminated.wait(), timeout=DB_NOTIFY_KEEPALIVE_SECONDS)
+                return
+            except TimeoutError:
+                await asyncio.wait_for(connection.fetchval("SELECT 1"), timeout=DB_NOTIFY_KEEPALIVE_SECONDS)
+
+    async def run(self) -> None:
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(**async_base.connect_kwargs())
+                terminated = asyncio.Event()
+                connection.add_termination_listener(lambda _, ev=terminated: ev.set())
+                await connection.add_listener(DB_NOTIFY_CHANNEL, self._on_notify)
+                self.connected = True
+                logger.info("listening on %s", DB_NOTIFY_CHANNEL)
+                # LISTEN開始前にinsertされた行を取りこぼさないよう、全pathを1回起こす
+                self._wake_all()
+                await self._keepalive(connection, terminated)
+            except Exception:
+                logger.exception("LISTEN connection failed, falling back to polling")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    # 応答の無い接続はcloseを待たずに切る
+                    connection.terminate()
+                if self.connected:
+                    self.connected = False
+                    self._wake_all()
+            await asyncio.sleep(DB_ERROR_RETRY_SECONDS)
+
+
+class TickBridgeProtocol(asyncio.DatagramProtocol):
+    """
+    ingestionからのdatagramを待ち行列へ積む。溢れた分は捨てる(DB経由の配信が補う)
+    """
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+        self.dropped = 0
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        try:
+            self.queue.put_nowait(decode_bridge_tick(data))
+        except (asyncio.QueueFull, struct.error, UnicodeDecodeError):
+            self.dropped += 1
+
+
+class BridgedSeconds:
+    """
+    bridgeで配信したtickの秒(epoch秒)。DBの行は秒単位のため、配信していない秒の行だけをDBから配信する
+    retention_secondsより古い秒は捨て、それより前の行は配信済みとして扱う
+    """
+    def __init__(self, retention_seconds: int = TICK_BRIDGE_SECONDS_RETENTION):
+        self.retention_seconds = retention_seconds
+        self._seconds: set[int] = set()
+        self._order: deque[int] = deque()
+        self._floor: int | None = None
+        self._newest: int | None = None
+
+    def add(self, second: int) -> None:
+        if second in self._seconds:
+            return
+        self._seconds.add(second)
+        self._order.append(second)
+        self._newest = second if self._newest is None else max(self._newest, second)
+        horizon = self._newest - self.retention_seconds
+        while self._order and self._order[0] < horizon:
+            self._seconds.discard(self._order.popleft())
+            self._floor = horizon
+
+    def __contains__(self, second: int) -> bool:
+        return second in self._seconds or (self._floor is not None and second < self._floor)
+
+
+class ServerStateCollector:
+    """
+    scrapeの度に、path毎のclient数・送信キューの長さと、通貨ペア毎の最後のtickからの経過時間を集計する
+    """
+    @staticmethod
+    def _families() -> tuple[GaugeMetricFamily, ...]:
+        return (
+            GaugeMetricFamily("ws_clients", "Connected clients", labels=["path"]),
+            GaugeMetricFamily("ws_send_queue_messages", "Messages waiting in client send queues", labels=["path"]),
+            GaugeMetricFamily("ws_send_queue_max_messages", "Longest client send queue", labels=["path"]),
+            GaugeMetricFamily("ws_tick_age_seconds", "Seconds since the last tick", labels=["symbol"]),
+        )
+
+    def describe(self):
+        # registerの時点ではcollectを呼ばせない(モジュールの読み込み中のため)
+        return self._families()
+
+    def collect(self):
+        clients, queued, queue_max, tick_age = self._families()
+        for path, sessions in sessions_by_path().items():
+            depths = [session.queue_depth for session in sessions]
+            clients.add_metric([path], len(depths))
+            queued.add_metric([path], sum(depths))
+            queue_max.add_metric([path], max(depths, default=0))
+
+        for symbol, age_seconds in tick_age_seconds().items():
+            tick_age.add_metric([symbol], math.nan if age_seconds is None else age_seconds)
+        yield from (clients, queued, queue_max, tick_age)
+
 #########################
 
 
@@ -113,40 +954,166 @@ latest_ticker_by_path: dict[str, LatestTickerCache] = {
     path: LatestTickerCache() for path in PATH_CONFIG_BY_PATH.keys()
 }
 
+# path毎に直近のtickを保持する
+tick_buffer_by_path: dict[str, TickRingBuffer] = {
+    path: TickRingBuffer() for path in PATH_CONFIG_BY_PATH.keys()
+}
+
+# 新しい行の到着をcoordinatorへ知らせる(notifyモード)
+relay_wakeup = RelayWakeup()
+
+notify_listener = NotifyListener(relay_wakeup)
+subscription_hub = SubscriptionHub()
+relay_latency = RelayLatency(histogram=TICK_LATENCY_SECONDS.labels("db"))
+bridge_latency = RelayLatency(histogram=TICK_LATENCY_SECONDS.labels("bridge"))
+
+# 送信したフレームの型(str: json, bytes: binary)毎のメトリクス
+send_metrics_by_type = {
+    frame_type: (MESSAGES_SENT.labels(encoding), BYTES_SENT.labels(encoding), SEND_SECONDS.labels(encoding))
+    for frame_type, encoding in ((str, "json"), (bytes, "binary"))
+}
+REGISTRY.register(ServerStateCollector())
+
+# bridgeで配信した秒(path毎)。DBのrelayはこの秒の行を配信しない(取りこぼした秒はDBの行で補う)
+bridged_seconds_by_path: dict[str, BridgedSeconds] = {path: BridgedSeconds() for path in PATH_CONFIG_BY_PATH}
+
+# (path, timeframe)毎の足(起動時にdim_timeframeで作り直す)
+bar_series_by_key: dict[tuple[str, str], LiveBarSeries] = {
+    (config.path, timeframe): LiveBarSeries(config.symbol, timeframe, duration_seconds)
+    for config in PATH_CONFIG_BY_PATH.values()
+    for timeframe, duration_seconds in OHLC_TIMEFRAMES.items()
+}
+bar_series_by_path: dict[str, list[LiveBarSeries]] = {
+    path: [series for (series_path, _), series in bar_series_by_key.items() if series_path == path]
+    for path in PATH_CONFIG_BY_PATH
+}
+# path毎に足へ反映した最後の秒。ingestion(Ticker.add_ticker)と同じく1秒の最初のtickだけで足を組み立て、DBの足と一致させる
+bar_second_by_path: dict[str, int] = {}
+
+# 購読された(path, timeframe)毎のindicatorの状態
+indicator_state_by_key: dict[tuple[str, str], LiveIndicatorState] = {}
+live_strategies: list[StrategyDefinition] = load_strategy_definitions(DEFAULT_STRATEGY_DEFINITIONS_PATH)
+
+# dispatch_tickで配信したtickを受け取るcallback(path_config, message)
+# マルチプロセス構成では、relayがworkerへの転送に使う
+tick_listeners: list[Callable[[StreamConfig, EncodedMessage], None]] = []
+
 ############################
 
 
 ### main functions ###
 
+def bar_payload(bar: OhlcBar) -> dict:
+    payload = {
+        "time": format_epoch_ms(bar.start_ms),
+        "open": bar.open,
+        "high": bar.high,
+        "low": bar.low,
+        "close": bar.close,
+    }
+    if bar.partial:
+        payload["partial"] = True
+    return payload
+
+def json_float(value: float) -> float | None:
+    # NaN(期間が足りない)はnullにする
+    return None if math.isnan(value) else value
+
+def ohlc_path(symbol: str, timeframe: str, prefix: str = OHLC_PATH_PREFIX) -> str:
+    return f"{prefix}{symbol.lower()}/{timeframe}"
+
+def sessions_by_path() -> dict[str, list[ClientSession]]:
+    """
+    接続中のclient(path毎)。足・indicatorは購読されているpathだけ
+    """
+    sessions = {path: registry.snapshot_nowait() for path, registry in registry_by_path.items()}
+    sessions[MULTIPLEX_PATH] = subscription_hub.client_sessions()
+    for series in bar_series_by_key.values():
+        if len(series.registry):
+            sessions[ohlc_path(series.symbol, series.timeframe)] = series.registry.snapshot_nowait()
+    for state in indicator_state_by_key.values():
+        if state.sessions:
+            sessions[ohlc_path(state.bars.symbol, state.bars.timeframe, INDICATOR_PATH_PREFIX)] = list(state.sessions)
+    return sessions
+
+def tick_age_seconds(now_ms: float | None = None) -> dict[str, float | None]:
+    """
+    通貨ペア毎の、最後のtickの時刻からの経過秒数。tickが無ければNone
+    """
+    if now_ms is None:
+        now_ms = time.time() * 1000
+    ages = {}
+    for config in PATH_CONFIG_BY_PATH.values():
+        latest_epoch_ms = tick_buffer_by_path[config.path].latest_epoch_ms
+        ages[config.symbol] = None if latest_epoch_ms is None else max(0.0, (now_ms - latest_epoch_ms) / 1000)
+    return ages
+
+def readiness() -> tuple[bool, dict]:
+    """
+    全通貨ペアのtickがWS_STALE_SECONDS以内に届いていればready
+    """
+    ages = tick_age_seconds()
+    stale = sorted(symbol for symbol, age in ages.items() if age is None or age > WS_STALE_SECONDS)
+    return not stale, {"stale_seconds": WS_STALE_SECONDS, "stale_symbols": stale, "tick_age_seconds": ages}
+
+def build_bar_series(timeframes: dict[str, int]) -> None:
+    """
+    全通貨ペア x timeframeの足を作り直す
+    """
+    bar_series_by_key.clear()
+    bar_series_by_path.clear()
+    bar_second_by_path.clear()
+    for config in PATH_CONFIG_BY_PATH.values():
+        bar_series_by_path[config.path] = []
+        for timeframe, duration_seconds in sorted(timeframes.items(), key=lambda item: item[1]):
+            series = LiveBarSeries(config.symbol, timeframe, duration_seconds)
+            bar_series_by_key[(config.path, timeframe)] = series
+            bar_series_by_path[config.path].append(series)
+
+def parse_ohlc_path(path: str, prefix: str = OHLC_PATH_PREFIX) -> LiveBarSeries | None:
+    """
+    <prefix><pair>/<timeframe> の足。該当しなければNone
+    """
+    if not path.startswith(prefix):
+        return None
+    pair, _, timeframe = path[len(prefix):].partition("/")
+    ticker_path = PATH_BY_SYMBOL.get(pair.upper())
+    if ticker_path is None:
+        return None
+    return bar_series_by_key.get((ticker_path, timeframe))
+
+
 async def send_json(client: ServerConnection, payload: dict) -> None:
     try:
         await client.send(json.dumps(payload))
     except ConnectionClosed:
         pass
 
-async def send_error_and_close(client: ServerConnection, message: str) -> None:
+async def send_error_and_close(client: ServerConnection, message: str, code: str = "INVALID PATH") -> None:
     await send_json(
         client,
         {
             "type": "error",
-            "code": "INVALID PATH",
+            "code": code,
             "message": message,
             "timestamp": utc_now_iso(),
         },
     )
     await client.close(code=1008, reason=message)
 
+async def broadcast_message(registry: ClientRegistry, message: EncodedMessage) -> None:
+    for client in await registry.snapshot():
+        client.send_message(message)
+
 async def broadcast_to_registry(registry: ClientRegistry, payload: dict):
-    clients = await registry.snapshot()
-    if not clients:
-        return
-    await asyncio.gather(*(send_json(client, payload) for client in clients), return_exceptions=True)
+    # client数に関係なく、エンコードはメッセージ・encoding毎に1回
+    await broadcast_message(registry, EncodedMessage(payload))
 
 async def broadcast(payload) -> None:
-    await asyncio.gather(
-        *(broadcast_to_registry(registry, payload) for registry in registry_by_path.values()),
-        return_exceptions=True
-    )
+    message = EncodedMessage(payload)
+    for registry in registry_by_path.values():
+        await broadcast_message(registry, message)
+    subscription_hub.publish_all(message)
 
 def normalize_ticker_record(row: tuple[datetime, float, float], symbol: str) -> tuple[datetime, dict] | None:
     """
@@ -172,85 +1139,418 @@ def normalize_ticker_record(row: tuple[datetime, float, float], symbol: str) ->
             })
 
 
-def fetch_latest_row(tablename: str) -> tuple[datetime, float, float] | None:
+def fetch_recent_rows(configs: list[StreamConfig], limit: int) -> dict[str, list[tuple[datetime, float, float]]]:
     """
-    対象のテーブルから最新行を取得する
+    全pathの直近limit行を1回のクエリで取得する(時刻の昇順)
     """
-    sql = text(
+    branches = [
         f"""
-        SELECT time, bid, ask
-        FROM {SCHEMA_NAME_TICKER}.{tablename}
-        ORDER BY time DESC
-        LIMIT 1; 
+        (SELECT :path_{i} AS path, time, bid, ask
+         FROM {SCHEMA_NAME_TICKER}.{config.table}
+         ORDER BY time DESC
+         LIMIT :limit)
         """
-    )
+        for i, config in enumerate(configs)
+    ]
+    sql = text(" UNION ALL ".join(branches) + " ORDER BY path, time;")
+    params = {f"path_{i}": config.path for i, config in enumerate(configs)}
 
     with session_scope() as session:
-        row = session.execute(sql).first()
-    return (row[0], row[1], row[2]) if row is not None else None
+        rows = session.execute(sql, {**params, "limit": limit}).all()
+
+    rows_by_path: dict[str, list[tuple[datetime, float, float]]] = {config.path: [] for config in configs}
+    for row in rows:
+        rows_by_path[row[0]].append((row[1], row[2], row[3]))
+    return rows_by_path
+
+@cache
+def recent_rows_sql(tables: tuple[str, ...]) -> str:
+    """
+    fetch_recent_rowsのasyncpg版のクエリ($1: limit)
+    """
+    branches = [
+        f"(SELECT {i} AS key, time, bid, ask FROM {SCHEMA_NAME_TICKER}.{table} ORDER BY time DESC LIMIT $1)"
+        for i, table in enumerate(tables)
+    ]
+    return " UNION ALL ".join(branches) + " ORDER BY key, time"
 
-def fetch_rows_after(last_processed_time: datetime, tablename: str) -> list[tuple[datetime, float, float]]:
+async def fetch_recent_rows_async(configs: list[StreamConfig], limit: int) -> dict[str, list[tuple[datetime, float, float]]]:
     """
-    未処理のレコードを抽出する
+    fetch_recent_rowsと同じ結果をasyncpgのプールで取得する
     """
-    sql = text(
+    rows = await async_base.fetch(recent_rows_sql(tuple(config.table for config in configs)), limit)
+    rows_by_path: dict[str, list[tuple[datetime, float, float]]] = {config.path: [] for config in configs}
+    for key, time_value, bid, ask in rows:
+        rows_by_path[configs[key].path].append((time_value, bid, ask))
+    return rows_by_path
+
+def fetch_timeframes() -> dict[str, int]:
+    with session_scope() as session:
+        rows = session.execute(text("SELECT timeframe_code, duration_seconds FROM dim_timeframe;")).all()
+    return {timeframe: int(duration_seconds) for timeframe, duration_seconds in rows}
+
+def fetch_recent_bars(keys: list[tuple[StreamConfig, str]], limit: int) -> dict[tuple[str, str], list[OhlcBar]]:
+    """
+    (通貨ペア, timeframe)毎に、ohlcテーブルの直近limit本を1回のクエリで取得する(時刻の昇順)
+    """
+    if not keys:
+        return {}
+    branches = [
         f"""
-        SELECT time, bid, ask
-        FROM {SCHEMA_NAME_TICKER}.{tablename}
-        WHERE time > :last_time
-        ORDER BY time;
+        (SELECT {i} AS key, time, open, high, low, close
+         FROM {SCHEMA_NAME_OHLC}."{helpers.ohlc_table(config.symbol, timeframe)}"
+         ORDER BY time DESC
+         LIMIT :limit)
         """
-    )
+        for i, (config, timeframe) in enumerate(keys)
+    ]
+    sql = text(" UNION ALL ".join(branches) + " ORDER BY key, time;")
 
     with session_scope() as session:
-        rows = session.execute(sql, {"last_time": last_processed_time}).all()
-    return [(row[0], row[1], row[2]) for row in rows]
+        rows = session.execute(sql, {"limit": limit}).all()
+
+    bars: dict[tuple[str, str], list[OhlcBar]] = {(config.path, timeframe): [] for config, timeframe in keys}
+    for key, time_value, open_, high, low, close in rows:
+        config, timeframe = keys[key]
+        bars[(config.path, timeframe)].append(
+            OhlcBar(to_epoch_ms(time_value), float(open_), float(high), float(low), float(close))
+        )
+    return bars
 
-async def db_relay_loop_by_path(path_config: StreamConfig):
+async def bootstrap_live_bars() -> None:
     """
-    通貨ペア毎に未処理の行を検出して、配信する
+    dim_timeframeを読み込み、確定済みの足をohlcテーブルから、未確定の足をバッファのtickから組み立てる
+    ohlcテーブルの最後の足とバッファの最初のtickの間は空く(バッチが遅れている場合)
     """
-    latest_cache = latest_ticker_by_path[path_config.path]
-    registry = registry_by_path[path_config.path]
+    try:
+        timeframes = await asyncio.to_thread(fetch_timeframes)
+    except Exception:
+        logger.exception("failed to load dim_timeframe, using defaults")
+        timeframes = OHLC_TIMEFRAMES
+    build_bar_series(timeframes or OHLC_TIMEFRAMES)
 
-    # 初期化
-    bootstrap_row = await asyncio.to_thread(fetch_latest_row, path_config.table)
-    last_processed_time: datetime | None = None
-    if bootstrap_row is not None:
-        bootstrap_time = normalize_utc_timestamp(bootstrap_row[0])
-        last_processed_time = bootstrap_time
+    keys = [(PATH_CONFIG_BY_PATH[path], series.timeframe) for (path, _), series in bar_series_by_key.items()]
+    try:
+        bars_by_key = await asyncio.to_thread(fetch_recent_bars, keys, OHLC_BAR_CACHE_SIZE)
+    except Exception:
+        logger.exception("failed to load ohlc bars, starting with an empty cache")
+        bars_by_key = {}
+    for key, bars in bars_by_key.items():
+        bar_series_by_key[key].load_closed(bars)
+    for path in PATH_CONFIG_BY_PATH:
+        replay_live_bars(path)
+
+def fetch_ohlc_closes(symbol: str, timeframe: str) -> list[tuple[int, float]]:
+    """
+    ohlcテーブルの全期間の終値(update_sma/ema/rsiの全件計算と同じ入力)
+    """
+    sql = text(f'SELECT time, close FROM {SCHEMA_NAME_OHLC}."{helpers.ohlc_table(symbol, timeframe)}" ORDER BY time;')
+    with session_scope() as session:
+        rows = session.execute(sql).all()
+    return [(to_epoch_ms(time_value), float(close)) for time_value, close in rows]
 
-        normalized_record = normalize_ticker_record(bootstrap_row, symbol=path_config.symbol)
-        if normalized_record is not None:
-            _, payload = normalized_record
-            await latest_cache.set(payload)
+async def get_indicator_state(bars: LiveBarSeries, series_list: list[Series]) -> LiveIndicatorState:
+    """
+    (通貨ペア, timeframe)のindicatorの状態を返す。まだ無いindicatorはohlcテーブルの終値
+    + メモリ上の確定済みの足で初期化する
+    """
+    path = PATH_BY_SYMBOL[bars.symbol]
+    state = indicator_state_by_key.get((path, bars.timeframe))
+    if state is None:
+        state = LiveIndicatorState(bars, live_strategies)
+        indicator_state_by_key[(path, bars.timeframe)] = state
+
+    async with state.lock:
+        missing = state.missing(required_series(state.strategies) + series_list)
+        if missing:
+            try:
+                closes = await asyncio.to_thread(fetch_ohlc_closes, bars.symbol, bars.timeframe)
+            except Exception:
+                logger.exception("failed to load ohlc closes: %s %s", bars.symbol, bars.timeframe)
+                closes = []
+            last_loaded_ms = closes[-1][0] if closes else -1
+            closes.extend((bar.start_ms, bar.close) for bar in bars.closed if bar.start_ms > last_loaded_ms)
+            state.add_indicators(missing, closes)
+    return state
+
+def parse_indicator_series(value: str | None) -> list[Series]:
+    """
+    ?series=sma:14,rsi:14 (省略時はstrategyの評価に使うseries)
+    """
+    if value is None:
+        return [series for series in required_series(live_strategies) if series.indicator not in PRICE_SERIES]
+    series_list = []
+    for item in value.split(","):
+        series = parse_series(item)
+        if series.period is not None and not 0 < series.period <= MAX_INDICATOR_PERIOD:
+            raise ValueError(f"period must be 1..{MAX_INDICATOR_PERIOD}: {item}")
+        if series not in series_list:
+            series_list.append(series)
+    return series_list
+
+def fetch_rows_after_by_path(
+        configs: list[StreamConfig],
+        last_times: dict[str, datetime | None],
+) -> dict[str, list[tuple[datetime, float, float]]]:
+    """
+    指定したpathの未処理のレコードを1回のクエリ(UNION ALL)でまとめて抽出する
+    pathの数に関係なく、1回のDB往復・1セッションで済む
+    """
+    if not configs:
+        return {}
+
+    branches = []
+    params = {}
+    for i, config in enumerate(configs):
+        branches.append(
+            f"""
+            SELECT :path_{i} AS path, time, bid, ask
+            FROM {SCHEMA_NAME_TICKER}.{config.table}
+            WHERE time > COALESCE(:last_time_{i}, '-infinity'::timestamp)
+            """
+        )
+        last_time = last_times.get(config.path)
+        params[f"path_{i}"] = config.path
+        # DBのtimestampはUTCのnaive
+        params[f"last_time_{i}"] = last_time.replace(tzinfo=None) if last_time is not None else None
+    sql = text(" UNION ALL ".join(branches) + " ORDER BY path, time;")
 
-    while True:
-        try:
-            rows = await asyncio.to_thread(fetch_rows_after, last_processed_time, path_config.table)
-            for row in rows:
-                current_time = normalize_utc_timestamp(row[0])
-                normalized = normalize_ticker_record(row, symbol=path_config.symbol)
-                if normalized is None:
-                    last_processed_time = current_time
-                    continue
+    with session_scope() as session:
+        rows = session.execute(sql, params).all()
+
+    rows_by_path: dict[str, list[tuple[datetime, float, float]]] = {config.path: [] for config in configs}
+    for row in rows:
+        rows_by_path[row[0]].append((row[1], row[2], row[3]))
+    return rows_by_path
+
+@cache
+def rows_after_sql(tables: tuple[str, ...]) -> str:
+    """
+    fetch_rows_after_by_pathのasyncpg版のクエリ($n: n番目のテーブルの最後の時刻)
+    クエリ文字列はテーブルの組み合わせ毎に固定のため、asyncpgのprepared statementが接続毎に再利用される
+    """
+    branches = [
+        f"""SELECT {i} AS key, time, bid, ask FROM {SCHEMA_NAME_TICKER}.{table}
+        WHERE time > COALESCE(${i + 1}::timestamp, '-infinity'::timestamp)"""
+        for i, table in enumerate(tables)
+    ]
+    return " UNION ALL ".join(branches) + " ORDER BY key, time"
+
+async def fetch_rows_after_by_path_async(
+        configs: list[StreamConfig],
+        last_times: dict[str, datetime | None],
+) -> dict[str, list[tuple[datetime, float, float]]]:
+    """
+    fetch_rows_after_by_pathと同じ結果を、スレッドを経由せずasyncpgのプールで取得する
+    """
+    if not configs:
+        return {}
+    args = []
+    for config in configs:
+        last_time = last_times.get(config.path)
+        # DBのtimestampはUTCのnaive
+        args.append(last_time.replace(tzinfo=None) if last_time is not None else None)
+    rows = await async_base.fetch(rows_after_sql(tuple(config.table for config in configs)), *args)
+
+    rows_by_path: dict[str, list[tuple[datetime, float, float]]] = {config.path: [] for config in configs}
+    for key, time_value, bid, ask in rows:
+        rows_by_path[configs[key].path].append((time_value, bid, ask))
+    return rows_by_path
+
+async def wait_for_new_rows() -> set[str]:
+    """
+    問い合わせるpathを返す
+    notifyモードでLISTEN中はnotify(またはfallbackの間隔)まで待ち、それ以外はpoll間隔だけ待って全pathを返す
+    """
+    if DB_RELAY_MODE != "notify" or not notify_listener.connected:
+        await asyncio.sleep(DB_POLL_INTERVAL_SECONDS)
+        return set(PATH_CONFIG_BY_PATH)
+    return await relay_wakeup.wait(DB_NOTIFY_FALLBACK_SECONDS)
+
+async def update_live_bars(path_config: StreamConfig, epoch_ms: int, bid: float) -> None:
+    """
+    pathの全timeframeの足を更新する。確定した足はすぐに、未確定の足は間引いて送る
+    足に反映済みの秒のtickは捨てる(DBと同じく1秒の最初のtickだけを使う)
+    """
+    second = epoch_ms // 1000
+    if second <= bar_second_by_path.get(path_config.path, -1):
+        return
+    bar_second_by_path[path_config.path] = second
+    for series in bar_series_by_path.get(path_config.path, ()):
+        closed = series.update(epoch_ms, bid)
+        if closed is not None:
+            if len(series.registry):
+                await broadcast_message(series.registry, EncodedMessage(series.payload(closed, closed=True)))
+            indicator_state = indicator_state_by_key.get((path_config.path, series.timeframe))
+            if indicator_state is not None:
+                indicator_state.publish(indicator_state.on_bar_close(closed))
+        series.notify_update()
+
+def replay_live_bars(path: str) -> None:
+    """
+    バッファのtickで足を組み立てる(起動時、clientへは送らない)
+    バッファが満杯で、足の開始時刻より前のtickが残っていない足はpartialにする
+    """
+    tick_buffer = tick_buffer_by_path[path]
+    times, bids, _ = tick_buffer.last(tick_buffer.capacity)
+    if not len(times):
+        return
+    earliest_ms = int(times[0]) if len(tick_buffer) == tick_buffer.capacity else None
+    ticks = []
+    for epoch_ms, bid in zip(times.tolist(), bids.tolist()):
+        if not ticks or epoch_ms // 1000 > ticks[-1][0] // 1000:
+            ticks.append((epoch_ms, bid))
+    bar_second_by_path[path] = ticks[-1][0] // 1000
+    for series in bar_series_by_path.get(path, ()):
+        for epoch_ms, bid in ticks:
+            start_ms = epoch_ms - epoch_ms % series.duration_ms
+            series.update(epoch_ms, bid, partial=earliest_ms is not None and start_ms < earliest_ms)
+
+async def dispatch_tick(path_config: StreamConfig, message: EncodedMessage) -> None:
+    """
+    tickをpathのclientへ配信し、キャッシュ・バッファ・足を更新する
+    欠けた秒を後から補うDBの行は最新のtickより古いので、最新のtickerのキャッシュは更新しない
+    """
+    payload = message.payload
+    tick_buffer = tick_buffer_by_path[path_config.path]
+    latest_epoch_ms = tick_buffer.latest_epoch_ms
+    if latest_epoch_ms is None or message.epoch_ms >= latest_epoch_ms:
+        await latest_ticker_by_path[path_config.path].set(payload)
+    tick_buffer.insert(message.epoch_ms, payload["bid"], payload["ask"])
+    await broadcast_message(registry_by_path[path_config.path], message)
+    subscription_hub.publish("ticker", path_config.symbol, message)
+    await update_live_bars(path_config, message.epoch_ms, payload["bid"])
+    for listener in tick_listeners:
+        listener(path_config, message)
+
+async def dispatch_rows(path_config: StreamConfig, rows: list[tuple[datetime, float, float]]) -> datetime | None:
+    """
+    pathのregistryへ行を配信し、最後に処理した時刻を返す
+    """
+    last_processed_time = None
+    for row in rows:
+        current_time = normalize_utc_timestamp(row[0])
+        last_processed_time = current_time
+        normalized = normalize_ticker_record(row, symbol=path_config.symbol)
+        if normalized is None:
+            continue
+
+        epoch_ms = to_epoch_ms(current_time)
+        if epoch_ms // 1000 in bridged_seconds_by_path[path_config.path]:
+            # bridgeで配信済みの秒
+            continue
+
+        _, payload = normalized
+        await dispatch_tick(path_config, EncodedMessage(payload, epoch_ms))
+        relay_latency.record(current_time)
+    return last_processed_time
+
+async def dispatch_bridge_tick(path_config: StreamConfig, epoch_ms: int, bid: float, ask: float) -> bool:
+    """
+    bridgeで届いたtickを配信する。既に配信した時刻以前のtickは捨てる
+    """
+    latest_epoch_ms = tick_buffer_by_path[path_config.path].latest_epoch_ms
+    if latest_epoch_ms is not None and epoch_ms <= latest_epoch_ms:
+        return False
+    row_time = datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+    normalized = normalize_ticker_record((row_time, bid, ask), symbol=path_config.symbol)
+    if normalized is None:
+        return False
+
+    _, payload = normalized
+    bridged_seconds_by_path[path_config.path].add(epoch_ms // 1000)
+    await dispatch_tick(path_config, EncodedMessage(payload, epoch_ms))
+    return True
+
+async def tick_bridge_loop(socket_path: str = TICK_BRIDGE_SOCKET) -> None:
+    """
+    ingestionからbridgeで届いたtickを、DBへの保存を待たずに配信する
+    DBのrelayは止めず、bridgeが止まっている間の行だけを配信する(保存と取りこぼしの補完はDBが担う)
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=TICK_BRIDGE_QUEUE_SIZE)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    transport, protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: TickBridgeProtocol(queue), local_addr=socket_path, family=socket.AF_UNIX,
+    )
+    logger.info("listening tick bridge on %s", socket_path)
+    try:
+        while True:
+            symbol, epoch_ms, bid, ask, received_ns = await queue.get()
+            path = PATH_BY_SYMBOL.get(symbol)
+            if path is None:
+                continue
+            if await dispatch_bridge_tick(PATH_CONFIG_BY_PATH[path], epoch_ms, bid, ask):
+                bridge_latency.record_ms((time.time_ns() - received_ns) / 1_000_000)
+    finally:
+        transport.close()
+        if protocol.dropped:
+            logger.warning("tick bridge dropped %d datagrams", protocol.dropped)
 
-                _, payload = normalized
-                await latest_cache.set(payload)
-                await broadcast_to_registry(registry, payload)
-                last_processed_time = current_time
+async def bootstrap_tick_buffers(configs: list[StreamConfig]) -> dict[str, datetime | None]:
+    """
+    直近のtickを1回のクエリでバッファへ読み込み、path毎の最後の時刻を返す
+    """
+    last_time_by_path: dict[str, datetime | None] = {config.path: None for config in configs}
+    if WS_DB_DRIVER == "asyncpg":
+        bootstrap_rows = await fetch_recent_rows_async(configs, WS_TICK_BUFFER_SIZE)
+    else:
+        bootstrap_rows = await asyncio.to_thread(fetch_recent_rows, configs, WS_TICK_BUFFER_SIZE)
+    for path, rows in bootstrap_rows.items():
+        tick_buffer = tick_buffer_by_path[path]
+        for row in rows:
+            last_time_by_path[path] = normalize_utc_timestamp(row[0])
+            normalized_record = normalize_ticker_record(row, symbol=PATH_CONFIG_BY_PATH[path].symbol)
+            if normalized_record is not None:
+                _, payload = normalized_record
+                tick_buffer.append(to_epoch_ms(last_time_by_path[path]), payload["bid"], payload["ask"])
+                await latest_ticker_by_path[path].set(payload)
+    await bootstrap_live_bars()
+    return last_time_by_path
+
+async def db_relay_coordinator_loop(last_time_by_path: dict[str, datetime | None] | None = None):
+    """
+    全通貨ペアの未処理の行を1つのループでまとめて取得し、pathのregistryへ振り分ける
+    last_time_by_pathを省略すると、直近のtickをバッファへ読み込んでから始める
+    """
+    configs = list(PATH_CONFIG_BY_PATH.values())
+    if last_time_by_path is None:
+        last_time_by_path = await bootstrap_tick_buffers(configs)
 
-            await asyncio.sleep(DB_POLL_INTERVAL_SECONDS)
+    paths = set(PATH_CONFIG_BY_PATH)
+    while True:
+        targets = [config for config in configs if config.path in paths]
+        try:
+            started = time.perf_counter()
+            if WS_DB_DRIVER == "asyncpg":
+                rows_by_path = await fetch_rows_after_by_path_async(targets, last_time_by_path)
+            else:
+                rows_by_path = await asyncio.to_thread(fetch_rows_after_by_path, targets, last_time_by_path)
+            RELAY_POLL_SECONDS.observe(time.perf_counter() - started)
+            for config in targets:
+                RELAY_ROWS.labels(config.symbol).inc(len(rows_by_path[config.path]))
+                last_time = await dispatch_rows(config, rows_by_path[config.path])
+                if last_time is not None:
+                    last_time_by_path[config.path] = last_time
+
+            paths = await wait_for_new_rows()
 
         except Exception:
-            await broadcast_to_registry(
-                registry,
-                {
-                    'type': 'error',
-                    'code': 'DB_POLLING_FAILED',
-                    'message': f'ticker db polling failed: {path_config.symbol}',
-                    'timestamp': utc_now_iso(),
-                }
+            logger.exception("ticker db polling failed")
+            await asyncio.gather(
+                *(
+                    broadcast_to_registry(
+                        registry_by_path[config.path],
+                        {
+                            'type': 'error',
+                            'code': 'DB_POLLING_FAILED',
+                            'message': f'ticker db polling failed: {config.symbol}',
+                            'timestamp': utc_now_iso(),
+                        }
+                    )
+                    for config in targets
+                ),
+                return_exceptions=True,
             )
             await asyncio.sleep(DB_ERROR_RETRY_SECONDS)
 
@@ -261,39 +1561,301 @@ async def heart_beat_loop():
         await broadcast(payload)
 
 
+async def relay_latency_report_loop():
+    while True:
+        await asyncio.sleep(RELAY_LATENCY_REPORT_SECONDS)
+        mode = "notify" if DB_RELAY_MODE == "notify" and notify_listener.connected else "poll"
+        logger.info("relay latency (%s): %s", mode, relay_latency.summary())
+        relay_latency.reset()
+        if TICK_BRIDGE_SOCKET:
+            logger.info("bridge latency (ingestion -> send queue): %s", bridge_latency.summary())
+            bridge_latency.reset()
+
+
+def error_payload(code: str, message: str) -> dict:
+    return {"type": "error", "code": code, "message": message, "timestamp": utc_now_iso()}
+
+def parse_snapshot_request(params: dict) -> dict | None:
+    """
+    {"last": N} または {"since": ISO時刻}
+    """
+    if not params:
+        return None
+    if "last" in params:
+        try:
+            last = int(params["last"])
+        except (TypeError, ValueError) as exc:
+            raise ValueError("snapshot last must be an integer") from exc
+        if last <= 0:
+            raise ValueError("snapshot last must be positive")
+        return {"last": last}
+    if "since" in params:
+        try:
+            return {"since": parse_iso_timestamp(params["since"])}
+        except (TypeError, ValueError) as exc:
+            raise ValueError("snapshot since must be an ISO 8601 timestamp") from exc
+    raise ValueError("snapshot must have last or since")
+
+def snapshot_payload(symbol: str, tick_buffer: TickRingBuffer, request: dict) -> dict:
+    """
+    バッファから直近のtickを返す(DBは参照しない)
+    """
+    if "last" in request:
+        times, bids, asks = tick_buffer.last(request["last"])
+    else:
+        times, bids, asks = tick_buffer.since(to_epoch_ms(request["since"]))
+    return {
+        "type": "snapshot",
+        "symbol": symbol,
+        "ticks": [
+            {"bid": bid, "ask": ask, "mid": (bid + ask) / 2, "timestamp": format_epoch_ms(epoch_ms)}
+            for epoch_ms, bid, ask in zip(times.tolist(), bids.tolist(), asks.tolist())
+        ],
+        "timestamp": utc_now_iso(),
+    }
+
+def parse_connection_options(params: dict) -> dict:
+    """
+    ?encoding=json|binary&batch_ms=N
+    """
+    encoding = params.get("encoding", "json")
+    if encoding not in ENCODINGS:
+        raise ValueError(f"encoding must be one of {ENCODINGS}")
+    try:
+        batch_ms = int(params.get("batch_ms", 0))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("batch_ms must be an integer") from exc
+    if not 0 <= batch_ms <= MAX_BATCH_MS:
+        raise ValueError(f"batch_ms must be between 0 and {MAX_BATCH_MS}")
+    return {"encoding": encoding, "batch_ms": batch_ms}
+
+def parse_subscription_message(data) -> tuple[str, set[tuple[str, str]], float | None]:
+    """
+    {"type": "subscribe" | "unsubscribe", "symbols": [...], "channels": ["ticker"], "max_rate": 5}
+    """
+    if not isinstance(data, dict) or data.get("type") not in ("subscribe", "unsubscribe"):
+        raise ValueError("type must be subscribe or unsubscribe")
+
+    symbols = data.get("symbols")
+    channels = data.get("channels", ["ticker"])
+    if not isinstance(symbols, list) or not symbols or not isinstance(channels, list) or not channels:
+        raise ValueError("symbols and channels must be non-empty lists")
+    unknown_symbols = sorted(set(map(str, symbols)) - set(SYMBOLS))
+    if unknown_symbols:
+        raise ValueError(f"unsupported symbols: {unknown_symbols}")
+    unknown_channels = sorted(set(map(str, channels)) - set(CHANNELS))
+    if unknown_channels:
+        raise ValueError(f"unsupported channels: {unknown_channels}")
+
+    max_rate = data.get("max_rate")
+    if max_rate is not None:
+        if isinstance(max_rate, bool) or not isinstance(max_rate, (int, float)) or max_rate <= 0:
+            raise ValueError("max_rate must be a positive number")
+        max_rate = float(max_rate)
+
+    keys = {(channel, symbol) for channel in channels for symbol in symbols}
+    return data["type"], keys, max_rate
+
+def parse_subscription_snapshot(data: dict) -> dict | None:
+    snapshot = data.get("snapshot")
+    if snapshot is not None and not isinstance(snapshot, dict):
+        raise ValueError("snapshot must be an object")
+    return parse_snapshot_request(snapshot or {})
+
+async def multiplex_handler(client: ServerConnection, options: dict) -> None:
+    """
+    1本の接続で、subscribe/unsubscribeされた(channel, symbol)を配信する
+    """
+    session = ClientSession(client, **options)
+    writer = asyncio.create_task(session.run_writer())
+    multiplex = MultiplexSession(session)
+    subscription_hub.add(multiplex)
+    try:
+        async for raw in client:
+            try:
+                data = json.loads(raw)
+                message_type, keys, max_rate = parse_subscription_message(data)
+                snapshot = parse_subscription_snapshot(data)
+            except ValueError as exc:  # json.JSONDecodeErrorを含む
+                session.enqueue(json.dumps(error_payload("INVALID_MESSAGE", str(exc))))
+                continue
+
+            if message_type == "unsubscribe":
+                subscription_hub.unsubscribe(multiplex, keys)
+            else:
+                if max_rate is not None:
+                    multiplex.set_max_rate(max_rate)
+                added = subscription_hub.subscribe(multiplex, keys)
+                # 新しく購読したtickerは、snapshotの指定があればバッファから、無ければキャッシュ済みの最新値を1件送る
+                for channel, symbol in sorted(added):
+                    if channel != "ticker":
+                        continue
+                    path = PATH_BY_SYMBOL[symbol]
+                    if snapshot is not None:
+                        session.enqueue(json.dumps(snapshot_payload(symbol, tick_buffer_by_path[path], snapshot)))
+                        continue
+                    cached = await latest_ticker_by_path[path].get()
+                    if cached is not None:
+                        session.send_message(EncodedMessage(cached))
+
+            session.enqueue(
+                json.dumps(
+                    {
+                        "type": "subscriptions",
+                        "subscriptions": [
+                            {"channel": channel, "symbol": symbol}
+                            for channel, symbol in sorted(multiplex.subscriptions)
+                        ],
+                        "max_rate": 1.0 / multiplex.min_interval if multiplex.min_interval else None,
+                        "timestamp": utc_now_iso(),
+                    }
+                )
+            )
+    except ConnectionClosed:
+        pass
+    finally:
+        subscription_hub.remove(multiplex)
+        writer.cancel()
+
+async def ohlc_handler(client: ServerConnection, series: LiveBarSeries, options: dict, params: dict) -> None:
+    """
+    /ws/ohlc/<pair>/<timeframe>: 接続時に確定済みの直近?last=N本(既定OHLC_SNAPSHOT_BARS)と未確定の足を送り、
+    以降は足の確定(closed=true)と未確定の足の更新(間引き)を送る
+    """
+    try:
+        last = int(params.get("last", OHLC_SNAPSHOT_BARS))
+    except ValueError:
+        last = 0
+    if not 0 < last <= OHLC_BAR_CACHE_SIZE:
+        await send_error_and_close(client, f"last must be 1..{OHLC_BAR_CACHE_SIZE}", code="INVALID_QUERY")
+        return
+
+    session = ClientSession(client, **options)
+    writer = asyncio.create_task(session.run_writer())
+    await series.registry.add(session)
+    try:
+        session.enqueue(json.dumps(series.snapshot_payload(last)))
+        await client.wait_closed()
+    finally:
+        await series.registry.remove(session)
+        writer.cancel()
+
+async def indicator_handler(client: ServerConnection, bars: LiveBarSeries, options: dict, params: dict) -> None:
+    """
+    /ws/indicator/<pair>/<timeframe>: 接続時に現在の値を送り、以降は足の確定毎に値とシグナルを送る
+    """
+    try:
+        series_list = parse_indicator_series(params.get("series"))
+    except ValueError as exc:
+        await send_error_and_close(client, str(exc), code="INVALID_QUERY")
+        return
+
+    state = await get_indicator_state(bars, series_list)
+    keys = tuple(series.key for series in series_list)
+    session = ClientSession(client, **options)
+    writer = asyncio.create_task(session.run_writer())
+    state.sessions[session] = keys
+    try:
+        session.enqueue(json.dumps(state.values_payload(keys, "indicator_snapshot")))
+        await client.wait_closed()
+    finally:
+        state.sessions.pop(session, None)
+        writer.cancel()
+
 async def handler(client: ServerConnection) -> None:
     """
     registry, TickerCacheの制御
     """
     # ws以外の接続を拒否する
-    path = client.request.path
+    url = urlsplit(client.request.path)
+    path = url.path
+    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    try:
+        options = parse_connection_options(params)
+    except ValueError as exc:
+        await send_error_and_close(client, str(exc), code="INVALID_QUERY")
+        return
+
+    if path == MULTIPLEX_PATH:
+        await multiplex_handler(client, options)
+        return
+
+    for prefix, path_handler in ((OHLC_PATH_PREFIX, ohlc_handler), (INDICATOR_PATH_PREFIX, indicator_handler)):
+        if path.startswith(prefix):
+            series = parse_ohlc_path(path, prefix)
+            if series is None:
+                await send_error_and_close(client, f"unsupported path: {path}")
+                return
+            await path_handler(client, series, options, params)
+            return
+
     path_config = PATH_CONFIG_BY_PATH.get(path)
     if path_config is None:
         await send_error_and_close(client, f"unsupported path: {path}")
         return
 
+    # ?last=N または ?since=ISO時刻 で、接続時に直近のtickを受け取る
+    try:
+        snapshot = parse_snapshot_request({key: params[key] for key in ("last", "since") if key in params})
+    except ValueError as exc:
+        await send_error_and_close(client, str(exc), code="INVALID_QUERY")
+        return
+
     registry = registry_by_path.get(path)
     latest_ticker = latest_ticker_by_path.get(path)
 
     # clientの処理
-    await registry.add(client)
+    session = ClientSession(client, **options)
+    writer = asyncio.create_task(session.run_writer())
+    await registry.add(session)
     try:
-        cached = await latest_ticker.get()
-        if cached is not None:
-            await send_json(client, cached)
+        if snapshot is not None:
+            session.enqueue(json.dumps(snapshot_payload(path_config.symbol, tick_buffer_by_path[path], snapshot)))
+        else:
+            cached = await latest_ticker.get()
+            if cached is not None:
+                session.send_message(EncodedMessage(cached))
         await client.wait_closed()
     finally:
-        await registry.remove(client)
+        await registry.remove(session)
+        writer.cancel()
+        if session.dropped:
+            logger.info("client %s on %s dropped %d messages (%s)", client.id, path, session.dropped, session.policy)
+
+def compression_options() -> dict:
+    """
+    serveへ渡すpermessage-deflateの設定
+    """
+    if WS_COMPRESSION == "none":
+        return {"compression": None}
+    if WS_COMPRESSION != "deflate":
+        raise ValueError("WS_COMPRESSION must be deflate or none")
+    return {
+        "compression": None,
+        "extensions": [
+            ServerPerMessageDeflateFactory(
+                server_max_window_bits=WS_COMPRESSION_WINDOW_BITS,
+                compress_settings={"level": WS_COMPRESSION_LEVEL, "memLevel": WS_COMPRESSION_MEM_LEVEL},
+            )
+        ],
+    }
 
 async def run_server() -> None:
     host = os.getenv("WS_HOST", "0.0.0.0")
     port = os.getenv("WS_PORT", 8765)
 
-    async with serve(handler, host=host, port=port):
-        relay_tasks = [db_relay_loop_by_path(config) for config in PATH_CONFIG_BY_PATH.values()]
+    async with serve(handler, host=host, port=port, **compression_options()):
+        relay_tasks = [db_relay_coordinator_loop()]
+        if DB_RELAY_MODE == "notify":
+            relay_tasks.append(notify_listener.run())
+        if TICK_BRIDGE_SOCKET:
+            relay_tasks.append(tick_bridge_loop())
+        metrics_tasks = [serve_metrics(readiness)] if WS_METRICS_PORT else []
         await asyncio.gather(
             heart_beat_loop(),
+            relay_latency_report_loop(),
             *relay_tasks,
+            *metrics_tasks,
         )
 
 if __name__ == "__main__":
@@ -115,3 +115,15 @@ def test_ohlc_update_queries_use_on_conflict_do_nothing():
 
 
 
+def test_sma_cross_signals_single_pass_with_watermark():
+    connector = _CaptureConnector()
+
+    transform_services.insert_sma_cross_signals(connector, short_period=14, long_period=28)
+
+    # BUY/SELLを1ステートメントで検出し、watermarkを更新する
+    assert len(connector.calls) == 1
+    call = connector.calls[0]
+    normalized = " ".join(call["query"].split())
+    assert "etl_signal_watermark" in normalized
+    assert "'BUY'" in normalized and "'SELL'" in normalized
+    assert call["params"] == {"strategy_name": "sma_cross_14_28", "short_period": 14, "long_period": 28}
@@ -86,18 +86,15 @@ def test_transform_indicator_smoke(monkeypatch):
 def test_transform_strategy_smoke(monkeypatch):
     calls = []
 
-    def _golden(block_name):
-        calls.append(("golden", block_name))
+    def _sma_cross(block_name):
+        calls.append(("sma_cross", block_name))
 
-    def _dead(block_name):
-        calls.append(("dead", block_name))
-
-    monkeypatch.setattr(transform, "insert_golden_cross_task", _golden)
-    monkeypatch.setattr(transform, "insert_dead_cross_task", _dead)
+    monkeypatch.setattr(transform, "insert_sma_cross_task", _sma_cross)
 
     transform.strategy.fn(block_name="test-connector")
 
-    assert calls == [("golden", "test-connector"), ("dead", "test-connector")]
+    # BUY/SELLは1回のタスクでまとめて検出する
+    assert calls == [("sma_cross", "test-connector")]
 
 
 
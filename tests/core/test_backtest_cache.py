@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.core.backtest_cache import BacktestResultCache, scenario_hash
+from src.core.backtest_engine import BacktestFX, BacktestScenario, run_vectorized_backtest
+
+
+def _result(value: float):
+    return run_vectorized_backtest(np.full(3, value), np.full(3, value), np.array([], dtype=int), np.array([]))
+
+
+def _watermark(minute: int) -> dict:
+    return {"ohlc_max_time": datetime(2024, 1, 1, 0, minute), "event_max_time": None, "event_count": 0}
+
+
+def test_scenario_hash_is_normalized():
+    a = BacktestScenario.from_dict({"strategy_names": ["b", "a"], "quantity": 1000, "start_time": "2024-01-01T00:00:00"})
+    b = BacktestScenario(strategy_names=("a", "b"), quantity=1000.0, start_time=datetime(2024, 1, 1))
+
+    assert scenario_hash(a) == scenario_hash(b)
+    assert scenario_hash(a) != scenario_hash(BacktestScenario.from_dict({"strategy_names": ["a", "b"], "calc_version": 1}))
+    with pytest.raises(ValueError, match="unknown scenario keys"):
+        BacktestScenario.from_dict({"strategy": "a"})
+
+
+def test_cache_hit_miss_and_lru_eviction(tmp_path):
+    cache = BacktestResultCache(tmp_path, max_entries=2)
+    scenario = BacktestScenario()
+
+    assert cache.get(scenario, _watermark(1)) is None
+    cache.put(scenario, _watermark(1), _result(1.0))
+    cache.put(scenario, _watermark(2), _result(2.0))
+    assert cache.get(scenario, _watermark(1)) is not None
+
+    # 最後に参照されていないwatermark(2)が削除される
+    cache.put(scenario, _watermark(3), _result(3.0))
+    assert cache.get(scenario, _watermark(2)) is None
+    assert cache.latest(scenario).watermark == _watermark(3)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (1, 2, 1, 2)
+
+
+class _InMemoryBacktestFX(BacktestFX):
+    """
+    DBの代わりにメモリ上の配列を参照する
+    """
+    def __init__(self, times, opens, closes, event_times, event_types):
+        super().__init__(BacktestScenario(allow_short=True))
+        self.times, self.opens, self.closes = times, opens, closes
+        self.event_times, self.event_types = event_times, event_types
+        self.loaded_after = []
+
+    def data_watermark(self, ohlc_max_time=None):
+        ohlc_max_time = ohlc_max_time or self.times[-1].item()
+        return {
+            "ohlc_max_time": ohlc_max_time,
+            "event_max_time": self.event_times[-1].item(),
+            "event_count": int((self.event_times <= np.datetime64(ohlc_max_time, "us")).sum()),
+        }
+
+    def _load_data(self, after_time=None):
+        self.loaded_after.append(after_time)
+        bars = self.times > np.datetime64(after_time, "us") if after_time else np.ones(len(self.times), bool)
+        events = self.event_times > np.datetime64(after_time, "us") if after_time else np.ones(len(self.event_times), bool)
+        return {
+            "duration_seconds": 60,
+            "times": self.times[bars],
+            "opens": self.opens[bars],
+            "closes": self.closes[bars],
+            "event_times": self.event_times[events],
+            "event_types": self.event_types[events],
+        }
+
+
+def test_backtest_run_extends_cached_result_with_new_bars(tmp_path):
+    rng = np.random.default_rng(4)
+    times = np.datetime64("2024-01-01T00:00", "us") + np.arange(500) * np.timedelta64(60, "s")
+    closes = 150 + np.cumsum(rng.normal(0, 0.05, 500))
+    opens = np.concatenate([[closes[0]], closes[:-1]])
+    event_indices = np.sort(rng.choice(500, 30, replace=False))
+    event_times = times[event_indices] + np.timedelta64(10, "s")
+    event_types = rng.choice(np.array(["BUY", "SELL"], dtype=object), 30)
+    cache = BacktestResultCache(tmp_path)
+
+    split = 300
+    partial = _InMemoryBacktestFX(times[:split], opens[:split], closes[:split], event_times, event_types)
+    partial.run(save=False, cache=cache)
+
+    extended = _InMemoryBacktestFX(times, opens, closes, event_times, event_types)
+    result = extended.run(save=False, cache=cache)
+    expected = _InMemoryBacktestFX(times, opens, closes, event_times, event_types).run(save=False)
+
+    assert extended.loaded_after == [times[split - 1].item()]
+    np.testing.assert_allclose(result.equity, expected.equity)
+    for key, value in expected.summary().items():
+        assert result.summary()[key] == (pytest.approx(value) if isinstance(value, float) else value), key
+
+    # 変更がなければ再計算しない
+    assert extended.run(save=False, cache=cache).final_equity == result.final_equity
+    assert extended.loaded_after == [times[split - 1].item()]
+    assert cache.stats()["extensions"] == 1
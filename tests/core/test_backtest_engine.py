@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from src.core.backtest_engine import positions_from_signals, run_vectorized_backtest
+
+
+def _loop_backtest(opens, closes, signal_indices, signal_sides, quantity, spread, fee=0.0):
+    """
+    1足ずつ処理する参照実装
+    """
+    signals = dict(zip(signal_indices.tolist(), signal_sides.tolist()))
+    equity, position, pending = 0.0, 0.0, None
+    curve, trades, entry = [], [], None
+    for i in range(len(closes)):
+        if i > 0:
+            equity += position * quantity * (opens[i] - closes[i - 1])
+        if pending is not None and pending != position:
+            if position != 0:
+                trades.append(position * quantity * (opens[i] - entry) - quantity * spread - 2 * fee)
+                equity -= fee
+            if pending != 0:
+                equity -= fee
+            equity -= abs(pending - position) * quantity * spread / 2
+            position, entry = pending, opens[i]
+        pending = signals.get(i, pending)
+        equity += position * quantity * (closes[i] - opens[i])
+        curve.append(equity)
+    if position != 0:
+        trades.append(position * quantity * (closes[-1] - entry) - quantity * spread - 2 * fee)
+    return np.array(curve), np.array(trades)
+
+
+def test_positions_from_signals_forward_fills():
+    positions = positions_from_signals(6, np.array([1, 3, 3]), np.array([1.0, 0.0, -1.0]))
+
+    assert positions.tolist() == [0.0, 1.0, 1.0, -1.0, -1.0, -1.0]
+
+
+def test_vectorized_backtest_matches_loop():
+    rng = np.random.default_rng(0)
+    closes = 150 + np.cumsum(rng.normal(0, 0.05, 2_000))
+    opens = np.concatenate([[closes[0]], closes[:-1]]) + rng.normal(0, 0.01, 2_000)
+    signal_indices = np.sort(rng.choice(2_000, 80, replace=False))
+    signal_sides = rng.choice([1.0, -1.0], 80)
+
+    result = run_vectorized_backtest(
+        opens, closes, signal_indices, signal_sides,
+        initial_capital=1_000_000.0, quantity=1_000, spread=0.002, fee_per_trade=1.0,
+    )
+    curve, trades = _loop_backtest(opens, closes, signal_indices, signal_sides, 1_000, 0.002, fee=1.0)
+
+    np.testing.assert_allclose(result.equity, 1e6 + curve)
+    np.testing.assert_allclose(result.trade_pnls, trades)
+    assert result.n_trades == len(trades)
+    assert result.max_drawdown <= 0
+    assert 0 <= result.win_rate <= 1
+
+
+def test_vectorized_backtest_flip_fees_reconcile_with_equity():
+    # 買い -> ドテン売り -> 決済。手数料は4回(約定の脚毎)で、トレードの損益の合計がequityの増減と一致する
+    opens = np.array([100.0, 100.0, 101.0, 102.0, 101.0, 101.0])
+    closes = opens.copy()
+    result = run_vectorized_backtest(
+        opens, closes, np.array([0, 1, 3]), np.array([1.0, -1.0, 0.0]),
+        initial_capital=1_000.0, quantity=1.0, fee_per_trade=0.5,
+    )
+    curve, trades = _loop_backtest(opens, closes, np.array([0, 1, 3]), np.array([1.0, -1.0, 0.0]), 1.0, 0.0, fee=0.5)
+
+    assert result.trade_pnls.tolist() == [1.0 - 1.0, 0.0 - 1.0]
+    np.testing.assert_allclose(result.equity, 1_000.0 + curve)
+    assert result.final_equity - 1_000.0 == pytest.approx(result.trade_pnls.sum())
+    np.testing.assert_allclose(result.trade_pnls, trades)
+
+
+def test_vectorized_backtest_without_signals():
+    result = run_vectorized_backtest(np.ones(10), np.ones(10), np.array([], dtype=int), np.array([]))
+
+    assert result.n_trades == 0
+    assert result.final_equity == 1_000_000.0
+    assert result.max_drawdown == 0.0
+
+
+def test_vectorized_backtest_extends_from_state():
+    rng = np.random.default_rng(3)
+    closes = 150 + np.cumsum(rng.normal(0, 0.05, 1_000))
+    opens = np.concatenate([[closes[0]], closes[:-1]]) + rng.normal(0, 0.01, 1_000)
+    signal_indices = np.sort(rng.choice(1_000, 40, replace=False))
+    signal_sides = rng.choice([1.0, -1.0], 40)
+    kwargs = {"quantity": 1_000, "spread": 0.002, "fee_per_trade": 1.0}
+
+    full = run_vectorized_backtest(opens, closes, signal_indices, signal_sides, **kwargs)
+
+    split = 637
+    head = signal_indices < split
+    first = run_vectorized_backtest(opens[:split], closes[:split], signal_indices[head], signal_sides[head], **kwargs)
+    second = run_vectorized_backtest(
+        opens[split:], closes[split:], signal_indices[~head] - split, signal_sides[~head], state=first.state, **kwargs
+    )
+
+    np.testing.assert_allclose(np.concatenate([first.equity, second.equity]), full.equity)
+    np.testing.assert_allclose(second.trade_pnls, full.trade_pnls)
+    for key, value in full.summary().items():
+        assert second.summary()[key] == pytest.approx(value), key
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from src.core import monte_carlo
+
+
+def _drawdown(pnls, initial_capital):
+    equity = initial_capital + np.cumsum(pnls)
+    peak = np.maximum.accumulate(np.maximum(equity, initial_capital))
+    return (equity - peak).min()
+
+
+def test_shuffle_keeps_total_return_and_matches_path_drawdown():
+    pnls = np.array([100.0, -300.0, 50.0, -20.0, 400.0])
+
+    results = monte_carlo.simulate_chunk(
+        pnls, 50, np.random.SeedSequence(0), method="shuffle", initial_capital=1_000.0
+    )
+
+    np.testing.assert_allclose(results["total_return"], pnls.sum() / 1_000.0)
+    # 元の順序の最大ドローダウンは、取りうる値の範囲内に収まる
+    assert results["max_drawdown"].min() <= _drawdown(pnls, 1_000.0) <= results["max_drawdown"].max()
+    assert results["max_drawdown"].min() >= -320.0
+
+
+def test_slippage_only_reduces_returns():
+    pnls = np.random.default_rng(1).normal(10, 100, 200)
+    seed = np.random.SeedSequence(3)
+
+    clean = monte_carlo.simulate_chunk(pnls, 20, seed, method="shuffle")
+    slipped = monte_carlo.simulate_chunk(pnls, 20, seed, method="shuffle", slippage=0.001)
+
+    assert (slipped["total_return"] < clean["total_return"]).all()
+
+
+def test_run_monte_carlo_is_reproducible_across_workers():
+    pnls = np.random.default_rng(2).normal(5, 50, 300)
+
+    serial, _ = monte_carlo.run_monte_carlo(pnls, n_simulations=2_500, chunk_size=1_000, workers=1, seed=7)
+    parallel, _ = monte_carlo.run_monte_carlo(pnls, n_simulations=2_500, chunk_size=1_000, workers=2, seed=7)
+
+    assert len(serial["total_return"]) == 2_500
+    for key in serial:
+        np.testing.assert_array_equal(serial[key], parallel[key])
+
+    summary = monte_carlo.summarize(serial)
+    assert summary["total_return"]["p5"] <= summary["total_return"]["p50"] <= summary["total_return"]["p95"]
+    assert 0.0 <= summary["probability_of_loss"] <= 1.0
+
+    with pytest.raises(ValueError):
+        monte_carlo.run_monte_carlo(np.empty(0))
+    with pytest.raises(ValueError):
+        monte_carlo.run_monte_carlo(pnls, method="unknown")
@@ -0,0 +1,121 @@
+import contextlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+import talib
+
+from src.core import paper_trading
+from src.core.signal_engine import parse_strategy
+
+
+@pytest.mark.parametrize(
+    "indicator, reference",
+    [
+        ("sma", talib.SMA),
+        ("ema", talib.EMA),
+        ("rsi", talib.RSI),
+    ],
+)
+def test_incremental_indicators_match_talib(indicator, reference):
+    closes = 150 + np.cumsum(np.random.default_rng(0).normal(0, 0.05, 300))
+    incremental = paper_trading.INCREMENTAL_INDICATORS[indicator](14)
+
+    values = np.array([incremental.update(close) for close in closes])
+
+    np.testing.assert_allclose(values, reference(closes, timeperiod=14), equal_nan=True)
+
+
+def test_bar_builder_closes_bar_on_next_bucket_and_ignores_late_ticks():
+    builder = paper_trading.BarBuilder(60)
+    start = datetime(2026, 1, 5, 9, 0, tzinfo=timezone.utc)
+
+    assert builder.update(start + timedelta(seconds=1), 150.0) is None
+    assert builder.update(start + timedelta(seconds=20), 150.5) is None
+    assert builder.update(start + timedelta(seconds=40), 149.8) is None
+    bar = builder.update(start + timedelta(seconds=61), 150.2)
+
+    assert bar == paper_trading.Bar(start, 150.0, 150.5, 149.8, 149.8)
+    assert builder.update(start + timedelta(seconds=59), 151.0) is None
+
+
+def _tick(time, bid, spread=0.01):
+    return paper_trading.Tick("USD_JPY", time, bid, bid + spread, received_ns=paper_trading.time.perf_counter_ns())
+
+
+def test_engine_fills_on_bar_close_at_ask_and_bid():
+    strategies = [
+        parse_strategy({"name": "up", "event_type": "BUY", "rule": {"cross_above": ["close", 150]}}),
+        parse_strategy({"name": "down", "event_type": "SELL", "rule": {"cross_below": ["close", 150]}}),
+    ]
+    engine = paper_trading.PaperTradingEngine(
+        strategies, symbols=["USD_JPY"], duration_seconds=60, quantity=1_000.0
+    )
+    start = datetime(2026, 1, 5, 9, 0, tzinfo=timezone.utc)
+    bids = [149.9, 150.1, 150.3, 149.7, 149.6]
+
+    fills = []
+    for i, bid in enumerate(bids):
+        fills += engine.on_tick(_tick(start + timedelta(minutes=i), bid))
+
+    # 2本目(150.1)の確定で買い、4本目(149.7)の確定で売る。約定は次の足の最初のtick
+    assert [(fill.strategy_name, fill.side, fill.price) for fill in fills] == [
+        ("up", "BUY", pytest.approx(150.31)),
+        ("down", "SELL", pytest.approx(149.6)),
+    ]
+    assert fills[1].realized_pnl == pytest.approx((149.6 - 150.31) * 1_000)
+    assert engine.positions()["USD_JPY"]["quantity"] == 0.0
+    assert engine.decision_latency.summary()["count"] == len(bids) - 1
+    assert engine.on_tick(paper_trading.Tick("EUR_JPY", start, 160.0, 160.01, 0)) == []
+
+
+def test_ingestion_listener_records_fills_with_streamer_receive_time(monkeypatch):
+    strategies = [parse_strategy({"name": "up", "event_type": "BUY", "rule": {"cross_above": ["close", 150]}})]
+    engine = paper_trading.PaperTradingEngine(strategies, symbols=["USD_JPY"], duration_seconds=60)
+    recorded = []
+    monkeypatch.setattr(paper_trading, "record_fill", recorded.append)
+    listener = paper_trading.ingestion_listener(engine)
+
+    fills = []
+    for i, bid in enumerate([149.9, 150.1, 150.2]):
+        payload = {"symbol": "USD_JPY", "timestamp": f"2026-01-05T09:0{i}:00.000Z", "bid": bid, "ask": bid + 0.01}
+        # Streamerが受信した時刻(DBへの保存の前)から測る
+        fills += listener(payload, paper_trading.time.perf_counter_ns() - 5_000_000)
+
+    assert [fill.side for fill in fills] == ["BUY"]
+    assert recorded == fills
+    assert fills[0].latency_us >= 5_000
+
+
+def test_main_loads_only_the_warm_up_bars(monkeypatch):
+    loaded, warmed = [], []
+
+    def _load(session, **kwargs):
+        loaded.append(kwargs)
+        return {"duration_seconds": 60, "closes": np.array([150.0, 150.1])}
+
+    async def _idle(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(paper_trading, "session_scope", contextlib.nullcontext)
+    monkeypatch.setattr(paper_trading, "load_ohlc_arrays", _load)
+    monkeypatch.setattr(paper_trading, "load_strategy_definitions", lambda path: [])
+    monkeypatch.setattr(paper_trading.PaperTradingEngine, "warm_up", lambda self, symbol, closes: warmed.append(symbol))
+    monkeypatch.setattr(paper_trading, "report_loop", _idle)
+    monkeypatch.setattr(paper_trading, "consume_ws_ticker", _idle)
+
+    paper_trading.main(["--symbols", "USD_JPY", "EUR_JPY", "--warm-up-bars", "200"])
+
+    assert [(kwargs["currency_pair_code"], kwargs["limit"]) for kwargs in loaded] == [("USD/JPY", 200), ("EUR/JPY", 200)]
+    assert warmed == ["USD_JPY", "EUR_JPY"]
+
+
+def test_latency_stats_counts_over_budget():
+    stats = paper_trading.LatencyStats(budget_ms=1.0)
+    for elapsed_ns in (100_000, 500_000, 2_000_000):
+        stats.record(elapsed_ns)
+
+    summary = stats.summary()
+    assert summary["count"] == 3
+    assert summary["over_budget"] == 1
+    assert summary["max_ms"] == pytest.approx(2.0)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import talib
+
+from src.core import parameter_sweep
+
+
+def test_parse_period_range():
+    assert parameter_sweep.parse_period_range("5:20:5") == [5, 10, 15, 20]
+    assert parameter_sweep.parse_period_range("7,14") == [7, 14]
+    with pytest.raises(ValueError):
+        parameter_sweep.parse_period_range("5:x")
+
+
+def test_build_grid_keeps_short_below_long():
+    assert parameter_sweep.build_grid([5, 20], [10, 20]) == [(5, 10), (5, 20)]
+
+
+def test_run_sweep_matches_single_evaluation():
+    rng = np.random.default_rng(1)
+    closes = 150 + np.cumsum(rng.normal(0, 0.05, 3_000))
+    arrays = {"opens": np.concatenate([[closes[0]], closes[:-1]]), "closes": closes}
+    grid = parameter_sweep.build_grid([5, 10], [20, 30])
+
+    results, _ = parameter_sweep.run_sweep(arrays, grid, workers=2, metric="total_return")
+
+    assert len(results) == 4
+    assert [item["total_return"] for item in results] == sorted((item["total_return"] for item in results), reverse=True)
+    best = results[0]
+    expected = parameter_sweep.evaluate_sma_cross(
+        arrays["opens"],
+        closes,
+        talib.SMA(closes, timeperiod=best["short_period"]),
+        talib.SMA(closes, timeperiod=best["long_period"]),
+        {},
+    )
+    assert best["total_return"] == pytest.approx(expected["total_return"])
+    assert best["n_trades"] == expected["n_trades"]
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+import src.core.signal_engine as signal_engine
+from src.config.config import DEFAULT_STRATEGY_DEFINITIONS_PATH
+
+
+def test_parse_strategy_rules():
+    strategy = signal_engine.parse_strategy(
+        {
+            "name": "combo",
+            "event_type": "buy",
+            "rule": {"all": [{"cross_above": ["sma:14", "sma:28"]}, {"below": ["rsi:14", 70]}]},
+        }
+    )
+
+    assert strategy.event_type == "BUY"
+    assert strategy.trigger == signal_engine.Series("sma", 14)
+    assert isinstance(strategy.rule, signal_engine.AllOf)
+    assert strategy.rule.rules[1] == signal_engine.Compare(signal_engine.Series("rsi", 14), 70.0, "below")
+    assert [s.key for s in signal_engine.required_series([strategy])] == ["close", "sma:14", "sma:28", "rsi:14"]
+
+
+@pytest.mark.parametrize(
+    "definition",
+    [
+        {"name": "x", "event_type": "HOLD", "rule": {"above": ["close", 1]}},
+        {"name": "x", "event_type": "BUY", "rule": {"cross": ["sma:14", "sma:28"]}},
+        {"name": "x", "event_type": "BUY", "rule": {"above": ["macd:14", 1]}},
+        {"name": "x", "event_type": "BUY", "rule": {"above": ["sma", 1]}},
+    ],
+)
+def test_parse_strategy_rejects_invalid_definitions(definition):
+    with pytest.raises(ValueError):
+        signal_engine.parse_strategy(definition)
+
+
+def test_evaluate_strategies_vectorized():
+    arrays = {
+        "close": np.array([100.0, 101.0, 102.0, 101.0, 100.0, 99.0]),
+        "sma:14": np.array([np.nan, 1.0, 3.0, 3.0, 1.0, 1.0]),
+        "sma:28": np.array([np.nan, 2.0, 2.0, 2.0, 2.0, 2.0]),
+        "rsi:14": np.array([50.0, 40.0, 35.0, 29.0, 25.0, 31.0]),
+    }
+    strategies = [
+        signal_engine.parse_strategy({"name": "golden", "event_type": "BUY", "rule": {"cross_above": ["sma:14", "sma:28"]}}),
+        signal_engine.parse_strategy({"name": "dead", "event_type": "SELL", "rule": {"cross_below": ["sma:14", "sma:28"]}}),
+        signal_engine.parse_strategy({"name": "oversold", "event_type": "BUY", "rule": {"cross_below": ["rsi:14", 30]}}),
+        signal_engine.parse_strategy(
+            {
+                "name": "either",
+                "event_type": "BUY",
+                "rule": {"any": [{"cross_above": ["sma:14", "sma:28"]}, {"cross_above": ["rsi:14", 30]}]},
+            }
+        ),
+    ]
+
+    signals = signal_engine.evaluate_strategies(strategies, arrays, 6)
+
+    assert signals["golden"].tolist() == [2]
+    assert signals["dead"].tolist() == [4]
+    assert signals["oversold"].tolist() == [3]
+    assert signals["either"].tolist() == [2, 5]
+
+
+def test_default_strategy_definitions_are_valid():
+    strategies = signal_engine.load_strategy_definitions(DEFAULT_STRATEGY_DEFINITIONS_PATH)
+
+    assert len(strategies) > 0
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalar(self):
+        return self._rows[0][0]
+
+    def all(self):
+        return list(self._rows)
+
+
+class _FakeConnector:
+    def __init__(self, ohlc_rows, indicator_rows):
+        self.ohlc_rows = ohlc_rows
+        self.indicator_rows = indicator_rows
+
+    def execute(self, query, params=None):
+        normalized = " ".join(query.split())
+        if "FROM dim_currency" in normalized or "FROM dim_timeframe" in normalized:
+            return _FakeResult([(1,)])
+        if "FROM fact_sma" in normalized:
+            return _FakeResult(self.indicator_rows[params["period"]])
+        return _FakeResult(self.ohlc_rows)
+
+
+def test_load_aligned_series_trims_bars_without_indicators():
+    from datetime import datetime, timedelta
+
+    base = datetime(2024, 1, 1)
+    times = [base + timedelta(minutes=i) for i in range(4)]
+    connector = _FakeConnector(
+        ohlc_rows=[(t, 1.0, 1.0, 1.0, float(i)) for i, t in enumerate(times)],
+        # sma:14は3本目まで、sma:28は2本目が欠損している
+        indicator_rows={14: [(t, 10.0 + i) for i, t in enumerate(times[:3])], 28: [(times[0], 20.0), (times[2], 22.0)]},
+    )
+
+    loaded_times, arrays = signal_engine.load_aligned_series(
+        connector,
+        currency_pair_code="USD/JPY",
+        timeframe_code="1m",
+        series=[signal_engine.Series("close"), signal_engine.Series("sma", 14), signal_engine.Series("sma", 28)],
+    )
+
+    assert len(loaded_times) == 3
+    assert arrays["close"].tolist() == [0.0, 1.0, 2.0]
+    assert arrays["sma:14"].tolist() == [10.0, 11.0, 12.0]
+    assert np.isnan(arrays["sma:28"][1]) and arrays["sma:28"][2] == 22.0
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import talib
+
+from src.core import walk_forward
+from src.core.parameter_sweep import build_grid, evaluate_sma_cross
+
+
+def test_build_windows_rolls_by_test_length():
+    windows = walk_forward.build_windows(100, 50, 20)
+
+    assert windows == [
+        walk_forward.Window(0, 50, 50, 70),
+        walk_forward.Window(20, 70, 70, 90),
+    ]
+    with pytest.raises(ValueError):
+        walk_forward.build_windows(100, 0, 20)
+
+
+def test_walk_forward_selects_best_train_params_and_evaluates_test():
+    rng = np.random.default_rng(2)
+    closes = 150 + np.cumsum(rng.normal(0, 0.05, 2_000))
+    arrays = {"opens": np.concatenate([[closes[0]], closes[:-1]]), "closes": closes}
+    grid = build_grid([5, 10], [20, 40])
+    windows = walk_forward.build_windows(len(closes), 800, 400)
+
+    results, _ = walk_forward.walk_forward(arrays, grid, windows, workers=2, metric="total_return")
+
+    assert [item["window"] for item in results] == windows
+    for item in results:
+        window = item["window"]
+
+        def _evaluate(start, end, short_period, long_period):
+            # 全期間で計算したSMAのスライスを使う
+            return evaluate_sma_cross(
+                arrays["opens"][start:end],
+                closes[start:end],
+                talib.SMA(closes, timeperiod=short_period)[start:end],
+                talib.SMA(closes, timeperiod=long_period)[start:end],
+                {},
+            )
+
+        train_returns = {params: _evaluate(window.train_start, window.train_end, *params)["total_return"] for params in grid}
+        assert item["train"]["total_return"] == pytest.approx(max(train_returns.values()))
+        params = (item["short_period"], item["long_period"])
+        assert item["test"]["total_return"] == pytest.approx(_evaluate(window.test_start, window.test_end, *params)["total_return"])
+
+    summary = walk_forward.summarize_out_of_sample(results, 1_000_000.0)
+    assert summary["n_windows"] == len(windows)
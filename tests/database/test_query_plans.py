@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from benchmarks import query_plans
+
+
+def _statement(shape: list[str], shared_blocks: int, execution_ms: float = 1.0) -> dict:
+    return {
+        "sql": "SELECT MAX(time)\nFROM fact_sma",
+        "shape": shape,
+        "metrics": {"shared_blocks": shared_blocks, "temp_blocks": 0, "execution_ms": execution_ms, "rows": 1},
+    }
+
+
+@pytest.fixture(scope="module")
+def plan_results():
+    try:
+        engine = query_plans.prepare_database()
+    except OperationalError as exc:
+        pytest.skip(f"query plan database is not available: {exc}")
+    return query_plans.run_all(engine)
+
+
+def test_compare_reports_shape_diff_and_buffer_regression():
+    index_scan = ["Result", "  Limit [InitPlan 1 (returns $0)]", "    Index Only Scan (Backward) on fact_sma using fact_sma_pkey"]
+    seq_scan = ["Aggregate", "  Seq Scan on fact_sma"]
+
+    assert query_plans.compare_case("case", [_statement(index_scan, 4)], [_statement(index_scan, 10)]) == []
+
+    shape_problem, buffer_problem = query_plans.compare_case(
+        "case", [_statement(index_scan, 4)], [_statement(seq_scan, 2485)],
+    )
+    assert shape_problem.startswith("case[0] SELECT MAX(time)")
+    assert "-    Index Only Scan (Backward) on fact_sma using fact_sma_pkey" in shape_problem
+    assert "+  Seq Scan on fact_sma" in shape_problem
+    assert "shared_blocks: 4 -> 2485" in buffer_problem
+
+
+def test_compare_requires_review_when_statements_change():
+    baseline = [_statement(["Seq Scan on fact_sma"], 4)]
+    current = [{**baseline[0], "sql": "SELECT MAX(time)\nFROM fact_ema"}]
+
+    problems = query_plans.compare_case("case", baseline, current)
+
+    assert "statements changed" in problems[0]
+    assert "+FROM fact_ema" in problems[0]
+    assert query_plans.compare_case("case", None, current)[0].endswith("--update)")
+
+
+@pytest.mark.parametrize("name", [case.name for case in query_plans.CASES])
+def test_query_plan_matches_baseline(plan_results, name):
+    problems = query_plans.compare_case(name, query_plans.load_baseline(name), plan_results[name])
+    assert not problems, "\n".join(problems)
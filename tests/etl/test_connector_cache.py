@@ -0,0 +1,65 @@
+import threading
+
+from src.etl import connector_cache
+
+
+class _FakeConnector:
+    loads = 0
+
+    def __init__(self, block_name):
+        self.block_name = block_name
+
+    @classmethod
+    def load(cls, block_name):
+        cls.loads += 1
+        return cls(block_name)
+
+
+class _OtherConnector(_FakeConnector):
+    loads = 0
+
+
+def test_get_connector_loads_each_block_once(monkeypatch):
+    monkeypatch.setattr(connector_cache, "_connectors", {})
+    _FakeConnector.loads = 0
+
+    first = connector_cache.get_connector("forex-connector", _FakeConnector)
+    again = connector_cache.get_connector("forex-connector", _FakeConnector)
+    other = connector_cache.get_connector("other-connector", _FakeConnector)
+    other_type = connector_cache.get_connector("forex-connector", _OtherConnector)
+
+    assert first is again
+    assert other is not first and other.block_name == "other-connector"
+    assert isinstance(other_type, _OtherConnector)
+    assert _FakeConnector.loads == 2
+
+
+def test_get_connector_is_shared_across_task_threads(monkeypatch):
+    monkeypatch.setattr(connector_cache, "_connectors", {})
+    _FakeConnector.loads = 0
+    results = []
+
+    def _task():
+        results.append(connector_cache.get_connector("forex-connector", _FakeConnector))
+
+    threads = [threading.Thread(target=_task) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert _FakeConnector.loads == 1
+    assert len({id(connector) for connector in results}) == 1
+
+
+def test_cache_is_rebuilt_after_fork(monkeypatch):
+    monkeypatch.setattr(connector_cache, "_connectors", {})
+    _FakeConnector.loads = 0
+    parent = connector_cache.get_connector("forex-connector", _FakeConnector)
+
+    # forkした子プロセスで呼ばれる
+    connector_cache._reset_after_fork()
+    child = connector_cache.get_connector("forex-connector", _FakeConnector)
+
+    assert child is not parent
+    assert _FakeConnector.loads == 2
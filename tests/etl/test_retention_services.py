@@ -0,0 +1,274 @@
+import os
+from datetime import datetime
+
+import pyarrow.parquet as pq
+import pytest
+
+from src.etl.flows import retention_services as rs
+
+TARGET = rs.RetentionTarget(rs.SCHEMA_NAME_TICKER, "ticker_usd_jpy", rs.DAILY, 30)
+
+
+class _FakeExecuteResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalar(self):
+        return self._rows[0] if self._rows else None
+
+    def scalars(self):
+        return self
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return list(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+class _CaptureConnector:
+    """
+    発行したクエリを保存し、クエリに含まれる文字列毎に決めた結果を返す(callableはparamsから結果を作る)
+    """
+    def __init__(self, results=None):
+        self.calls = []
+        self.results = results or {}
+
+    def execute(self, query, params=None):
+        normalized = " ".join(query.split())
+        self.calls.append({"query": normalized, "params": params})
+        for key, rows in self.results.items():
+            if key in normalized:
+                return _FakeExecuteResult(rows(params) if callable(rows) else rows)
+        return _FakeExecuteResult([])
+
+    def queries(self, key):
+        return [call for call in self.calls if key in call["query"]]
+
+
+def _bound(start, end):
+    return f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+
+def _ticks(params):
+    # 1日分の範囲に2行
+    return [(params["start"].replace(hour=1), 150.0, 150.01), (params["start"].replace(hour=2), 150.1, None)]
+
+def _record(name, start, end, path=None, row_count=0, sha256="", restored_until=None):
+    return {
+        "partition_name": name, "range_start": start, "range_end": end, "path": path,
+        "row_count": row_count, "sha256": sha256, "restored_until": restored_until,
+    }
+
+
+def test_periods_and_partition_names():
+    value = datetime(2026, 12, 31, 23, 59, 59)
+
+    assert rs.period_start(value, rs.DAILY) == datetime(2026, 12, 31)
+    assert rs.next_period(datetime(2026, 12, 31), rs.DAILY) == datetime(2027, 1, 1)
+    assert rs.period_start(value, rs.MONTHLY) == datetime(2026, 12, 1)
+    assert rs.next_period(datetime(2026, 12, 1), rs.MONTHLY) == datetime(2027, 1, 1)
+    assert rs.partition_name("ticker_usd_jpy", datetime(2026, 9, 1), rs.DAILY) == "ticker_usd_jpy_p20260901"
+    assert rs.partition_name("usd_jpy_1m", datetime(2026, 9, 1), rs.MONTHLY) == "usd_jpy_1m_p202609"
+
+
+def test_parse_partition_bound():
+    daily = rs.parse_partition_bound(
+        "ticker_usd_jpy_p20260901", "FOR VALUES FROM ('2026-09-01 00:00:00') TO ('2026-09-02 00:00:00')",
+    )
+    legacy = rs.parse_partition_bound("ticker_usd_jpy_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-10-22 00:00:00')")
+    default = rs.parse_partition_bound("ticker_usd_jpy_default", "DEFAULT")
+
+    assert (daily.start, daily.end) == (datetime(2026, 9, 1), datetime(2026, 9, 2))
+    assert (legacy.start, legacy.end) == (None, datetime(2026, 10, 22))
+    assert default.is_default
+    assert legacy.overlaps(datetime(2026, 10, 21), datetime(2026, 10, 22))
+    assert not legacy.overlaps(datetime(2026, 10, 22), datetime(2026, 10, 23))
+    assert not default.overlaps(datetime(2026, 10, 22), datetime(2026, 10, 23))
+
+
+def test_partitions_to_archive_skips_recent_default_and_restored():
+    now = datetime(2026, 10, 19, 12)
+    partitions = [
+        rs.Partition("t_legacy", None, datetime(2026, 9, 1)),
+        rs.Partition("t_p20260901", datetime(2026, 9, 1), datetime(2026, 9, 2)),
+        rs.Partition("t_p20260902", datetime(2026, 9, 2), datetime(2026, 9, 3)),
+        rs.Partition("t_p20261019", datetime(2026, 10, 19), datetime(2026, 10, 20)),
+        rs.Partition("t_default", None, None, is_default=True),
+    ]
+    records = {
+        "t_p20260901": {"restored_until": datetime(2026, 10, 26)},
+        "t_p20260902": {"restored_until": datetime(2026, 10, 18)},
+    }
+
+    expired = rs.partitions_to_archive(partitions, datetime(2026, 9, 19, 12), records, now)
+
+    assert [partition.name for partition in expired] == ["t_legacy", "t_p20260902"]
+
+
+def test_write_archive_roundtrip(tmp_path):
+    path = str(tmp_path / "ticker" / "ticker_usd_jpy" / "ticker_usd_jpy_p20260901.parquet")
+    batches = [
+        [(datetime(2026, 9, 1, 0, 0, 0, 123456), 150.1, 150.11), (datetime(2026, 9, 1, 0, 0, 5), 150.2, None)],
+        [],
+        [(datetime(2026, 9, 1, 23, 59, 55), 151.0, 151.01)],
+    ]
+
+    row_count, sha256 = rs.write_archive(path, ["time", "bid", "ask"], iter(batches))
+    table = rs.read_archive(path)
+
+    assert row_count == 3 and len(sha256) == 64
+    assert table.column_names == ["time", "bid", "ask"]
+    assert table.to_pylist()[0] == {"time": datetime(2026, 9, 1, 0, 0, 0, 123456), "bid": 150.1, "ask": 150.11}
+    assert table.to_pylist()[1]["ask"] is None
+    assert pq.ParquetFile(path).metadata.row_group(0).column(0).compression == "ZSTD"
+    assert not (tmp_path / "ticker" / "ticker_usd_jpy" / "ticker_usd_jpy_p20260901.parquet.tmp").exists()
+
+
+def test_ensure_partitions_moves_default_rows_and_skips_existing_and_archived_ranges():
+    connector = _CaptureConnector({
+        "SELECT MIN(time)": [datetime(2026, 10, 16, 10)],
+        "FROM pg_inherits": [
+            ("ticker_usd_jpy_default", "DEFAULT"),
+            ("ticker_usd_jpy_p20261018", _bound(datetime(2026, 10, 18), datetime(2026, 10, 19))),
+        ],
+        "FROM retention_archive WHERE": [_record("ticker_usd_jpy_p20261015", datetime(2026, 10, 15), datetime(2026, 10, 16))],
+    })
+
+    created = rs.ensure_partitions(connector, TARGET, datetime(2026, 10, 18), datetime(2026, 10, 20))
+
+    # defaultの最古の行(10/16)の日から作る
+    assert created == ["ticker_usd_jpy_p20261016", "ticker_usd_jpy_p20261017", "ticker_usd_jpy_p20261019"]
+    moves = connector.queries("DELETE FROM ticker.ticker_usd_jpy_default")
+    assert [call["params"] for call in moves] == [
+        {"start": datetime(2026, 10, 16), "end": datetime(2026, 10, 17)},
+        {"start": datetime(2026, 10, 17), "end": datetime(2026, 10, 18)},
+        {"start": datetime(2026, 10, 19), "end": datetime(2026, 10, 20)},
+    ]
+    assert "INSERT INTO ticker.ticker_usd_jpy_p20261016 SELECT * FROM moved" in moves[0]["query"]
+    assert moves[0]["query"].endswith(
+        "ATTACH PARTITION ticker.ticker_usd_jpy_p20261016 FOR VALUES FROM ('2026-10-16 00:00:00') TO ('2026-10-17 00:00:00');"
+    )
+
+
+def test_apply_retention_writes_and_verifies_the_archive_before_drop(tmp_path):
+    archived_at_drop = []
+
+    def _on_drop(params):
+        # DROPの時点で書き出したファイルが揃っていること
+        archived_at_drop.append((
+            os.path.exists(params["path"]),
+            rs.read_archive(params["path"]).num_rows,
+            rs._file_sha256(params["path"]) == params["sha256"],
+        ))
+        return []
+
+    connector = _CaptureConnector({
+        "DETACH PARTITION": _on_drop,
+        "FROM pg_inherits": [("ticker_usd_jpy_p20260901", _bound(datetime(2026, 9, 1), datetime(2026, 9, 2)))],
+        "FROM information_schema.columns": ["time", "bid", "ask"],
+        "SELECT * FROM ticker.ticker_usd_jpy_p20260901 WHERE": _ticks,
+    })
+
+    archived = rs.apply_retention(connector, TARGET, str(tmp_path), datetime(2026, 10, 19))
+
+    path = rs.archive_path(str(tmp_path), TARGET, "ticker_usd_jpy_p20260901")
+    assert archived == [{"partition": "ticker_usd_jpy_p20260901", "path": path, "rows": 2}]
+    assert archived_at_drop == [(True, 2, True)]
+    (drop,) = connector.queries("DETACH PARTITION")
+    query = drop["query"]
+    # DETACH -> 行数の確認 -> 台帳 -> DROPの順
+    assert query.index("DETACH PARTITION ticker.ticker_usd_jpy_p20260901") < query.index("<> 2 THEN")
+    assert query.index("<> 2 THEN") < query.index("INSERT INTO retention_archive")
+    assert query.index("INSERT INTO retention_archive") < query.index("DROP TABLE ticker.ticker_usd_jpy_p20260901")
+    assert (drop["params"]["range_start"], drop["params"]["range_end"]) == (datetime(2026, 9, 1), datetime(2026, 9, 2))
+
+
+def test_apply_retention_reuses_current_archives_rewrites_changed_ones_and_skips_held(tmp_path):
+    def _partition(day):
+        return f"ticker_usd_jpy_p202609{day:02d}", datetime(2026, 9, day), datetime(2026, 9, day + 1)
+
+    paths = {}
+    records = []
+    for day, restored_until in ((1, datetime(2026, 10, 1)), (2, datetime(2026, 10, 26)), (3, datetime(2026, 10, 1))):
+        name, start, end = _partition(day)
+        paths[name] = str(tmp_path / "old" / f"{name}.parquet")
+        row_count, sha256 = rs.write_archive(paths[name], ["time", "bid", "ask"], iter([_ticks({"start": start})]))
+        records.append(_record(name, start, end, paths[name], row_count, sha256, restored_until))
+
+    connector = _CaptureConnector({
+        "DETACH PARTITION": [],
+        "FROM pg_inherits": [(name, _bound(start, end)) for name, start, end in map(_partition, (1, 2, 3))],
+        "FROM retention_archive WHERE": records,
+        # 09/03はrestore後に行が増えている
+        "SELECT count(*) FROM ticker.ticker_usd_jpy_p20260901;": [2],
+        "SELECT count(*) FROM ticker.ticker_usd_jpy_p20260903;": [3],
+        "FROM information_schema.columns": ["time", "bid", "ask"],
+        "WHERE time >= :start AND time < :end ORDER BY time;": _ticks,
+    })
+
+    archived = rs.apply_retention(connector, TARGET, str(tmp_path / "new"), datetime(2026, 10, 19))
+
+    new_path = rs.archive_path(str(tmp_path / "new"), TARGET, "ticker_usd_jpy_p20260903")
+    assert archived == [
+        {"partition": "ticker_usd_jpy_p20260901", "path": paths["ticker_usd_jpy_p20260901"], "rows": 2},
+        {"partition": "ticker_usd_jpy_p20260903", "path": new_path, "rows": 2},
+    ]
+    # 書き出し済みのファイルを使うパーティションは読み直さない
+    reads = connector.queries("ORDER BY time;")
+    assert [call["query"].split()[3] for call in reads] == ["ticker.ticker_usd_jpy_p20260903"]
+    drops = connector.queries("DETACH PARTITION")
+    assert [call["params"]["partition_name"] for call in drops] == ["ticker_usd_jpy_p20260901", "ticker_usd_jpy_p20260903"]
+    assert drops[0]["params"]["sha256"] == records[0]["sha256"]
+    assert os.path.exists(new_path)
+
+
+def test_restore_partitions_merges_default_rows_and_attaches_with_archived_bounds(tmp_path):
+    legacy_path = str(tmp_path / "ticker_usd_jpy_legacy.parquet")
+    rows = [(datetime(2026, 8, 31, 23, 59, 58), 149.0, 149.01), (datetime(2026, 8, 31, 23, 59, 59), 149.1, 149.11)]
+    row_count, sha256 = rs.write_archive(legacy_path, ["time", "bid", "ask"], iter([rows]))
+    records = [
+        _record("ticker_usd_jpy_legacy", None, datetime(2026, 9, 1), legacy_path, row_count, sha256),
+        _record("ticker_usd_jpy_p20260901", datetime(2026, 9, 1), datetime(2026, 9, 2), "unused", 0, ""),
+        _record("ticker_usd_jpy_p20260905", datetime(2026, 9, 5), datetime(2026, 9, 6), "unused", 0, ""),
+    ]
+    connector = _CaptureConnector({
+        "FROM pg_inherits": [("ticker_usd_jpy_p20260901", _bound(datetime(2026, 9, 1), datetime(2026, 9, 2)))],
+        "FROM retention_archive WHERE": records,
+    })
+    hold_until = datetime(2026, 10, 26)
+
+    restored = rs.restore_partitions(connector, TARGET, datetime(2026, 8, 1), datetime(2026, 9, 3), hold_until)
+
+    # 09/05は範囲外、09/01は戻してあるので期限だけ延ばす
+    assert [item["partition"] for item in restored] == ["ticker_usd_jpy_legacy", "ticker_usd_jpy_p20260901"]
+    assert len(connector.queries("CREATE TABLE")) == 1
+    (load,) = connector.queries("unnest(")
+    assert load["params"]["time"] == [row[0] for row in rows]
+    (attach,) = connector.queries("ATTACH PARTITION")
+    assert "DELETE FROM ticker.ticker_usd_jpy_default" in attach["query"]
+    assert attach["params"] == {"start": None, "end": datetime(2026, 9, 1)}
+    assert attach["query"].endswith(
+        "ATTACH PARTITION ticker.ticker_usd_jpy_legacy FOR VALUES FROM (MINVALUE) TO ('2026-09-01 00:00:00');"
+    )
+    holds = connector.queries("SET restored_until")
+    assert [call["params"] for call in holds] == [
+        {"hold_until": hold_until, "name": "ticker_usd_jpy_legacy"},
+        {"hold_until": hold_until, "name": "ticker_usd_jpy_p20260901"},
+    ]
+
+
+def test_restore_partitions_refuses_a_corrupted_archive(tmp_path):
+    path = str(tmp_path / "ticker_usd_jpy_p20260901.parquet")
+    rs.write_archive(path, ["time", "bid", "ask"], iter([_ticks({"start": datetime(2026, 9, 1)})]))
+    connector = _CaptureConnector({
+        "FROM retention_archive WHERE": [
+            _record("ticker_usd_jpy_p20260901", datetime(2026, 9, 1), datetime(2026, 9, 2), path, 2, "0" * 64),
+        ],
+    })
+
+    with pytest.raises(RuntimeError, match="checksum"):
+        rs.restore_partitions(connector, TARGET, datetime(2026, 9, 1), datetime(2026, 9, 2), datetime(2026, 10, 26))
+
+    assert not connector.queries("ATTACH PARTITION")
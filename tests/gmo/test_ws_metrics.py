@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from prometheus_client import REGISTRY
+
+from src.gmo import ws_metrics
+from src.gmo import ws_ticker_server as server
+
+USD_JPY = server.PATH_CONFIG_BY_PATH["/ws/ticker_usd_jpy"]
+
+
+class _FakeClient:
+    def __init__(self):
+        self.received = []
+
+    async def send(self, message):
+        self.received.append(message)
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+def _fresh_state(monkeypatch):
+    for path in server.PATH_CONFIG_BY_PATH:
+        monkeypatch.setitem(server.registry_by_path, path, server.ClientRegistry())
+        monkeypatch.setitem(server.tick_buffer_by_path, path, server.TickRingBuffer(capacity=10))
+    monkeypatch.setattr(server, "subscription_hub", server.SubscriptionHub())
+    monkeypatch.setattr(server, "indicator_state_by_key", {})
+
+
+async def _get(port: int, path: str) -> tuple[int, bytes]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    header, _, body = response.partition(b"\r\n\r\n")
+    return int(header.split()[1]), body
+
+
+def test_readiness_fails_when_a_pair_is_stale(monkeypatch):
+    _fresh_state(monkeypatch)
+    monkeypatch.setattr(server, "WS_STALE_SECONDS", 60.0)
+    now_ms = server.time.time() * 1000
+    for config in server.PATH_CONFIG_BY_PATH.values():
+        server.tick_buffer_by_path[config.path].append(int(now_ms) - 1_000, 150.0, 150.01)
+
+    assert server.readiness()[0]
+
+    monkeypatch.setitem(server.tick_buffer_by_path, USD_JPY.path, server.TickRingBuffer(capacity=10))
+    server.tick_buffer_by_path[USD_JPY.path].append(int(now_ms) - 120_000, 150.0, 150.01)
+    ready, detail = server.readiness()
+
+    assert not ready
+    assert detail["stale_symbols"] == [USD_JPY.symbol]
+    assert detail["tick_age_seconds"][USD_JPY.symbol] >= 120
+
+
+def test_metrics_endpoint_reports_clients_queue_depth_and_sent_frames(monkeypatch):
+    _fresh_state(monkeypatch)
+    sent_before = REGISTRY.get_sample_value("ws_messages_sent_total", {"encoding": "json"}) or 0.0
+
+    async def _run():
+        client = _FakeClient()
+        session = server.ClientSession(client)
+        await server.registry_by_path[USD_JPY.path].add(session)
+        session.enqueue('{"type": "heartbeat"}')
+        session.enqueue('{"type": "heartbeat"}')
+        queued_body = (await _get(port, "/metrics"))[1].decode()
+
+        writer = asyncio.create_task(session.run_writer())
+        await asyncio.sleep(0.01)
+        writer.cancel()
+        ready_status, ready_body = await _get(port, "/readyz")
+        return queued_body, ready_status, json.loads(ready_body)
+
+    async def _main():
+        nonlocal port
+        http_server = await asyncio.start_server(
+            lambda r, w: ws_metrics.handle_http(r, w, server.readiness), host="127.0.0.1", port=0,
+        )
+        port = http_server.sockets[0].getsockname()[1]
+        async with http_server:
+            return await _run()
+
+    port = 0
+    queued_body, ready_status, ready_body = asyncio.run(_main())
+
+    assert f'ws_clients{{path="{USD_JPY.path}"}} 1.0' in queued_body
+    assert f'ws_send_queue_messages{{path="{USD_JPY.path}"}} 2.0' in queued_body
+    assert REGISTRY.get_sample_value("ws_messages_sent_total", {"encoding": "json"}) == sent_before + 2
+    # tickが1件も無い
+    assert ready_status == 503
+    assert ready_body["status"] == "stale"
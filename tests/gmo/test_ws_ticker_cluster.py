@@ -0,0 +1,102 @@
+import asyncio
+
+from src.gmo import ws_ticker_cluster as cluster
+from src.gmo import ws_ticker_server as server
+
+USD_JPY = server.PATH_CONFIG_BY_PATH["/ws/ticker_usd_jpy"]
+EUR_JPY = server.PATH_CONFIG_BY_PATH["/ws/ticker_eur_jpy"]
+
+
+def _message(config, second, bid):
+    row = (server.datetime(2026, 1, 5, 9, 0, second), bid, bid + 0.01)
+    _, payload = server.normalize_ticker_record(row, symbol=config.symbol)
+    return server.EncodedMessage(payload, server.to_epoch_ms(row[0]))
+
+
+class _FakeClient:
+    def __init__(self):
+        self.received = []
+
+    async def send(self, message):
+        self.received.append(message)
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+def _fresh_state(monkeypatch):
+    for path in server.PATH_CONFIG_BY_PATH:
+        monkeypatch.setitem(server.registry_by_path, path, server.ClientRegistry())
+        monkeypatch.setitem(server.latest_ticker_by_path, path, server.LatestTickerCache())
+        monkeypatch.setitem(server.tick_buffer_by_path, path, server.TickRingBuffer(capacity=10))
+    monkeypatch.setattr(server, "bar_series_by_key", {})
+    monkeypatch.setattr(server, "bar_series_by_path", {})
+    server.build_bar_series(server.OHLC_TIMEFRAMES)
+
+
+def test_relay_records_decode_to_the_same_payload():
+    message = _message(EUR_JPY, 5, 160.25)
+
+    [(config, decoded)] = cluster.decode_relay_records(message.binary)
+
+    assert config == EUR_JPY
+    assert decoded.payload == message.payload
+    assert decoded.json == message.json
+    assert decoded.binary == message.binary
+
+
+def test_publisher_replays_buffer_then_batches_live_ticks(monkeypatch, tmp_path):
+    _fresh_state(monkeypatch)
+    socket_path = str(tmp_path / "relay.sock")
+
+    async def _read_frame(reader):
+        _, kind, count = server.BINARY_HEADER.unpack(await reader.readexactly(server.BINARY_HEADER.size))
+        body = await reader.readexactly(count * server.BINARY_TICK.size)
+        return kind, [message.payload["bid"] for _, message in cluster.decode_relay_records(body)]
+
+    async def _run():
+        server.tick_buffer_by_path[USD_JPY.path].append(_message(USD_JPY, 0, 150.0).epoch_ms, 150.0, 150.01)
+        publisher = cluster.RelayPublisher()
+        unix_server = await asyncio.start_unix_server(publisher.handle_worker, path=socket_path)
+        async with unix_server:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            replay = await _read_frame(reader)
+            while not len(publisher):
+                await asyncio.sleep(0.001)
+
+            publisher.publish(USD_JPY, _message(USD_JPY, 1, 150.1))
+            publisher.publish(EUR_JPY, _message(EUR_JPY, 1, 160.1))
+            live = await asyncio.wait_for(_read_frame(reader), timeout=1.0)
+            writer.close()
+            return replay, live
+
+    replay, live = asyncio.run(_run())
+
+    assert replay == (cluster.IPC_KIND_REPLAY, [150.0])
+    assert live == (cluster.IPC_KIND_TICK, [150.1, 160.1])
+
+
+def test_worker_broadcasts_ticks_but_only_buffers_replays(monkeypatch):
+    _fresh_state(monkeypatch)
+
+    async def _run():
+        client = _FakeClient()
+        session = server.ClientSession(client)
+        writer = asyncio.create_task(session.run_writer())
+        await server.registry_by_path[USD_JPY.path].add(session)
+
+        old, new = _message(USD_JPY, 0, 150.0), _message(USD_JPY, 1, 150.1)
+        await cluster.handle_relay_frame(cluster.IPC_KIND_REPLAY, old.binary)
+        # 再接続時のREPLAYには既に持っているtickも含まれる
+        await cluster.handle_relay_frame(cluster.IPC_KIND_REPLAY, old.binary + new.binary)
+        await cluster.handle_relay_frame(cluster.IPC_KIND_TICK, _message(USD_JPY, 2, 150.2).binary)
+        await asyncio.sleep(0.01)
+        writer.cancel()
+        return client.received
+
+    received = asyncio.run(_run())
+
+    assert [server.json.loads(message)["bid"] for message in received] == [150.2]
+    _, bids, _ = server.tick_buffer_by_path[USD_JPY.path].last(10)
+    assert bids.tolist() == [150.0, 150.1, 150.2]
+
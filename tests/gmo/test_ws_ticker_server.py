@@ -0,0 +1,803 @@
+import asyncio
+
+import pytest
+from websockets.asyncio.client import connect
+
+from src.gmo import tick_bridge
+from src.gmo import ws_ticker_server as server
+
+
+def test_notify_listener_wakes_only_the_inserted_table_path():
+    async def _run():
+        wakeup = server.RelayWakeup()
+        listener = server.NotifyListener(wakeup)
+
+        listener._on_notify(None, 0, server.DB_NOTIFY_CHANNEL, "ticker_eur_jpy")
+        listener._on_notify(None, 0, server.DB_NOTIFY_CHANNEL, "unknown_table")
+
+        return await wakeup.wait(timeout=1.0)
+
+    assert asyncio.run(_run()) == {"/ws/ticker_eur_jpy"}
+
+
+class _FakeListenConnection:
+    def __init__(self, *, fail_listen=False, hang_select=False):
+        self.fail_listen = fail_listen
+        self.hang_select = hang_select
+        self.terminated = False
+
+    def add_termination_listener(self, callback):
+        self.on_terminate = callback
+
+    async def add_listener(self, channel, callback):
+        if self.fail_listen:
+            raise OSError("listen failed")
+
+    async def fetchval(self, query):
+        if self.hang_select:
+            await asyncio.sleep(3600)
+        return 1
+
+    def is_closed(self):
+        return self.terminated
+
+    def terminate(self):
+        self.terminated = True
+
+
+def test_notify_listener_closes_connection_and_reconnects_on_dead_socket(monkeypatch):
+    monkeypatch.setattr(server, "DB_ERROR_RETRY_SECONDS", 0)
+    monkeypatch.setattr(server, "DB_NOTIFY_KEEPALIVE_SECONDS", 0.01)
+    # 1本目: LISTENに失敗、2本目: SELECT 1に応答しない、3本目: 正常
+    connections = [
+        _FakeListenConnection(fail_listen=True),
+        _FakeListenConnection(hang_select=True),
+        _FakeListenConnection(),
+    ]
+    remaining = list(connections)
+
+    async def _connect(**kwargs):
+        return remaining.pop(0)
+
+    monkeypatch.setattr(server.asyncpg, "connect", _connect)
+    monkeypatch.setattr(server.async_base, "connect_kwargs", dict)
+
+    async def _run():
+        listener = server.NotifyListener(server.RelayWakeup())
+        task = asyncio.create_task(listener.run())
+        while remaining or not listener.connected:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return listener
+
+    listener = asyncio.run(_run())
+
+    assert [connection.terminated for connection in connections] == [True, True, True]
+    assert listener.connected is False
+
+
+def test_relay_wakeup_returns_all_paths_on_timeout():
+    paths = asyncio.run(server.RelayWakeup().wait(timeout=0.01))
+
+    assert paths == set(server.PATH_CONFIG_BY_PATH)
+
+
+def test_wait_for_new_rows_returns_marked_paths_on_notify(monkeypatch):
+    monkeypatch.setattr(server, "DB_RELAY_MODE", "notify")
+    monkeypatch.setattr(server, "DB_NOTIFY_FALLBACK_SECONDS", 10.0)
+    monkeypatch.setattr(server.notify_listener, "connected", True)
+
+    async def _run():
+        wakeup = server.RelayWakeup()
+        monkeypatch.setattr(server, "relay_wakeup", wakeup)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, wakeup.mark, ["/ws/ticker_usd_jpy"])
+
+        started = loop.time()
+        paths = await server.wait_for_new_rows()
+        return loop.time() - started, paths
+
+    elapsed, paths = asyncio.run(_run())
+    assert elapsed < 1.0
+    assert paths == {"/ws/ticker_usd_jpy"}
+
+
+def test_wait_for_new_rows_polls_all_paths_when_not_listening(monkeypatch):
+    monkeypatch.setattr(server, "DB_RELAY_MODE", "notify")
+    monkeypatch.setattr(server, "DB_POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(server.notify_listener, "connected", False)
+
+    paths = asyncio.run(asyncio.wait_for(server.wait_for_new_rows(), timeout=1.0))
+
+    assert paths == set(server.PATH_CONFIG_BY_PATH)
+
+
+class _FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params):
+        self.executed.append((str(sql), params))
+        return self
+
+    def all(self):
+        return self.rows
+
+
+def test_fetch_rows_after_by_path_uses_one_query_for_all_pairs(monkeypatch):
+    t0 = server.datetime(2026, 1, 5, 9, 0, 0)
+    t1 = server.datetime(2026, 1, 5, 9, 0, 1)
+    session = _FakeSession(
+        [
+            ("/ws/ticker_eur_jpy", t1, 160.0, 160.02),
+            ("/ws/ticker_usd_jpy", t0, 150.0, 150.01),
+            ("/ws/ticker_usd_jpy", t1, 150.1, 150.11),
+        ]
+    )
+
+    class _Scope:
+        def __enter__(self):
+            return session
+
+        def __exit__(self, *args):
+            return False
+
+    monkeypatch.setattr(server, "session_scope", _Scope)
+    configs = list(server.PATH_CONFIG_BY_PATH.values())
+    last_times = {"/ws/ticker_usd_jpy": t0.replace(tzinfo=server.timezone.utc)}
+
+    rows_by_path = server.fetch_rows_after_by_path(configs, last_times)
+
+    assert len(session.executed) == 1
+    sql, params = session.executed[0]
+    assert sql.count("UNION ALL") == len(configs) - 1
+    assert params["last_time_0"] == t0
+    assert params["last_time_1"] is None
+    assert set(rows_by_path) == set(server.PATH_CONFIG_BY_PATH)
+    assert [row[0] for row in rows_by_path["/ws/ticker_usd_jpy"]] == [t0, t1]
+    assert rows_by_path["/ws/ticker_gbp_jpy"] == []
+
+
+def test_fetch_rows_after_by_path_async_reuses_one_statement_per_table_set(monkeypatch):
+    t0 = server.datetime(2026, 1, 5, 9, 0, 0)
+    t1 = server.datetime(2026, 1, 5, 9, 0, 1)
+    executed = []
+
+    async def _fetch(sql, *args):
+        executed.append((sql, args))
+        return [(0, t1, 160.0, 160.02), (1, t0, 150.0, 150.01), (1, t1, 150.1, 150.11)]
+
+    monkeypatch.setattr(server.async_base, "fetch", _fetch)
+    configs = [server.PATH_CONFIG_BY_PATH["/ws/ticker_eur_jpy"], server.PATH_CONFIG_BY_PATH["/ws/ticker_usd_jpy"]]
+    last_times = {"/ws/ticker_usd_jpy": t0.replace(tzinfo=server.timezone.utc)}
+
+    async def _run():
+        first = await server.fetch_rows_after_by_path_async(configs, last_times)
+        await server.fetch_rows_after_by_path_async(configs, {})
+        return first
+
+    rows_by_path = asyncio.run(_run())
+
+    (sql, args), (second_sql, second_args) = executed
+    assert sql is second_sql
+    assert sql.count("UNION ALL") == 1
+    assert args == (None, t0)
+    assert second_args == (None, None)
+    assert [row[0] for row in rows_by_path["/ws/ticker_usd_jpy"]] == [t0, t1]
+    assert [row[1] for row in rows_by_path["/ws/ticker_eur_jpy"]] == [160.0]
+
+
+def test_relay_latency_summary():
+    latency = server.RelayLatency()
+    assert latency.summary() == {"count": 0}
+
+    now = server.datetime.now(server.timezone.utc)
+    for _ in range(10):
+        latency.record(now)
+
+    summary = latency.summary()
+    assert summary["count"] == 10
+    assert summary["p50_ms"] >= 0
+    latency.reset()
+    assert latency.summary() == {"count": 0}
+
+
+class _FakeClient:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = []
+        self.closed_with = None
+
+    async def send(self, message):
+        await asyncio.sleep(self.delay)
+        self.received.append(message)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+def _run_sessions(sessions, messages):
+    async def _run():
+        writers = [asyncio.create_task(session.run_writer()) for session in sessions]
+        registry = server.ClientRegistry()
+        for session in sessions:
+            await registry.add(session)
+        for message in messages:
+            await server.broadcast_to_registry(registry, message)
+        await asyncio.sleep(0.05)
+        for writer in writers:
+            writer.cancel()
+
+    asyncio.run(_run())
+
+
+def test_broadcast_encodes_once_and_delivers_in_order(monkeypatch):
+    dumps_calls = []
+    original_dumps = server.json.dumps
+    monkeypatch.setattr(server.json, "dumps", lambda payload: dumps_calls.append(payload) or original_dumps(payload))
+
+    async def _sessions():
+        return [server.ClientSession(_FakeClient()) for _ in range(20)]
+
+    sessions = asyncio.run(_sessions())
+    _run_sessions(sessions, [{"seq": i} for i in range(3)])
+
+    assert len(dumps_calls) == 3
+    for session in sessions:
+        assert session.client.received == ['{"seq": 0}', '{"seq": 1}', '{"seq": 2}']
+
+
+def test_slow_consumer_policies():
+    async def _run(policy):
+        client = _FakeClient()
+        session = server.ClientSession(client, max_queue=3, policy=policy)
+        # writerを起動しないため、キューは溢れる
+        for i in range(5):
+            session.enqueue(str(i))
+        await asyncio.sleep(0)
+        return session, list(session._queue), client
+
+    session, queue, _ = asyncio.run(_run("drop_oldest"))
+    assert queue == ["2", "3", "4"]
+    assert session.dropped == 2
+
+    session, queue, _ = asyncio.run(_run("conflate"))
+    assert queue == ["3", "4"]
+    assert session.dropped == 3
+
+    session, queue, client = asyncio.run(_run("disconnect"))
+    assert session.closed
+    assert queue == []
+    assert client.closed_with == 1013
+
+
+def test_parse_subscription_message():
+    message_type, keys, max_rate = server.parse_subscription_message(
+        {"type": "subscribe", "symbols": ["USD_JPY", "EUR_JPY"], "max_rate": 2}
+    )
+
+    assert message_type == "subscribe"
+    assert keys == {("ticker", "USD_JPY"), ("ticker", "EUR_JPY")}
+    assert max_rate == 2.0
+    for invalid in (
+        {"type": "subscribe", "symbols": []},
+        {"type": "subscribe", "symbols": ["XXX_JPY"]},
+        {"type": "subscribe", "symbols": ["USD_JPY"], "channels": ["orders"]},
+        {"type": "subscribe", "symbols": ["USD_JPY"], "max_rate": 0},
+        {"type": "hello"},
+    ):
+        with pytest.raises(ValueError):
+            server.parse_subscription_message(invalid)
+
+
+def _message(name):
+    return server.EncodedMessage({"type": "test", "name": name})
+
+
+def _names(queue):
+    return [server.json.loads(message)["name"] for message in queue]
+
+
+def test_hub_routes_only_subscribed_keys_and_conflates_within_rate_window():
+    async def _run():
+        hub = server.SubscriptionHub()
+        unlimited = server.MultiplexSession(server.ClientSession(_FakeClient()))
+        limited = server.MultiplexSession(server.ClientSession(_FakeClient()))
+        limited.set_max_rate(20)  # 50ms毎
+        for session in (unlimited, limited):
+            hub.add(session)
+            hub.subscribe(session, {("ticker", "USD_JPY")})
+
+        for i in range(5):
+            hub.publish("ticker", "USD_JPY", _message(f"usd-{i}"))
+            hub.publish("ticker", "EUR_JPY", _message(f"eur-{i}"))
+        queued_before_window = _names(limited.session._queue)
+        await asyncio.sleep(0.08)
+
+        hub.unsubscribe(limited, {("ticker", "USD_JPY")})
+        hub.publish("ticker", "USD_JPY", _message("usd-after"))
+        hub.publish_all(_message("heartbeat"))
+        return _names(unlimited.session._queue), queued_before_window, _names(limited.session._queue)
+
+    unlimited, limited_before, limited_after = asyncio.run(_run())
+
+    assert unlimited == [f"usd-{i}" for i in range(5)] + ["usd-after", "heartbeat"]
+    # 最初の1件は即時に送り、間隔内の残りは最新の1件にまとめる
+    assert limited_before == ["usd-0"]
+    assert limited_after == ["usd-0", "usd-4", "heartbeat"]
+
+
+def test_multiplex_endpoint_end_to_end(monkeypatch):
+    async def _run():
+        hub = server.SubscriptionHub()
+        monkeypatch.setattr(server, "subscription_hub", hub)
+        cache = server.LatestTickerCache()
+        await cache.set({"type": "ticker", "symbol": "GBP_JPY", "bid": 190.0})
+        monkeypatch.setitem(server.latest_ticker_by_path, "/ws/ticker_gbp_jpy", cache)
+        monkeypatch.setitem(server.latest_ticker_by_path, "/ws/ticker_usd_jpy", server.LatestTickerCache())
+
+        async with server.serve(server.handler, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            async with connect(f"ws://127.0.0.1:{port}{server.MULTIPLEX_PATH}") as ws:
+                await ws.send(server.json.dumps({"type": "subscribe", "symbols": ["GBP_JPY", "USD_JPY"]}))
+                cached = server.json.loads(await ws.recv())
+                ack = server.json.loads(await ws.recv())
+
+                hub.publish("ticker", "USD_JPY", server.EncodedMessage({"type": "ticker", "symbol": "USD_JPY"}))
+                hub.publish("ticker", "EUR_JPY", server.EncodedMessage({"type": "ticker", "symbol": "EUR_JPY"}))
+                update = server.json.loads(await ws.recv())
+
+                await ws.send("not json")
+                error = server.json.loads(await ws.recv())
+        return cached, ack, update, error
+
+    cached, ack, update, error = asyncio.run(_run())
+
+    assert cached["symbol"] == "GBP_JPY"
+    assert ack["type"] == "subscriptions"
+    assert {item["symbol"] for item in ack["subscriptions"]} == {"GBP_JPY", "USD_JPY"}
+    assert update["symbol"] == "USD_JPY"
+    assert error["code"] == "INVALID_MESSAGE"
+
+
+def test_tick_ring_buffer_wraps_and_returns_in_time_order():
+    buffer = server.TickRingBuffer(capacity=4)
+    for i in range(6):
+        buffer.append(1_000 * i, 150.0 + i, 150.01 + i)
+
+    times, bids, _ = buffer.last(10)
+    assert len(buffer) == 4
+    assert times.tolist() == [2_000, 3_000, 4_000, 5_000]
+    assert bids.tolist() == [152.0, 153.0, 154.0, 155.0]
+    assert buffer.last(2)[0].tolist() == [4_000, 5_000]
+    assert buffer.since(3_000)[0].tolist() == [4_000, 5_000]
+    assert buffer.since(10_000)[0].tolist() == []
+
+
+def test_snapshot_payload_from_buffer():
+    buffer = server.TickRingBuffer(capacity=10)
+    start = server.datetime(2026, 1, 5, 9, 0, tzinfo=server.timezone.utc)
+    for i in range(3):
+        buffer.append(server.to_epoch_ms(start) + 1_000 * i, 150.0, 150.02)
+
+    payload = server.snapshot_payload(
+        "USD_JPY", buffer, server.parse_snapshot_request({"since": "2026-01-05T09:00:00.500Z"})
+    )
+
+    assert payload["type"] == "snapshot"
+    assert [tick["timestamp"] for tick in payload["ticks"]] == ["2026-01-05T09:00:01.000Z", "2026-01-05T09:00:02.000Z"]
+    assert payload["ticks"][0]["mid"] == pytest.approx(150.01)
+    assert server.parse_snapshot_request({}) is None
+    for invalid in ({"last": "x"}, {"last": 0}, {"since": "yesterday"}, {"first": 1}):
+        with pytest.raises(ValueError):
+            server.parse_snapshot_request(invalid)
+
+
+def test_per_pair_path_sends_snapshot_on_connect(monkeypatch):
+    async def _run():
+        buffer = server.TickRingBuffer(capacity=10)
+        for i in range(5):
+            buffer.append(1_700_000_000_000 + i, 150.0 + i, 150.01 + i)
+        monkeypatch.setitem(server.tick_buffer_by_path, "/ws/ticker_usd_jpy", buffer)
+
+        async with server.serve(server.handler, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            async with connect(f"ws://127.0.0.1:{port}/ws/ticker_usd_jpy?last=3") as ws:
+                return server.json.loads(await ws.recv())
+
+    snapshot = asyncio.run(_run())
+
+    assert snapshot["symbol"] == "USD_JPY"
+    assert [tick["bid"] for tick in snapshot["ticks"]] == [152.0, 153.0, 154.0]
+
+
+def _ticker(symbol, second, bid):
+    return {
+        "type": "ticker",
+        "symbol": symbol,
+        "bid": bid,
+        "ask": bid + 0.01,
+        "mid": bid + 0.005,
+        "timestamp": f"2026-01-05T09:00:{second:02d}.000Z",
+    }
+
+
+def test_binary_encoding_round_trip_and_batches_consecutive_ticks():
+    async def _run():
+        session = server.ClientSession(_FakeClient(), encoding="binary")
+        session.send_message(server.EncodedMessage(_ticker("USD_JPY", 1, 150.0)))
+        session.send_message(server.EncodedMessage(_ticker("EUR_JPY", 2, 160.0)))
+        session.send_message(server.EncodedMessage({"type": "heartbeat", "timestamp": "x"}))
+        return [session._next_frame() for _ in range(2)]
+
+    frame, heartbeat = asyncio.run(_run())
+
+    assert isinstance(frame, bytes)
+    assert len(frame) == server.BINARY_HEADER.size + 2 * server.BINARY_TICK.size
+    ticks = server.decode_binary_frame(frame)
+    assert [(tick["symbol"], tick["timestamp"], tick["bid"]) for tick in ticks] == [
+        ("USD_JPY", "2026-01-05T09:00:01.000Z", 150.0),
+        ("EUR_JPY", "2026-01-05T09:00:02.000Z", 160.0),
+    ]
+    assert server.json.loads(heartbeat)["type"] == "heartbeat"
+
+
+def test_json_batching_wraps_queued_messages():
+    async def _run():
+        session = server.ClientSession(_FakeClient(), batch_ms=10)
+        for second in range(3):
+            session.send_message(server.EncodedMessage(_ticker("USD_JPY", second, 150.0)))
+        return session._next_frame()
+
+    batch = server.json.loads(asyncio.run(_run()))
+
+    assert batch["type"] == "batch"
+    assert [message["timestamp"][-7:] for message in batch["messages"]] == ["00.000Z", "01.000Z", "02.000Z"]
+
+
+def test_parse_connection_options():
+    assert server.parse_connection_options({}) == {"encoding": "json", "batch_ms": 0}
+    assert server.parse_connection_options({"encoding": "binary", "batch_ms": "50"}) == {
+        "encoding": "binary",
+        "batch_ms": 50,
+    }
+    for invalid in ({"encoding": "xml"}, {"batch_ms": "-1"}, {"batch_ms": "abc"}):
+        with pytest.raises(ValueError):
+            server.parse_connection_options(invalid)
+
+
+def test_bridge_ticks_are_sent_before_the_db_and_db_rows_fill_only_later_gaps(monkeypatch, tmp_path):
+    path = "/ws/ticker_usd_jpy"
+    config = server.PATH_CONFIG_BY_PATH[path]
+    _fresh_bar_series(monkeypatch, {"1m": 60})
+    monkeypatch.setitem(server.registry_by_path, path, server.ClientRegistry())
+    monkeypatch.setitem(server.latest_ticker_by_path, path, server.LatestTickerCache())
+    monkeypatch.setitem(server.tick_buffer_by_path, path, server.TickRingBuffer(capacity=10))
+    monkeypatch.setitem(server.bridged_seconds_by_path, path, server.BridgedSeconds())
+    socket_path = str(tmp_path / "bridge.sock")
+    start = server.datetime(2026, 1, 5, 9, 0, 0, tzinfo=server.timezone.utc)
+
+    async def _run():
+        client = _FakeClient()
+        session = server.ClientSession(client)
+        writer = asyncio.create_task(session.run_writer())
+        await server.registry_by_path[path].add(session)
+        bridge = asyncio.create_task(server.tick_bridge_loop(socket_path))
+        await asyncio.sleep(0.05)
+
+        publisher = tick_bridge.TickBridgePublisher(socket_path)
+        publisher.publish_payload({"symbol": "USD_JPY", "timestamp": "2026-01-05T09:00:00.250Z", "bid": "150.0", "ask": "150.01"})
+        publisher.publish_payload({"symbol": "USD_JPY", "timestamp": "2026-01-05T09:00:00.100Z", "bid": "149.0", "ask": "149.01"})
+        await asyncio.sleep(0.05)
+        # DBには秒単位に切り捨てた行が後から届く。bridgeで配信済みの秒は配信しない
+        rows = [(start.replace(tzinfo=None), 150.0, 150.01), (start.replace(second=1, tzinfo=None), 150.1, 150.11)]
+        last_time = await server.dispatch_rows(config, rows)
+        await asyncio.sleep(0.01)
+
+        bridge.cancel()
+        writer.cancel()
+        publisher.close()
+        return client.received, last_time, publisher.sent
+
+    received, last_time, sent = asyncio.run(_run())
+
+    assert sent == 2
+    assert [server.json.loads(message)["timestamp"] for message in received] == [
+        "2026-01-05T09:00:00.250Z",
+        "2026-01-05T09:00:01.000Z",
+    ]
+    assert last_time == start.replace(second=1)
+    assert server.to_epoch_ms(start) // 1000 in server.bridged_seconds_by_path[path]
+
+
+def test_db_rows_fill_seconds_whose_bridge_datagram_was_dropped(monkeypatch):
+    path = "/ws/ticker_usd_jpy"
+    config = server.PATH_CONFIG_BY_PATH[path]
+    _fresh_bar_series(monkeypatch, {"1m": 60})
+    monkeypatch.setitem(server.registry_by_path, path, server.ClientRegistry())
+    monkeypatch.setitem(server.latest_ticker_by_path, path, server.LatestTickerCache())
+    monkeypatch.setitem(server.tick_buffer_by_path, path, server.TickRingBuffer(capacity=10))
+    monkeypatch.setitem(server.bridged_seconds_by_path, path, server.BridgedSeconds())
+    start = server.datetime(2026, 1, 5, 9, 0, 0, tzinfo=server.timezone.utc)
+    start_ms = server.to_epoch_ms(start)
+
+    def _datagram(offset_ms, bid):
+        return tick_bridge.encode_bridge_tick("USD_JPY", start_ms + offset_ms, bid, bid + 0.01, 0)
+
+    async def _run():
+        client = _FakeClient()
+        session = server.ClientSession(client)
+        writer = asyncio.create_task(session.run_writer())
+        await server.registry_by_path[path].add(session)
+
+        # 待ち行列が溢れて09:00:01のdatagramを捨てる
+        queue = asyncio.Queue(maxsize=1)
+        protocol = server.TickBridgeProtocol(queue)
+        protocol.datagram_received(_datagram(250, 150.0), None)
+        protocol.datagram_received(_datagram(1_300, 150.1), None)
+        await server.dispatch_bridge_tick(config, *queue.get_nowait()[1:4])
+        protocol.datagram_received(_datagram(2_100, 150.2), None)
+        await server.dispatch_bridge_tick(config, *queue.get_nowait()[1:4])
+
+        # DBの行は秒単位。bridgeで配信していない09:00:01だけを配信する
+        rows = [(start.replace(second=second, tzinfo=None), 150.0 + second / 10, 150.01 + second / 10)
+                for second in range(3)]
+        await server.dispatch_rows(config, rows)
+        await asyncio.sleep(0.01)
+        writer.cancel()
+        return client.received, protocol.dropped, await server.latest_ticker_by_path[path].get()
+
+    received, dropped, latest = asyncio.run(_run())
+
+    assert dropped == 1
+    assert [server.json.loads(message)["timestamp"] for message in received] == [
+        "2026-01-05T09:00:00.250Z",
+        "2026-01-05T09:00:02.100Z",
+        "2026-01-05T09:00:01.000Z",
+    ]
+    # 後から補った行もバッファでは時刻順
+    times, _, _ = server.tick_buffer_by_path[path].last(10)
+    assert (times - start_ms).tolist() == [250, 1_000, 2_100]
+    # 最新のtickerは補った行で巻き戻らない
+    assert latest["timestamp"] == "2026-01-05T09:00:02.100Z"
+
+
+def test_bridged_seconds_forget_old_seconds_but_cover_them():
+    seconds = server.BridgedSeconds(retention_seconds=10)
+    for second in (100, 105, 120):
+        seconds.add(second)
+
+    assert 120 in seconds and 115 not in seconds
+    # retentionより古い秒(120 - 10より前)は配信済みとして扱う(遅れたDBの行を重複して配信しない)
+    assert 100 in seconds and 103 in seconds and 111 not in seconds
+
+
+def test_tick_ring_buffer_inserts_late_ticks_in_order():
+    tick_buffer = server.TickRingBuffer(capacity=3)
+    for epoch_ms in (1_000, 3_000, 4_000):
+        tick_buffer.append(epoch_ms, 1.0, 1.0)
+
+    tick_buffer.insert(2_000, 2.0, 2.0)
+    tick_buffer.insert(500, 0.5, 0.5)
+    tick_buffer.append(5_000, 5.0, 5.0)
+
+    times, _, _ = tick_buffer.last(3)
+    assert times.tolist() == [3_000, 4_000, 5_000]
+    assert tick_buffer.since(3_000)[0].tolist() == [4_000, 5_000]
+
+
+def test_bridge_publisher_drops_when_no_server_is_listening(tmp_path):
+    publisher = tick_bridge.TickBridgePublisher(str(tmp_path / "missing.sock"))
+
+    assert publisher.publish("USD_JPY", 1_700_000_000_000, 150.0, 150.01) is False
+    assert (publisher.sent, publisher.dropped) == (0, 1)
+    publisher.close()
+
+
+def _fresh_bar_series(monkeypatch, timeframes):
+    monkeypatch.setattr(server, "bar_series_by_key", {})
+    monkeypatch.setattr(server, "bar_series_by_path", {})
+    monkeypatch.setattr(server, "bar_second_by_path", {})
+    server.build_bar_series(timeframes)
+
+
+def test_live_bars_match_batch_ohlc_and_ignore_late_ticks():
+    series = server.LiveBarSeries("USD_JPY", "1m", 60)
+    rng = server.np.random.default_rng(0)
+    times = server.np.sort(rng.integers(0, 10 * 60_000, size=500)) + 1_767_600_000_000
+    bids = 150 + rng.normal(0, 0.05, size=500).cumsum()
+
+    closed = [bar for t, bid in zip(times.tolist(), bids.tolist()) if (bar := series.update(t, bid)) is not None]
+    assert series.update(int(times[0]), 999.0) is None
+
+    # update_ohlc_base_tablesと同じ集計(bidのfirst/max/min/last)
+    buckets = times // 60_000 * 60_000
+    expected = []
+    for bucket in server.np.unique(buckets)[:-1]:
+        window = bids[buckets == bucket]
+        expected.append((int(bucket), window[0], window.max(), window.min(), window[-1]))
+    assert [(bar.start_ms, bar.open, bar.high, bar.low, bar.close) for bar in closed] == expected
+    assert list(series.closed) == closed
+    assert series.open_bar.start_ms == int(buckets[-1])
+
+
+def test_replay_live_bars_marks_bars_older_than_a_full_buffer_as_partial(monkeypatch):
+    path = "/ws/ticker_usd_jpy"
+    _fresh_bar_series(monkeypatch, {"1m": 60, "5m": 300})
+    buffer = server.TickRingBuffer(capacity=3)
+    start = 1_767_600_000_000
+    for epoch_ms in (start + 290_000, start + 310_000, start + 320_000):
+        buffer.append(epoch_ms, 150.0, 150.01)
+    monkeypatch.setitem(server.tick_buffer_by_path, path, buffer)
+
+    server.replay_live_bars(path)
+
+    one_minute = server.bar_series_by_key[(path, "1m")]
+    five_minutes = server.bar_series_by_key[(path, "5m")]
+    # 04:50のtickより前のtickはバッファから溢れている
+    assert [bar.partial for bar in one_minute.closed] == [True]
+    assert one_minute.open_bar.partial is False
+    assert five_minutes.closed[0].partial is True
+    assert five_minutes.open_bar.partial is False
+
+
+def test_live_bars_and_indicators_use_only_the_first_tick_of_each_second(monkeypatch):
+    import talib
+
+    from src.core.signal_engine import parse_series
+
+    path = "/ws/ticker_usd_jpy"
+    config = server.PATH_CONFIG_BY_PATH[path]
+    _fresh_bar_series(monkeypatch, {"1m": 60})
+    series = server.bar_series_by_key[(path, "1m")]
+    state = server.LiveIndicatorState(series, [])
+    start = 1_767_600_000_000
+    history = [(start - 60_000 * (10 - i), 150.0 + 0.01 * i) for i in range(10)]
+    state.add_indicators([parse_series("sma:3")], history)
+    monkeypatch.setitem(server.indicator_state_by_key, (path, "1m"), state)
+
+    rng = server.np.random.default_rng(1)
+    seconds = server.np.sort(rng.choice(5 * 60, size=120, replace=False))
+    ticks = []
+    for second in seconds.tolist():
+        # 1秒に複数のtick。DBに残るのは最初のtickだけ
+        for offset in sorted(rng.integers(0, 1000, size=3).tolist()):
+            ticks.append((start + second * 1000 + offset, 150 + rng.normal(0, 0.05)))
+
+    async def _run():
+        for epoch_ms, bid in ticks:
+            await server.update_live_bars(config, epoch_ms, bid)
+
+    asyncio.run(_run())
+
+    # Ticker.add_ticker(1秒の最初のtick) + update_ohlc_base_tablesと同じ集計
+    first = {}
+    for epoch_ms, bid in ticks:
+        first.setdefault(epoch_ms // 1000, bid)
+    rows = sorted(first.items())
+    expected = []
+    for bucket in sorted({second // 60 for second, _ in rows})[:-1]:
+        window = [bid for second, bid in rows if second // 60 == bucket]
+        expected.append((bucket * 60_000, window[0], max(window), min(window), window[-1]))
+    assert [(bar.start_ms, bar.open, bar.high, bar.low, bar.close) for bar in series.closed] == expected
+
+    closes = server.np.array([close for _, close in history] + [bar[4] for bar in expected])
+    assert state.current["sma:3"] == pytest.approx(talib.SMA(closes, timeperiod=3)[-1], rel=1e-9)
+    assert state.last_time_ms == expected[-1][0]
+
+
+def test_ohlc_path_sends_cached_bars_then_updates_and_closes(monkeypatch):
+    path = "/ws/ticker_usd_jpy"
+    config = server.PATH_CONFIG_BY_PATH[path]
+    _fresh_bar_series(monkeypatch, {"1m": 60})
+    monkeypatch.setitem(server.registry_by_path, path, server.ClientRegistry())
+    monkeypatch.setitem(server.latest_ticker_by_path, path, server.LatestTickerCache())
+    monkeypatch.setitem(server.tick_buffer_by_path, path, server.TickRingBuffer(capacity=10))
+    series = server.bar_series_by_key[(path, "1m")]
+    series.update_interval = 0.01
+    start = 1_767_600_000_000
+    series.load_closed([server.OhlcBar(start - 120_000, 1, 2, 0.5, 1.5), server.OhlcBar(start - 60_000, 1.5, 2, 1, 1.8)])
+
+    def _tick(epoch_ms, bid):
+        payload = {"type": "ticker", "symbol": "USD_JPY", "bid": bid, "ask": bid + 0.01, "mid": bid, "timestamp": ""}
+        return server.dispatch_tick(config, server.EncodedMessage(payload, epoch_ms))
+
+    async def _run():
+        async with server.serve(server.handler, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            async with connect(f"ws://127.0.0.1:{port}/ws/ohlc/usd_jpy/1m?last=1") as ws:
+                snapshot = server.json.loads(await ws.recv())
+                await _tick(start + 1_000, 150.0)
+                await _tick(start + 2_000, 150.2)
+                update = server.json.loads(await ws.recv())
+                await _tick(start + 61_000, 150.1)
+                close = server.json.loads(await ws.recv())
+
+            async with connect(f"ws://127.0.0.1:{port}/ws/ohlc/usd_jpy/2m") as ws:
+                error = server.json.loads(await ws.recv())
+        return snapshot, update, close, error
+
+    snapshot, update, close, error = asyncio.run(_run())
+
+    assert snapshot["type"] == "ohlc_snapshot"
+    assert [bar["close"] for bar in snapshot["bars"]] == [1.8]
+    assert snapshot["open"] is None
+    assert update["closed"] is False
+    assert update["bar"]["time"] == server.format_epoch_ms(start)
+    assert close["closed"] is True
+    assert (close["bar"]["open"], close["bar"]["high"], close["bar"]["close"]) == (150.0, 150.2, 150.2)
+    assert error["type"] == "error"
+
+
+def test_indicator_stream_matches_talib_and_pushes_crossovers(monkeypatch):
+    import talib
+
+    from src.core.signal_engine import parse_strategy
+
+    path = "/ws/ticker_usd_jpy"
+    config = server.PATH_CONFIG_BY_PATH[path]
+    _fresh_bar_series(monkeypatch, {"1m": 60})
+    monkeypatch.setitem(server.registry_by_path, path, server.ClientRegistry())
+    monkeypatch.setitem(server.latest_ticker_by_path, path, server.LatestTickerCache())
+    monkeypatch.setitem(server.tick_buffer_by_path, path, server.TickRingBuffer(capacity=10))
+    monkeypatch.setattr(server, "indicator_state_by_key", {})
+    strategy = parse_strategy({"name": "golden", "event_type": "BUY", "rule": {"cross_above": ["sma:3", "sma:5"]}})
+    monkeypatch.setattr(server, "live_strategies", [strategy])
+
+    start = 1_767_600_000_000
+    history = [150.0 - 0.01 * i for i in range(40)]
+    monkeypatch.setattr(
+        server, "fetch_ohlc_closes", lambda symbol, timeframe: [(start + 60_000 * i, close) for i, close in enumerate(history)]
+    )
+    live = [149.7, 149.9, 150.2, 150.5, 150.6]
+
+    async def _tick(epoch_ms, bid):
+        payload = {"type": "ticker", "symbol": "USD_JPY", "bid": bid, "ask": bid + 0.01, "mid": bid, "timestamp": ""}
+        await server.dispatch_tick(config, server.EncodedMessage(payload, epoch_ms))
+
+    async def _run():
+        messages = []
+        async with server.serve(server.handler, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            async with connect(f"ws://127.0.0.1:{port}/ws/indicator/usd_jpy/1m?series=sma:3,ema:5,rsi:4") as ws:
+                messages.append(server.json.loads(await ws.recv()))
+                # 各足の終値のtickの後、次の足の最初のtickで足が確定する
+                for i, close in enumerate(live + [150.0]):
+                    await _tick(start + 60_000 * (len(history) + i), close)
+                try:
+                    while True:
+                        messages.append(server.json.loads(await asyncio.wait_for(ws.recv(), timeout=0.2)))
+                except TimeoutError:
+                    pass
+            async with connect(f"ws://127.0.0.1:{port}/ws/indicator/usd_jpy/1m?series=sma:0") as ws:
+                error = server.json.loads(await ws.recv())
+        return messages, error
+
+    messages, error = asyncio.run(_run())
+
+    snapshot = messages[0]
+    closes = server.np.array(history + live)
+    expected = {
+        "sma:3": talib.SMA(closes, timeperiod=3),
+        "ema:5": talib.EMA(closes, timeperiod=5),
+        "rsi:4": talib.RSI(closes, timeperiod=4),
+    }
+    assert snapshot["type"] == "indicator_snapshot"
+    assert snapshot["values"]["sma:3"] == pytest.approx(expected["sma:3"][len(history) - 1])
+
+    updates = [m for m in messages if m["type"] == "indicator"]
+    assert len(updates) == len(live)
+    for offset, update in enumerate(updates):
+        index = len(history) + offset
+        assert update["time"] == server.format_epoch_ms(start + 60_000 * index)
+        for key, values in expected.items():
+            assert update["values"][key] == pytest.approx(values[index], rel=1e-9)
+
+    signals = [m for m in messages if m["type"] == "signal"]
+    sma3, sma5 = talib.SMA(closes, timeperiod=3), talib.SMA(closes, timeperiod=5)
+    crosses = [i for i in range(len(history), len(closes)) if sma3[i - 1] <= sma5[i - 1] and sma3[i] > sma5[i]]
+    assert [signal["time"] for signal in signals] == [server.format_epoch_ms(start + 60_000 * i) for i in crosses]
+    assert signals and signals[0]["strategy"] == "golden"
+    assert error["code"] == "INVALID_QUERY"